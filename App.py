@@ -1,8 +1,21 @@
-from flask import Flask, request, render_template, redirect, url_for, session, Response
-from sqlmodel import SQLModel, Session as DBSession, select, create_engine
-from models import User, Upload
+import time
+BOOT_START = time.time()
+
+from flask import Flask, request, render_template, redirect, url_for, session, Response, jsonify, abort
+from sqlmodel import Session as DBSession, select
+from models import User, Upload, Job, list_uploads, remove_upload
+from storage import engine, init_db, write
+from downloads import raw_response, result_response
+from result_store import time_window, time_buckets
+from search_index import get_search_index
+from streams import (
+    Backpressure, valid_name, get_stream, user_streams, is_live, ingest_lines, start_syslog_listener,
+)
 from auth import auth_bp
 from upload import upload_bp          # Import upload blueprint
+from jobs import pending_jobs, recover_jobs, start_workers, MAX_WORKERS
+from metrics import render as render_metrics, rss_bytes
+from sqlalchemy import func
 from datetime import datetime
 import os
 import pandas as pd
@@ -19,12 +32,8 @@ app.secret_key = 'your_secret_key_here'
 app.register_blueprint(auth_bp)
 app.register_blueprint(upload_bp)
 
-# Database
-DATABASE_URL = "sqlite:///users.db"
-engine = create_engine(DATABASE_URL)
-
-if not os.path.exists("users.db"):
-    SQLModel.metadata.create_all(engine)
+# Database: tables, pending migrations, indexes (see storage.py / migrations.py)
+init_db()
 
 # ------------------------------------------
 # Drain3 (Used for analysis pages only)
@@ -83,12 +92,16 @@ def my_uploads():
     if 'user_id' not in session:
         return redirect(url_for('auth.signin'))
 
+    cursor = request.args.get('cursor')
     with DBSession(engine) as db:
-        uploads = db.exec(
-            select(Upload).where(Upload.user_id == session['user_id'])
-        ).all()
+        uploads, next_cursor = list_uploads(db, session['user_id'], cursor)
+
+    jobs = pending_jobs(session['user_id'])
 
-    return render_template("myuploads.html", uploads=uploads)
+    return render_template(
+        "myuploads.html",
+        uploads=uploads, jobs=jobs, cursor=cursor, next_cursor=next_cursor
+    )
 
 # ------------------------------------------
 # Download Raw Log
@@ -107,11 +120,8 @@ def download_upload(upload_id):
     if not upload:
         return "File not found."
 
-    return Response(
-        upload.raw_log,
-        mimetype="text/plain",
-        headers={"Content-Disposition": f"attachment;filename={upload.filename}"}
-    )
+    # Streamed from the blob store (gzip / Range / 304 aware)
+    return raw_response(upload)
 
 # ------------------------------------------
 # Download Structured CSV
@@ -127,17 +137,11 @@ def download_structured(upload_id):
             .where(Upload.id == upload_id, Upload.user_id == session['user_id'])
         ).first()
 
-    if not upload or not upload.structured_log:
+    if not upload or not upload.has_results:
         return "No structured log found."
 
-    df = upload.get_structured()
-    csv_content = df.to_csv(index=False)
-
-    return Response(
-        csv_content,
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment;filename=structured_{upload.filename}.csv"}
-    )
+    # Streamed CSV; ?columns=a,b and ?label=1 narrow it down
+    return result_response(upload, f"structured_{upload.filename}.csv")
 
 # ------------------------------------------
 # Delete Uploaded File
@@ -147,15 +151,7 @@ def delete_upload(upload_id):
     if 'user_id' not in session:
         return redirect(url_for('auth.signin'))
 
-    with DBSession(engine) as db:
-        upload = db.exec(
-            select(Upload)
-            .where(Upload.id == upload_id, Upload.user_id == session['user_id'])
-        ).first()
-
-        if upload:
-            db.delete(upload)
-            db.commit()
+    write(remove_upload, upload_id, session['user_id'])
 
     return redirect(url_for('my_uploads'))
 
@@ -183,27 +179,33 @@ def analysis_result():
     if 'user_id' not in session:
         return redirect(url_for('auth.signin'))
 
+    cursor = request.args.get('cursor')
     with DBSession(engine) as db:
-        uploads = db.exec(
-            select(Upload).where(Upload.user_id == session['user_id'])
-        ).all()
+        uploads, next_cursor = list_uploads(db, session['user_id'], cursor)
 
-    return render_template('analysis_result.html', uploads=uploads)
+    return render_template(
+        'analysis_result.html',
+        uploads=uploads, cursor=cursor, next_cursor=next_cursor
+    )
 
 # ------------------------------------------
 # Individual Log Analysis View
 # ------------------------------------------
+def load_analysis(upload_id, user_id):
+    """Metadata + precomputed summary only (never the results themselves)."""
+    with DBSession(engine) as db:
+        return db.exec(
+            select(Upload.id, Upload.filename, Upload.filesize, Upload.uploaded_at, Upload.summary)
+            .where(Upload.id == upload_id, Upload.user_id == user_id)
+        ).first()
+
+
 @app.route('/analysis_result/<int:upload_id>')
 def show_analysis(upload_id):
     if 'user_id' not in session:
         return redirect(url_for('auth.signin'))
 
-    with DBSession(engine) as db:
-        upload = db.exec(
-            select(Upload)
-            .where(Upload.id == upload_id, Upload.user_id == session['user_id'])
-        ).first()
-
+    upload = load_analysis(upload_id, session['user_id'])
     if not upload:
         return "Analysis not found."
 
@@ -212,13 +214,251 @@ def show_analysis(upload_id):
     return render_template(
         'analysis_view.html',
         upload=upload,
-        power_bi_embed_url=power_bi_embed_url
+        summary=json.loads(upload.summary) if upload.summary else None,
+        power_bi_embed_url=power_bi_embed_url,
+        live=is_live(upload.id)
     )
 
 # ------------------------------------------
+# Analysis Summary (JSON API)
+# ------------------------------------------
+@app.route('/api/uploads/<int:upload_id>/summary')
+def analysis_summary_api(upload_id):
+    if 'user_id' not in session:
+        return jsonify({"error": "not signed in"}), 401
+
+    upload = load_analysis(upload_id, session['user_id'])
+    if not upload:
+        return jsonify({"error": "upload not found"}), 404
+    if not upload.summary:
+        return jsonify({"error": "no analysis for this upload"}), 404
+
+    rv = Response(upload.summary, mimetype="application/json")
+    rv.cache_control.private = True
+    return rv
+
+# ------------------------------------------
+# Time-range queries (JSON API)
+# ------------------------------------------
+MAX_WINDOW_ROWS = 10_000
+
+
+def _time_arg(name):
+    """?start= / ?end= as ISO-8601 or epoch seconds; None if absent."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        if value.replace(".", "", 1).isdigit():
+            return pd.to_datetime(float(value), unit="s")
+        ts = pd.Timestamp(value)
+        # Stored timestamps are naive; an explicit offset is converted to UTC
+        return ts.tz_convert("UTC").tz_localize(None) if ts.tzinfo else ts
+    except ValueError:
+        abort(400, f"Invalid {name}: {value}")
+
+
+def _timed_results(upload_id):
+    with DBSession(engine) as db:
+        upload = db.exec(
+            select(Upload.result_path, Upload.time_start)
+            .where(Upload.id == upload_id, Upload.user_id == session['user_id'])
+        ).first()
+    if not upload or not upload.result_path:
+        abort(404)
+    if upload.time_start is None:
+        abort(404, "No timestamps were found in this upload")
+    return upload.result_path
+
+
+@app.route('/api/uploads/<int:upload_id>/anomalies')
+def anomalies_api(upload_id):
+    """Anomalous lines with start <= Timestamp < end, in time order."""
+    if 'user_id' not in session:
+        return jsonify({"error": "not signed in"}), 401
+
+    path = _timed_results(upload_id)
+    limit = min(request.args.get('limit', 1000, type=int), MAX_WINDOW_ROWS)
+
+    df = time_window(
+        path, _time_arg('start'), _time_arg('end'),
+        columns=["Timestamp", "LineId", "EventId", "anomaly_score", "Content"],
+        anomalies_only=request.args.get('all') != '1',
+        limit=limit,
+    )
+    df["Timestamp"] = df["Timestamp"].astype(str)
+    return jsonify({"count": len(df), "limit": limit, "rows": df.to_dict(orient="records")})
+
+
+@app.route('/api/uploads/<int:upload_id>/timeline')
+def timeline_api(upload_id):
+    """Lines / anomalies / anomaly rate per ?freq= bucket (default 1min)."""
+    if 'user_id' not in session:
+        return jsonify({"error": "not signed in"}), 401
+
+    path = _timed_results(upload_id)
+    freq = request.args.get('freq', '1min')
+    try:
+        pd.tseries.frequencies.to_offset(freq)
+    except ValueError:
+        abort(400, f"Invalid freq: {freq}")
+
+    buckets = time_buckets(path, _time_arg('start'), _time_arg('end'), freq)
+    buckets["time"] = buckets["time"].astype(str)
+    return jsonify({"freq": freq, "buckets": buckets.to_dict(orient="records")})
+
+# ------------------------------------------
+# Search across uploads (JSON API)
+# ------------------------------------------
+def _with_filenames(items, user_id):
+    ids = {item["upload_id"] for item in items}
+    if not ids:
+        return items
+    with DBSession(engine) as db:
+        names = dict(db.exec(
+            select(Upload.id, Upload.filename)
+            .where(Upload.user_id == user_id, Upload.id.in_(ids))
+        ).all())
+    for item in items:
+        item["filename"] = names.get(item["upload_id"])
+    return items
+
+
+@app.route('/api/search')
+def search_api():
+    """?q=words (all must match) &cursor= &limit= → counts per upload + a page of lines."""
+    if 'user_id' not in session:
+        return jsonify({"error": "not signed in"}), 401
+
+    result = get_search_index().search_lines(
+        session['user_id'],
+        request.args.get('q', ''),
+        cursor=request.args.get('cursor', 0, type=int),
+        limit=request.args.get('limit', 50, type=int),
+    )
+    _with_filenames(result["per_upload"], session['user_id'])
+    _with_filenames(result["hits"], session['user_id'])
+    return jsonify(result)
+
+
+@app.route('/api/search/templates')
+def template_search_api():
+    """?q=words → matching templates with line counts per upload."""
+    if 'user_id' not in session:
+        return jsonify({"error": "not signed in"}), 401
+
+    result = get_search_index().search_templates(
+        session['user_id'],
+        request.args.get('q', ''),
+        limit=request.args.get('limit', 50, type=int),
+    )
+    for template in result["templates"]:
+        _with_filenames(template["uploads"], session['user_id'])
+    return jsonify(result)
+
+# ------------------------------------------
+# Live ingestion (see streams.py)
+# ------------------------------------------
+@app.route('/api/streams/<name>', methods=['POST'])
+def stream_ingest_api(name):
+    """
+    Chunked / streamed request body → stream `name` of the signed-in user.
+    Plain text: one log line per line. application/x-ndjson: one JSON record
+    per line ({"message": ...} or a JSON string).
+    """
+    if 'user_id' not in session:
+        return jsonify({"error": "not signed in"}), 401
+    if not valid_name(name):
+        return jsonify({"error": "stream names are 1-64 letters, digits, '.', '_' or '-'"}), 400
+
+    stream = get_stream(session['user_id'], name)
+    ndjson = request.mimetype in ("application/x-ndjson", "application/jsonl", "application/json-seq")
+
+    try:
+        accepted = ingest_lines(stream, request.stream, ndjson=ndjson)
+    except Backpressure:
+        rv = jsonify({"error": "stream is falling behind, retry later", **stream.status()})
+        rv.status_code = 503
+        rv.headers["Retry-After"] = "5"
+        return rv
+
+    return jsonify({"accepted": accepted, **stream.status()})
+
+
+@app.route('/api/streams')
+def streams_api():
+    if 'user_id' not in session:
+        return jsonify({"error": "not signed in"}), 401
+    return jsonify({"streams": user_streams(session['user_id'])})
+
+# ------------------------------------------
+# Metrics (Prometheus) + per-job timings
+# ------------------------------------------
+# Bearer token for /metrics; unset = only scrapes from this host are served
+METRICS_TOKEN = os.environ.get("LOG_ANALYZER_METRICS_TOKEN")
+
+
+def _metrics_allowed():
+    if METRICS_TOKEN:
+        return request.headers.get("Authorization") == f"Bearer {METRICS_TOKEN}"
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text format: job / stage / batch metrics plus current gauges."""
+    if not _metrics_allowed():
+        abort(403)
+
+    with DBSession(engine) as db:
+        by_status = db.exec(select(Job.status, func.count()).group_by(Job.status)).all()
+
+    streams = user_streams(None)
+    gauges = [
+        ("log_analyzer_jobs", "Jobs by current status.",
+         [({"status": status}, count) for status, count in by_status]),
+        ("log_analyzer_workers", "Worker processes in the job pool.", [({}, MAX_WORKERS)]),
+        ("log_analyzer_web_resident_memory_bytes", "RSS of the web process.", [({}, rss_bytes())]),
+        # Totals only: per-stream labels would expose user ids and stream names
+        ("log_analyzer_streams", "Live streams.", [({}, len(streams))]),
+        ("log_analyzer_stream_pending_lines", "Lines queued across live streams.",
+         [({}, sum(s["pending"] for s in streams))]),
+        ("log_analyzer_stream_dropped_lines", "Lines live streams dropped (full queue).",
+         [({}, sum(s["dropped"] for s in streams))]),
+    ]
+    return Response(render_metrics(gauges), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/api/uploads/<int:upload_id>/timings')
+def upload_timings_api(upload_id):
+    """Timing breakdown of every job that built this upload (first ingest + appends)."""
+    if 'user_id' not in session:
+        return jsonify({"error": "not signed in"}), 401
+
+    with DBSession(engine) as db:
+        jobs = db.exec(
+            select(Job)
+            .where(Job.upload_id == upload_id, Job.user_id == session['user_id'])
+            .order_by(Job.created_at)
+        ).all()
+    if not jobs:
+        return jsonify({"error": "no jobs recorded for this upload"}), 404
+
+    return jsonify({"upload_id": upload_id, "jobs": [job.to_status() for job in jobs]})
+
+# ------------------------------------------
+# Startup time (no torch / transformers import on this path)
+# ------------------------------------------
+app.config["STARTUP_SECONDS"] = round(time.time() - BOOT_START, 3)
+print(f"🚀 App initialized in {app.config['STARTUP_SECONDS']:.2f}s")
 
 # ------------------------------------------
 # Run App
 # ------------------------------------------
 if __name__ == "__main__":
+    # Only the serving process (not the reloader watcher) owns the worker pool
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_workers()
+        recover_jobs()
+        start_syslog_listener()
     app.run(debug=True)
@@ -1,12 +1,22 @@
 import os
+import re
+import csv
 import json
 import io
 import time
+import multiprocessing as mp
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime
 import pandas as pd
 from drain3 import TemplateMiner
 from drain3.template_miner_config import TemplateMinerConfig
 from drain3.file_persistence import FilePersistence
 
+from miner_registry import registry
+from masking_profiles import DEFAULT_PROFILE, masking_instructions
+
 # Import DL model only once
 from dl_model import run_dl_on_parsed
 
@@ -15,10 +25,20 @@ from dl_model import run_dl_on_parsed
 # 🔧 Drain3 Setup
 # ==========================================
 STATE_FILE = "drain3_state.bin"
+PROGRESS_EVERY = 5000  # lines between progress callbacks
 
+# "serial" (one TemplateMiner) or "parallel" (sharded across processes)
+PARSE_MODE = os.environ.get("LOG_ANALYZER_PARSE_MODE", "serial")
+PARSE_WORKERS = int(os.environ.get("LOG_ANALYZER_PARSE_WORKERS", os.cpu_count() or 1))
+PARALLEL_MIN_LINES = 20_000  # below this, process start-up costs more than it saves
 
-def build_template_miner(state_path=STATE_FILE):
-    """Create and configure a TemplateMiner instance."""
+# Fast path for already-seen lines (see ParseCache): off | exact | masked
+PARSE_CACHE = os.environ.get("LOG_ANALYZER_PARSE_CACHE", "masked")
+PARSE_CACHE_SIZE = int(os.environ.get("LOG_ANALYZER_PARSE_CACHE_SIZE", "200000"))
+
+
+def build_template_miner_config(masking="none"):
+    """Drain3 settings shared by every miner (serial, shards, ...); `masking` names a profile."""
     cfg = TemplateMinerConfig()
     cfg.profiling_enabled = False
     cfg.drain_sim_th = 0.4
@@ -27,6 +47,13 @@ def build_template_miner(state_path=STATE_FILE):
     cfg.drain_max_clusters = 20000
     cfg.drain_extra_delimiters = ";,()"
     cfg.drain_param_str = "<*>"
+    cfg.masking_instructions = list(masking_instructions(masking))
+    return cfg
+
+
+def build_template_miner(state_path=STATE_FILE):
+    """Create and configure a TemplateMiner instance."""
+    cfg = build_template_miner_config()
 
     folder = os.path.dirname(state_path)
     if folder and not os.path.exists(folder):
@@ -36,28 +63,658 @@ def build_template_miner(state_path=STATE_FILE):
     return TemplateMiner(persistence, cfg)
 
 
-def parse_log_lines(lines):
-    """Parse list of logs using Drain3."""
-    tm = build_template_miner()
+def tenant_key(tenant, masking: str) -> str:
+    """Registry key of a tenant's miner for one masking profile ("none": the original tree)."""
+    return str(tenant) if masking == "none" else f"{tenant}.{masking}"
+
+
+@contextmanager
+def _miner(tenant, masking="none"):
+    """
+    Resident per-tenant miner from the registry, or the legacy shared
+    miner on STATE_FILE when no tenant is given.
+    """
+    if tenant is None:
+        tm = build_template_miner()
+        yield tm
+        tm.save_state("end of parse")
+        return
+
+    with registry.checkout(tenant_key(tenant, masking), masking) as tm:
+        yield tm
+
+
+def parse_log_lines(lines, progress=None, mode=None, tenant=None, line_offset=0, masking=None):
+    """
+    Parse logs using Drain3.
+    `lines` may be a list or any iterable (e.g. a streaming generator).
+    `progress(fraction)` is called every PROGRESS_EVERY lines when the
+    total is known; streaming readers report their own progress.
+    `mode` picks "serial" or "parallel" (default: PARSE_MODE).
+    `tenant` selects a resident per-user miner (see miner_registry.py).
+    A "Timestamp" column is added from TIMESTAMP_PATTERNS (NaT if none match).
+    `line_offset` shifts LineIds (lines appended to an existing upload).
+    `masking` names the tenant's masking profile (default: DEFAULT_PROFILE);
+    each profile has its own miner. The legacy shared miner is unmasked.
+    Fast-path hit / miss counts of this call end up in df.attrs["parse_stats"].
+    """
+    with _miner(tenant, masking or DEFAULT_PROFILE) as tm:
+        cache = parse_cache(tm)
+        before = dict(cache.stats)
+        if (mode or PARSE_MODE) == "parallel":
+            df = _parse_parallel(lines, tm, progress=progress)
+        else:
+            df = _parse_serial(lines, tm, progress=progress)
+        parse_stats = cache.delta(before)
+
+    if line_offset and len(df):
+        df["LineId"] += line_offset
+    if TIMESTAMP_PATTERNS and len(df):
+        df["Timestamp"] = extract_timestamps(df["Content"])
+    df.attrs["parse_stats"] = parse_stats
+    return df
+
+
+def _parse_serial(lines, tm, progress=None):
     rows = []
+    total = len(lines) if hasattr(lines, "__len__") else None
+    cache = parse_cache(tm)
 
     for i, line in enumerate(lines):
+        if progress and total and i % PROGRESS_EVERY == 0:
+            progress(i / total)
+
         line = line.strip()
         if not line:
             continue
 
-        result = tm.add_log_message(line)
+        cluster_id, template = cache.add_log_message(tm, line)
 
         rows.append({
             "LineId": i,
             "Content": line,
-            "EventId": result["cluster_id"],
-            "EventTemplate": result["template_mined"]
+            "EventId": cluster_id,
+            "EventTemplate": template
         })
 
     return pd.DataFrame(rows)
 
 
+# ==========================================
+# 🏎️ Fast path for already-seen lines
+# ==========================================
+# Logs repeat the same line, or the same line up to masked variables,
+# over and over. A line whose exact text (or, in "masked" mode, whose
+# content after Drain3's own masking) was mined before gets the cluster it
+# went into then: no template merge. Both keys stand for the same masked
+# tokens, and merging tokens into a cluster they already went into cannot
+# change its template, so a hit only bumps the cluster size.
+#
+# Which cluster Drain picks depends on the tree, not just on the cluster a
+# line went into: a new cluster or a generalized template can become the
+# better match. Drain only compares a line with clusters of its token
+# count, so every cluster created / template changed bumps the version of
+# that token count. An entry stamped with an older version is only used
+# after Drain's own tree search still picks its cluster (it is then
+# restamped). Between changes, hits skip the tree search too.
+
+class _CacheEntry:
+    __slots__ = ("cluster_id", "template", "tokens", "length", "version")
+
+    def __init__(self, cluster_id, template, tokens, length, version):
+        self.cluster_id = cluster_id
+        self.template = template
+        self.tokens = tokens  # masked tokens Drain mined (None until needed in "exact" mode)
+        self.length = length  # token count
+        self.version = version
+
+
+class ParseCache:
+    """Bounded LRU: line / masked content → (cluster id, template)."""
+
+    def __init__(self, mode=PARSE_CACHE, max_entries=PARSE_CACHE_SIZE):
+        self.mode = mode
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.versions = {}  # token count → bumped on every cluster created / template changed
+        self.stats = dict.fromkeys(("exact_hits", "masked_hits", "misses", "invalidated", "evicted"), 0)
+
+    def _get(self, tm, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        drain = tm.drain
+        try:
+            cluster = drain.id_to_cluster[entry.cluster_id]  # also keeps Drain's LRU up to date
+        except KeyError:  # evicted by drain_max_clusters
+            cluster = None
+
+        version = self.versions.get(entry.length, 0)
+        if cluster is not None and entry.version != version:
+            if entry.tokens is None:
+                entry.tokens = drain.get_content_as_tokens(tm.masker.mask(key))
+            if drain.tree_search(drain.root_node, entry.tokens, drain.sim_th, False) is not cluster:
+                cluster = None
+            else:
+                entry.template = cluster.get_template()
+                entry.version = version
+
+        if cluster is None:
+            del self.entries[key]
+            self.stats["invalidated"] += 1
+            return None
+        cluster.size += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def _put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def add_log_message(self, tm, line: str):
+        """(cluster id, template) tm.add_log_message(line) would give."""
+        if self.mode == "off":
+            result = tm.add_log_message(line)
+            return result["cluster_id"], result["template_mined"]
+
+        entry = self._get(tm, line)
+        if entry is not None:
+            self.stats["exact_hits"] += 1
+            return entry.cluster_id, entry.template
+
+        masked = None
+        if self.mode == "masked":
+            masked = tm.masker.mask(line)
+            entry = self._get(tm, "\0" + masked)  # own namespace next to exact lines
+            if entry is not None:
+                self.stats["masked_hits"] += 1
+                self._put(line, entry)
+                return entry.cluster_id, entry.template
+
+        self.stats["misses"] += 1
+        result = tm.add_log_message(line)
+        length = len(tm.drain.id_to_cluster[result["cluster_id"]].log_template_tokens)
+        if result["change_type"] != "none":
+            self.versions[length] = self.versions.get(length, 0) + 1
+        tokens = None if masked is None else tm.drain.get_content_as_tokens(masked)
+        entry = _CacheEntry(
+            result["cluster_id"], result["template_mined"], tokens, length, self.versions.get(length, 0)
+        )
+        self._put(line, entry)
+        if masked is not None:
+            self._put("\0" + masked, entry)
+        return entry.cluster_id, entry.template
+
+    def clear(self):
+        self.entries.clear()
+
+    def delta(self, before: dict) -> dict:
+        """Counters since `before` (a copy of .stats) plus the hit rate."""
+        out = {k: v - before.get(k, 0) for k, v in self.stats.items()}
+        out["hit_rate"] = hit_rate(out)
+        return out
+
+
+def hit_rate(counts: dict):
+    hits = counts.get("exact_hits", 0) + counts.get("masked_hits", 0)
+    lookups = hits + counts.get("misses", 0)
+    return round(hits / lookups, 4) if lookups else None
+
+
+def parse_cache(tm, mode=None) -> ParseCache:
+    """The miner's fast-path cache; it lives as long as the (resident) miner."""
+    cache = getattr(tm, "parse_cache", None)
+    if cache is None:
+        cache = tm.parse_cache = ParseCache(mode or PARSE_CACHE)
+    return cache
+
+
+# ==========================================
+# ⚡ Parallel (sharded) Drain3 parsing
+# ==========================================
+# Drain's first tree level is the token count and a message is only ever
+# compared with clusters of the same length. Sharding by token count
+# therefore gives every shard a disjoint set of subtrees: each shard mines
+# exactly what the serial miner would have mined for those lines, and the
+# subtrees can be grafted back onto one tree afterwards.
+#
+# Cluster ids are renumbered by first appearance in the input, which is
+# the order the serial miner creates them in, so EventIds match serial
+# mode as long as drain_max_clusters is not reached.
+
+def _remap_tree(node, id_map):
+    node.cluster_ids = [id_map.get(c, c) for c in node.cluster_ids]
+    for child in node.key_to_child_node.values():
+        _remap_tree(child, id_map)
+
+
+def _mine_shard(seed, items):
+    """
+    Worker: mine one shard of (LineId, line) pairs.
+    `seed` holds the existing subtrees/clusters for the shard's token
+    counts, the global cluster counter, so new ids start above it, the
+    parent miner's masking instructions and its ParseCache mode.
+    """
+    subtrees, clusters, counter, masking, cache_mode = seed
+    cfg = build_template_miner_config()
+    cfg.masking_instructions = masking
+    tm = TemplateMiner(None, cfg)
+
+    tm.drain.root_node.key_to_child_node.update(subtrees)
+    for cluster_id, cluster in clusters.items():
+        tm.drain.id_to_cluster[cluster_id] = cluster
+    tm.drain.clusters_counter = counter
+
+    cache = parse_cache(tm, cache_mode)
+    results = []
+    for line_id, line in items:
+        cluster_id, template = cache.add_log_message(tm, line)
+        results.append((line_id, cluster_id, template))
+
+    subtrees = {
+        key: node for key, node in tm.drain.root_node.key_to_child_node.items()
+    }
+    clusters = {}
+    for key in subtrees:
+        for cluster_id in tm.drain.get_clusters_ids_for_seq_len(int(key)):
+            cluster = tm.drain.id_to_cluster.get(cluster_id)
+            if cluster is not None:
+                clusters[cluster_id] = cluster
+
+    return results, subtrees, clusters
+
+
+def _token_count(tm, line):
+    return len(tm.drain.get_content_as_tokens(tm.masker.mask(line)))
+
+
+def _balance_shards(groups, n_shards):
+    """Greedy bin-packing of token-count groups into n_shards (largest first)."""
+    shards = [[] for _ in range(n_shards)]
+    loads = [0] * n_shards
+
+    for key in sorted(groups, key=lambda k: len(groups[k]), reverse=True):
+        target = loads.index(min(loads))
+        shards[target].append(key)
+        loads[target] += len(groups[key])
+
+    return [keys for keys in shards if keys]
+
+
+def _parse_parallel(lines, tm, progress=None, workers=None):
+    """
+    Sharded Drain3 parsing across a process pool.
+    Returns the same DataFrame as the serial parser and leaves the merged
+    tree in `tm`; the caller snapshots it.
+    """
+    workers = workers or PARSE_WORKERS
+    lines = list(lines)
+
+    if workers <= 1 or len(lines) < PARALLEL_MIN_LINES:
+        return _parse_serial(lines, tm, progress=progress)
+
+    groups = {}
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if line:
+            groups.setdefault(str(_token_count(tm, line)), []).append((i, line))
+
+    if len(groups) <= 1:
+        return _parse_serial(lines, tm, progress=progress)
+
+    base_counter = tm.drain.clusters_counter
+    shard_keys = _balance_shards(groups, workers)
+
+    # Seed each shard with the existing subtrees for its token counts
+    jobs = []
+    for keys in shard_keys:
+        subtrees, clusters = {}, {}
+        for key in keys:
+            node = tm.drain.root_node.key_to_child_node.get(key)
+            if node is None:
+                continue
+            subtrees[key] = node
+            for cluster_id in tm.drain.get_clusters_ids_for_seq_len(int(key)):
+                cluster = tm.drain.id_to_cluster.get(cluster_id)
+                if cluster is not None:
+                    clusters[cluster_id] = cluster
+
+        items = [item for key in keys for item in groups[key]]
+        items.sort()
+        jobs.append(((subtrees, clusters, base_counter, tm.config.masking_instructions, parse_cache(tm).mode), items))
+
+    shard_results = []
+    with ProcessPoolExecutor(
+        max_workers=len(jobs), mp_context=mp.get_context("spawn")
+    ) as pool:
+        futures = [pool.submit(_mine_shard, seed, items) for seed, items in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            if progress:
+                progress(done / len(futures))
+        shard_results = [f.result() for f in futures]
+
+    # New clusters get global ids in order of first appearance
+    first_seen = []
+    for shard_no, (results, _, _) in enumerate(shard_results):
+        seen = set()
+        for line_id, cluster_id, _ in results:
+            if cluster_id > base_counter and cluster_id not in seen:
+                seen.add(cluster_id)
+                first_seen.append((line_id, shard_no, cluster_id))
+    first_seen.sort()
+
+    id_maps = [{} for _ in shard_results]
+    for new_id, (_, shard_no, local_id) in enumerate(first_seen, start=base_counter + 1):
+        id_maps[shard_no][local_id] = new_id
+
+    # Graft the shard subtrees back onto the resident tree
+    rows = []
+    for (results, subtrees, clusters), id_map in zip(shard_results, id_maps):
+        for key, node in subtrees.items():
+            _remap_tree(node, id_map)
+            tm.drain.root_node.key_to_child_node[key] = node
+
+        for cluster_id, cluster in clusters.items():
+            cluster.cluster_id = id_map.get(cluster_id, cluster_id)
+            tm.drain.id_to_cluster[cluster.cluster_id] = cluster
+
+        for line_id, cluster_id, template in results:
+            rows.append((line_id, id_map.get(cluster_id, cluster_id), template))
+
+    tm.drain.clusters_counter = base_counter + len(first_seen)
+    # Grafted clusters are new objects, possibly with generalized templates
+    parse_cache(tm).clear()
+
+    rows.sort()
+
+    return pd.DataFrame({
+        "LineId": [r[0] for r in rows],
+        "Content": [lines[r[0]].strip() for r in rows],
+        "EventId": [r[1] for r in rows],
+        "EventTemplate": [r[2] for r in rows],
+    })
+
+
+# ==========================================
+# ⏱️ Timestamp extraction
+# ==========================================
+# name → (regex with one group, how to parse the group). Tried in order;
+# each pattern only sees the lines earlier patterns did not match.
+TIMESTAMP_FORMATS = {
+    # 2024-05-01 12:00:00(.123) / 2024-05-01T12:00:00
+    "iso": (r"(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d{1,9})?)", "ISO8601"),
+    # BGL: 2005-06-03-15.42.50.675872
+    "bgl": (r"(\d{4}-\d{2}-\d{2}-\d{2}\.\d{2}\.\d{2}\.\d{6})", "%Y-%m-%d-%H.%M.%S.%f"),
+    # Thunderbird / BGL epoch field: "- 1131565352 2005.11.09 ..."
+    "epoch": (r"(?<![\d.])(\d{10})(?![\d.])", "epoch"),
+    # HDFS: 081109 203615
+    "hdfs": (r"^(\d{6} \d{6})\b", "%y%m%d %H%M%S"),
+    # syslog: Nov  9 11:42:32 (no year → SYSLOG_YEAR)
+    "syslog": (r"([A-Z][a-z]{2} {1,2}\d{1,2} \d{2}:\d{2}:\d{2})", "%Y %b %d %H:%M:%S"),
+}
+TIMESTAMP_PATTERNS = [
+    p for p in os.environ.get("LOG_ANALYZER_TIMESTAMP_PATTERNS", "iso,bgl,epoch,hdfs,syslog").split(",")
+    if p.strip()
+]
+TIMESTAMP_HEAD_CHARS = 96        # timestamps sit near the start of a line
+EPOCH_RANGE = (946684800, 4102444800)  # 2000-01-01 … 2100-01-01, rejects random IDs
+SYSLOG_YEAR = int(os.environ.get("LOG_ANALYZER_SYSLOG_YEAR", datetime.now().year))
+
+
+def _parse_timestamps(values: pd.Series, fmt: str) -> pd.Series:
+    if fmt == "epoch":
+        seconds = pd.to_numeric(values, errors="coerce")
+        seconds = seconds.where(seconds.between(*EPOCH_RANGE))
+        return pd.to_datetime(seconds, unit="s", errors="coerce")
+    if fmt == "ISO8601":
+        return pd.to_datetime(values.str.replace(",", ".", regex=False), format=fmt, errors="coerce")
+    if fmt.startswith("%Y %b"):
+        values = f"{SYSLOG_YEAR} " + values.str.replace(r"\s+", " ", regex=True)
+    return pd.to_datetime(values, format=fmt, errors="coerce")
+
+
+def extract_timestamps(contents: pd.Series, patterns=None) -> pd.Series:
+    """
+    Vectorized timestamp extraction: one regex pass per pattern over the
+    lines still unmatched. Returns datetime64 values, NaT where nothing matched.
+    """
+    head = contents.astype(str).str.slice(0, TIMESTAMP_HEAD_CHARS)
+    result = pd.Series(pd.NaT, index=contents.index, dtype="datetime64[ns]")
+
+    for name in patterns or TIMESTAMP_PATTERNS:
+        regex, fmt = TIMESTAMP_FORMATS[name.strip()]
+        missing = result.isna()
+        if not missing.any():
+            break
+
+        found = head[missing].str.extract(regex, expand=False).dropna()
+        if len(found):
+            parsed = _parse_timestamps(found, fmt).dropna()
+            result.loc[parsed.index] = parsed.astype("datetime64[ns]")
+
+    return result
+
+
+# ==========================================
+# 📥 Streaming ingestion
+# ==========================================
+CHUNK_ROWS = 50_000        # rows per pandas chunk (CSV)
+CHUNK_CHARS = 1 << 20      # characters per read (JSON arrays)
+SNIFF_BYTES = 64 * 1024    # sample used to detect the CSV delimiter
+CSV_MESSAGE_COLUMN = "message"  # preferred column; also skipped as a lone header
+
+
+def _report(progress, fh, size):
+    if progress and size:
+        progress(fh.tell() / size)
+
+
+def _file_size(fh):
+    try:
+        return os.fstat(fh.fileno()).st_size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return len(fh.getbuffer()) if hasattr(fh, "getbuffer") else None
+
+
+def _iter_text(fh, progress=None, size=None):
+    """Plain .log / .txt: one line at a time straight from the stream."""
+    text = io.TextIOWrapper(fh, encoding="utf-8", errors="replace")
+    for i, line in enumerate(text):
+        if i % PROGRESS_EVERY == 0:
+            _report(progress, fh, size)
+        yield line.rstrip("\r\n")
+    text.detach()
+
+
+def _iter_csv(fh, progress=None, size=None):
+    """
+    CSV through pandas' C engine in chunks.
+    The delimiter is sniffed from a small sample instead of the whole file;
+    files that don't look like CSV are streamed as plain lines.
+    """
+    sample = fh.read(SNIFF_BYTES).decode("utf-8", errors="replace")
+    fh.seek(0)
+
+    if "\n" in sample:
+        sample = sample[:sample.rindex("\n")]
+
+    try:
+        sep = csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error:
+        # Single-column files don't sniff; still drop a "message" header
+        first = fh.readline().decode("utf-8-sig", errors="replace").strip().strip('"').strip()
+        if first.lower() != CSV_MESSAGE_COLUMN:
+            fh.seek(0)
+        yield from _iter_text(fh, progress, size)
+        return
+
+    header = next(csv.reader(io.StringIO(sample), delimiter=sep), [])
+    if not header:
+        return
+    column = CSV_MESSAGE_COLUMN if CSV_MESSAGE_COLUMN in header else header[0]
+
+    yielded = False
+    try:
+        reader = pd.read_csv(
+            fh,
+            sep=sep,
+            engine="c",
+            usecols=[column],
+            dtype=str,
+            keep_default_na=False,
+            chunksize=CHUNK_ROWS,
+        )
+        for chunk in reader:
+            for value in chunk[column].tolist():
+                yielded = True
+                yield value
+            _report(progress, fh, size)
+
+    except (pd.errors.ParserError, ValueError):
+        if yielded:
+            raise
+        fh.seek(0)
+        yield from _iter_text(fh, progress, size)
+
+
+def _json_key(record):
+    """Column used for a record: "message" if present, else the first key."""
+    if not isinstance(record, dict):
+        return None
+    return "message" if "message" in record else next(iter(record), "")
+
+
+def _json_value(record, key):
+    if isinstance(record, dict):
+        return str(record.get(key, ""))
+    return str(record)
+
+
+def _iter_json_array(text, buf):
+    """Decode a top-level JSON array one element at a time."""
+    decoder = json.JSONDecoder()
+    pos = buf.index("[") + 1
+    key = None
+
+    while True:
+        # Skip separators, refilling the buffer as needed
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf):
+            more = text.read(CHUNK_CHARS)
+            if not more:
+                return
+            buf, pos = buf[pos:] + more, 0
+            continue
+
+        if buf[pos] == "]":
+            return
+
+        try:
+            record, end = decoder.raw_decode(buf, pos)
+            # A number cut at the buffer edge decodes "successfully"
+            if end == len(buf) and not isinstance(record, (dict, list, str)):
+                raise json.JSONDecodeError("truncated", buf, pos)
+        except json.JSONDecodeError:
+            more = text.read(CHUNK_CHARS)
+            if not more:
+                raise
+            buf, pos = buf[pos:] + more, 0
+            continue
+
+        key = key or _json_key(record)
+        yield _json_value(record, key)
+        pos = end
+
+        if pos > CHUNK_CHARS:
+            buf, pos = buf[pos:], 0
+
+
+def _iter_json(fh, progress=None, size=None):
+    """
+    JSON arrays are decoded element by element; NDJSON line by line.
+    A single JSON object (column-oriented) is the only case loaded whole.
+    """
+    text = io.TextIOWrapper(fh, encoding="utf-8", errors="replace")
+    buf = text.read(CHUNK_CHARS)
+    stripped = buf.lstrip()
+
+    if stripped.startswith("["):
+        for i, line in enumerate(_iter_json_array(text, buf)):
+            if i % PROGRESS_EVERY == 0:
+                _report(progress, fh, size)
+            yield line
+        text.detach()
+        return
+
+    first_line = stripped.split("\n", 1)[0]
+    try:
+        first = json.loads(first_line)
+        # {"message": {...}} / {"message": [...]} is one column-oriented document
+        is_ndjson = not (
+            isinstance(first, dict) and first
+            and all(isinstance(v, (dict, list)) for v in first.values())
+        )
+    except json.JSONDecodeError:
+        is_ndjson = False
+
+    if not is_ndjson:
+        df = pd.read_json(io.StringIO(buf + text.read()))
+        column = "message" if "message" in df.columns else df.columns[0]
+        yield from df[column].astype(str).tolist()
+        text.detach()
+        return
+
+    key = None
+    pending = ""
+    while True:
+        lines = (pending + buf).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            key = key or _json_key(record)
+            yield _json_value(record, key)
+        _report(progress, fh, size)
+
+        buf = text.read(CHUNK_CHARS)
+        if not buf:
+            break
+
+    if pending.strip():
+        record = json.loads(pending)
+        yield _json_value(record, key or _json_key(record))
+    text.detach()
+
+
+def iter_log_lines(fh, ext: str, progress=None):
+    """
+    Stream raw log lines out of a binary file object (CSV / JSON / LOG / TXT).
+    Memory stays proportional to one chunk, not to the file.
+    `progress(fraction)` reports bytes consumed when the size is known.
+    """
+    size = _file_size(fh)
+
+    if ext == "csv":
+        return _iter_csv(fh, progress, size)
+    if ext == "json":
+        return _iter_json(fh, progress, size)
+    if ext in {"log", "txt"}:
+        return _iter_text(fh, progress, size)
+
+    raise ValueError("Unsupported file extension")
+
+
+def extract_log_lines(content: str, ext: str):
+    """Turn in-memory uploaded content into a list of raw lines."""
+    return list(iter_log_lines(io.BytesIO(content.encode("utf-8")), ext))
+
+
 # ==========================================
 # 🔥 MAIN FUNCTION
 # ==========================================
@@ -81,34 +738,7 @@ def parse_uploaded_file(content: str, ext: str):
 
     t1 = time.time()
 
-    # --- CSV ---
-    if ext == "csv":
-        try:
-            df = pd.read_csv(io.StringIO(content), sep=None, engine="python")
-            if "message" in df.columns:
-                log_lines = df["message"].astype(str).tolist()
-            else:
-                log_lines = df.iloc[:, 0].astype(str).tolist()
-        except Exception:
-            log_lines = [line for line in content.splitlines()]
-
-    # --- JSON ---
-    elif ext == "json":
-        try:
-            df = pd.read_json(io.StringIO(content))
-            if "message" in df.columns:
-                log_lines = df["message"].astype(str).tolist()
-            else:
-                log_lines = df.iloc[:, 0].astype(str).tolist()
-        except Exception:
-            log_lines = [str(x) for x in json.loads(content)]
-
-    # --- LOG / TXT ---
-    elif ext in {"log", "txt"}:
-        log_lines = content.splitlines()
-
-    else:
-        raise ValueError("Unsupported file extension")
+    log_lines = extract_log_lines(content, ext)
 
     print(f"✔ Step 1 Done in {time.time() - t1:.2f} seconds")
     print(f"📌 Extracted {len(log_lines)} lines")
@@ -0,0 +1,236 @@
+"""
+Per-upload analysis summaries, computed once at ingest time.
+
+`summarize(df)` reduces a parsed + scored result DataFrame to a small,
+bounded JSON-friendly dict (template frequencies, anomalies per template,
+score histogram / quantiles, top anomalous lines). It is stored on the
+Upload row, so the analysis page and the JSON API never touch the full
+results.
+
+Windowed (memory-capped) jobs never hold all rows at once; they feed each
+window to a SummaryBuilder, which merges the same statistics as it goes.
+Its state is stored next to the summary, so an append only merges the
+new lines into it instead of re-reading the upload's results.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# ==============================
+# CONFIG
+# ==============================
+TOP_TEMPLATES = 100     # rows kept in the template table
+TOP_LINES = 50          # most anomalous lines kept
+HIST_BINS = 20          # score histogram over [0, 1]
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+QUANTILE_BINS = 10_000  # SummaryBuilder quantiles are exact to 1 / QUANTILE_BINS
+MAX_CONTENT_CHARS = 500
+SUMMARY_VERSION = 1
+
+
+def _templates(df: pd.DataFrame, has_scores: bool):
+    agg = {"count": ("EventId", "size")}
+    if has_scores:
+        agg["anomalies"] = ("pred_label", "sum")
+        agg["mean_score"] = ("anomaly_score", "mean")
+
+    grouped = df.groupby("EventId", observed=True, sort=False)
+    table = grouped.agg(**agg)
+    table["template"] = grouped["EventTemplate"].first().astype(str)
+    table = table.sort_values("count", ascending=False).head(TOP_TEMPLATES)
+
+    rows = []
+    for event_id, row in table.iterrows():
+        item = {"event_id": int(event_id), "template": row["template"], "count": int(row["count"])}
+        if has_scores:
+            item["anomalies"] = int(row["anomalies"])
+            item["mean_score"] = round(float(row["mean_score"]), 4)
+        rows.append(item)
+    return rows
+
+
+def _scores(df: pd.DataFrame):
+    scores = df["anomaly_score"].to_numpy(dtype=np.float64)
+    counts, edges = np.histogram(scores, bins=HIST_BINS, range=(0.0, 1.0))
+    return {
+        "histogram": {"edges": [round(float(e), 4) for e in edges], "counts": counts.tolist()},
+        "quantiles": {
+            f"p{int(q * 100)}": round(float(v), 4)
+            for q, v in zip(QUANTILES, np.quantile(scores, QUANTILES))
+        },
+        "mean": round(float(scores.mean()), 4),
+        "max": round(float(scores.max()), 4),
+    }
+
+
+def _top_lines(df: pd.DataFrame):
+    top = df.nlargest(TOP_LINES, "anomaly_score")
+    return [
+        {
+            "line_id": int(row.LineId),
+            "event_id": int(row.EventId),
+            "score": round(float(row.anomaly_score), 4),
+            "label": int(row.pred_label),
+            "content": str(row.Content)[:MAX_CONTENT_CHARS],
+        }
+        for row in top.itertuples(index=False)
+    ]
+
+
+def summarize(df: pd.DataFrame, threshold: float = None, top_anomalies: list = None) -> dict:
+    """Bounded-size summary of one upload's results."""
+    has_scores = "anomaly_score" in df.columns and "pred_label" in df.columns
+    rows = len(df)
+
+    summary = {
+        "version": SUMMARY_VERSION,
+        "rows": rows,
+        "distinct_templates": int(df["EventId"].nunique()) if rows else 0,
+        "templates": _templates(df, has_scores) if rows else [],
+    }
+
+    if has_scores and rows:
+        anomalies = int((df["pred_label"] == 1).sum())
+        summary.update({
+            "anomalies": anomalies,
+            "anomaly_rate": round(anomalies / rows, 6),
+            "threshold": threshold,
+            "scores": _scores(df),
+            "top_anomalies": top_anomalies if top_anomalies is not None else _top_lines(df),
+        })
+
+    return summary
+
+
+# Columns SummaryBuilder.add needs for everything but the top lines
+SUMMARY_COLUMNS = ["EventId", "EventTemplate", "anomaly_score", "pred_label"]
+
+
+class SummaryBuilder:
+    """
+    summarize() for results that arrive window by window. Per-template
+    totals, the score histograms and the running top lines are merged as
+    windows are added, so memory depends on the number of templates, not
+    of lines. Quantiles are read off a QUANTILE_BINS-bin histogram.
+    Frames without Content (SUMMARY_COLUMNS only) leave the top lines alone.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.has_scores = False
+        self.templates = {}  # EventId → [count, anomalies, score sum, template]
+        self.anomalies = 0
+        self.score_sum = 0.0
+        self.score_min = 1.0
+        self.score_max = 0.0
+        self.histogram = np.zeros(HIST_BINS, dtype=np.int64)
+        self.fine = np.zeros(QUANTILE_BINS, dtype=np.int64)
+        self.top = []
+
+    def add(self, df: pd.DataFrame):
+        if not len(df):
+            return
+        self.has_scores = "anomaly_score" in df.columns and "pred_label" in df.columns
+        self.rows += len(df)
+
+        agg = {"count": ("EventId", "size"), "template": ("EventTemplate", "first")}
+        if self.has_scores:
+            agg["anomalies"] = ("pred_label", "sum")
+            agg["score_sum"] = ("anomaly_score", "sum")
+        table = df.groupby("EventId", observed=True, sort=False).agg(**agg)
+
+        for event_id, row in table.iterrows():
+            # The first template seen for an id wins, as in summarize()
+            item = self.templates.setdefault(int(event_id), [0, 0, 0.0, str(row["template"])])
+            item[0] += int(row["count"])
+            if self.has_scores:
+                item[1] += int(row["anomalies"])
+                item[2] += float(row["score_sum"])
+
+        if not self.has_scores:
+            return
+        scores = df["anomaly_score"].to_numpy(dtype=np.float64)
+        self.anomalies += int((df["pred_label"] == 1).sum())
+        self.score_sum += float(scores.sum())
+        self.score_min = min(self.score_min, float(scores.min()))
+        self.score_max = max(self.score_max, float(scores.max()))
+        self.histogram += np.histogram(scores, bins=HIST_BINS, range=(0.0, 1.0))[0]
+        self.fine += np.histogram(scores, bins=QUANTILE_BINS, range=(0.0, 1.0))[0]
+        if "Content" in df.columns:
+            merged = self.top + _top_lines(df)
+            self.top = sorted(merged, key=lambda line: -line["score"])[:TOP_LINES]
+
+    def state(self) -> dict:
+        """JSON-friendly state; from_state() continues from it."""
+        fine = np.flatnonzero(self.fine)
+        return {
+            "version": SUMMARY_VERSION,
+            "rows": self.rows,
+            "has_scores": self.has_scores,
+            "templates": [[event_id, *item] for event_id, item in self.templates.items()],
+            "anomalies": self.anomalies,
+            "score_sum": self.score_sum,
+            "score_min": self.score_min,
+            "score_max": self.score_max,
+            "histogram": self.histogram.tolist(),
+            "fine": [fine.tolist(), self.fine[fine].tolist()],  # sparse: bins, counts
+            "top": self.top,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "SummaryBuilder":
+        builder = cls()
+        builder.rows = state["rows"]
+        builder.has_scores = state["has_scores"]
+        builder.templates = {event_id: item for event_id, *item in state["templates"]}
+        builder.anomalies = state["anomalies"]
+        builder.score_sum = state["score_sum"]
+        builder.score_min = state["score_min"]
+        builder.score_max = state["score_max"]
+        builder.histogram = np.asarray(state["histogram"], dtype=np.int64)
+        bins, counts = state["fine"]
+        builder.fine[bins] = counts
+        builder.top = state["top"]
+        return builder
+
+    def _quantile(self, q: float) -> float:
+        cumulative = np.cumsum(self.fine)
+        i = int(np.searchsorted(cumulative, q * cumulative[-1]))
+        value = (i + 0.5) / QUANTILE_BINS
+        return min(max(value, self.score_min), self.score_max)
+
+    def result(self, threshold: float = None) -> dict:
+        """The summary summarize() would give for all rows added so far."""
+        ranked = sorted(self.templates.items(), key=lambda kv: -kv[1][0])[:TOP_TEMPLATES]
+        templates = []
+        for event_id, (count, anomalies, score_sum, template) in ranked:
+            item = {"event_id": event_id, "template": template, "count": count}
+            if self.has_scores:
+                item["anomalies"] = anomalies
+                item["mean_score"] = round(score_sum / count, 4)
+            templates.append(item)
+
+        summary = {
+            "version": SUMMARY_VERSION,
+            "rows": self.rows,
+            "distinct_templates": len(self.templates),
+            "templates": templates,
+        }
+
+        if self.has_scores and self.rows:
+            edges = np.linspace(0.0, 1.0, HIST_BINS + 1)
+            summary.update({
+                "anomalies": self.anomalies,
+                "anomaly_rate": round(self.anomalies / self.rows, 6),
+                "threshold": threshold,
+                "scores": {
+                    "histogram": {"edges": [round(float(e), 4) for e in edges], "counts": self.histogram.tolist()},
+                    "quantiles": {f"p{int(q * 100)}": round(self._quantile(q), 4) for q in QUANTILES},
+                    "mean": round(self.score_sum / self.rows, 4),
+                    "max": round(self.score_max, 4),
+                },
+                "top_anomalies": self.top,
+            })
+
+        return summary
@@ -1,8 +1,10 @@
 from flask import Blueprint, request, render_template, redirect, url_for, session, flash
 from sqlmodel import Session, select
 from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import User, engine
+from storage import write
 import re
 
 
@@ -23,6 +25,16 @@ def is_strong_password(password):
     return True, ""
 
 
+def _taken(username, email):
+    """The signup error for an existing username / email, or None."""
+    with Session(engine) as db:
+        if db.exec(select(User).where(User.username == username)).first():
+            return "Username already exists."
+        if db.exec(select(User).where(User.email == email)).first():
+            return "Email already registered."
+    return None
+
+
 # ✅ Signup route
 @auth_bp.route('/signup', methods=['GET', 'POST'])
 def signup():
@@ -40,18 +52,18 @@ def signup():
             flash(message, "error")
             return render_template("signup.html")
 
-        with Session(engine) as db:
-            if db.exec(select(User).where(User.username == username)).first():
-                flash("Username already exists.", "error")
-                return render_template("signup.html")
-
-            if db.exec(select(User).where(User.email == email)).first():
-                flash("Email already registered.", "error")
-                return render_template("signup.html")
+        taken = _taken(username, email)
+        if taken:
+            flash(taken, "error")
+            return render_template("signup.html")
 
-            hashed = generate_password_hash(password)
-            db.add(User(username=username, email=email, password=hashed))
-            db.commit()
+        hashed = generate_password_hash(password)
+        try:
+            write(lambda db: db.add(User(username=username, email=email, password=hashed)))
+        except IntegrityError:
+            # A concurrent signup took the name / email after the check above
+            flash(_taken(username, email) or "Username already exists.", "error")
+            return render_template("signup.html")
 
         # ❌ No success message shown
         return redirect(url_for('auth.signin'))
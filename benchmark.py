@@ -0,0 +1,648 @@
+"""
+Reproducible benchmark of the upload pipeline, stage by stage and end to end.
+
+    python benchmark.py                        # test.csv at 1x, 10x and 100x
+    python benchmark.py --scales 1,10 --repeat 5
+    python benchmark.py --update-baseline      # accept this run as the baseline
+    python benchmark.py --scales 1,10,100 --window-lines 5000   # flat-memory check
+    python benchmark.py --masking none,syslog,hdfs              # profiles to compare
+
+Everything runs in a scratch directory (its own users.db, blobs, results,
+score cache and Drain3 state) with a tiny randomly initialised BERT
+stand-in built on the fly, so no ILFA_Deployment weights, network access
+or real data are touched. Numbers therefore measure the pipeline around
+the model, not the production model itself.
+
+Stages, each on the same dataset:
+
+  ingest     raw bytes → lines (Log_parser.iter_log_lines)
+  parse      Drain3 template mining
+  tokenize   tokenizer over the lines
+  inference  model forward passes only (tokenization excluded)
+  serialize  summary + Parquet results + compressed raw blob
+  db_write   Upload row through the single writer (latency only)
+  pipeline   the whole job (jobs._ingest_new), cold score cache and miner;
+             skipped above --pipeline-max-lines, where the all-in-memory
+             job outgrows small machines (report["skipped"])
+  windowed   the same job in memory-capped mode (jobs._ingest_windowed),
+             each sample in a fresh process so its peak RSS is the job's
+             own; it should stay flat from one scale to the next
+
+Per masking profile (report["masking"]), a fresh miner without the
+parse cache mines the dataset: cluster count, parse lines/s, and masking
+alone as one combined regex vs. one stock Drain3 instruction per mask.
+
+Every stage runs `repeat` times. "seconds" and "lines_per_s" use the
+median pass, "iqr_s" is the interquartile range of the pass times.
+Line-wise stages run in CHUNK_LINES chunks and their p50/p95 are per-chunk
+latencies over all passes; for whole-file stages they are per pass. Peak
+RSS is sampled while each stage runs. The report records the machine
+(CPU model, cores, memory, library versions) it was produced on.
+
+The report (JSON) is compared with a stored baseline. The exit code is 1
+when a stage is slower than the baseline beyond the tolerances. Baselines
+are machine-specific: regenerate them with --update-baseline on the
+machine that runs the comparison.
+"""
+
+import os
+import re
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import multiprocessing as mp
+import tempfile
+import threading
+import contextlib
+
+import numpy as np
+
+from metrics import rss_bytes
+from concurrent.futures import ProcessPoolExecutor
+
+
+# ==============================
+# CONFIG
+# ==============================
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET = os.path.join(REPO_DIR, "test.csv")  # one raw log line per row
+REPORT_PATH = "benchmark_report.json"
+BASELINE_PATH = os.path.join(REPO_DIR, "benchmark_baseline.json")
+
+SCALES = (1, 10, 100)
+REPEAT = 3
+CHUNK_LINES = 2_000
+WINDOW_LINES = 10_000  # windowed stage: lines per window
+PIPELINE_MAX_LINES = 100_000  # larger datasets only run the windowed job
+MASKING_PROFILES = ("none", "syslog", "thunderbird", "bgl", "hdfs")
+SEED = 0
+
+# Allowed drift before a stage counts as a regression
+THROUGHPUT_TOLERANCE = 0.25   # lines/s may drop by 25 %
+LATENCY_TOLERANCE = 0.50      # p95 may grow by 50 % (small samples are noisy)
+RSS_TOLERANCE = 0.25          # peak RSS may grow by 25 %
+
+# Stand-in model: big enough to exercise batching, small enough for CI
+TINY_VOCAB_WORDS = 2_000
+TINY_CONFIG = dict(hidden_size=32, num_hidden_layers=2, num_attention_heads=2, intermediate_size=64)
+
+_DIGITS = re.compile(r"\d+")
+_WORD = re.compile(r"\w+|[^\w\s]")
+
+
+# ==============================
+# Datasets
+# ==============================
+def load_lines(path: str = DATASET):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return [line.rstrip("\r\n") for line in f if line.strip()]
+
+
+def scale_lines(lines, scale: int, seed: int = SEED):
+    """
+    `scale` copies of `lines`. Copies after the first get their numbers
+    (ids, counters, addresses, times) re-drawn, so they do not collapse
+    into the score cache or repeat the same Drain3 parameters.
+    """
+    out = list(lines)
+    for copy in range(1, scale):
+        rng = random.Random(seed * 1_000_003 + copy)
+
+        def redraw(m):
+            return str(rng.randrange(10 ** len(m.group()))).zfill(len(m.group()))
+
+        out.extend(_DIGITS.sub(redraw, line) for line in lines)
+    return out
+
+
+def write_dataset(lines, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+# ==============================
+# Tiny stand-in model
+# ==============================
+def build_tiny_model(path: str, lines, seed: int = SEED):
+    """Random BertForSequenceClassification + word-level vocab from `lines`."""
+    import torch
+    from collections import Counter
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    counts = Counter(w.lower() for line in lines[:50_000] for w in _WORD.findall(line))
+    chars = sorted({c for w in counts for c in w})
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    vocab += [w for w, _ in counts.most_common(TINY_VOCAB_WORDS) if w not in vocab]
+    vocab += [c for c in chars if c not in vocab] + [f"##{c}" for c in chars]
+
+    os.makedirs(path, exist_ok=True)
+    vocab_file = os.path.join(path, "vocab.txt")
+    with open(vocab_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab) + "\n")
+
+    torch.manual_seed(seed)
+    config = BertConfig(vocab_size=len(vocab), num_labels=2, **TINY_CONFIG)
+    BertForSequenceClassification(config).save_pretrained(path)
+    BertTokenizerFast(vocab_file=vocab_file, do_lower_case=True).save_pretrained(path)
+    return path
+
+
+# ==============================
+# Measurement helpers
+# ==============================
+class _PeakRss:
+    """Samples RSS on a thread while the block runs."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+
+@contextlib.contextmanager
+def _quiet():
+    """The pipeline prints progress lines; keep them out of the report output."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _result(lines: int, samples, peak: int, passes=None, throughput: bool = True) -> dict:
+    """
+    `samples`: latencies (per chunk, or per pass for whole-file stages);
+    `passes`: seconds of each full pass over the lines (default: samples).
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    passes = samples if passes is None else np.asarray(passes, dtype=np.float64)
+    median = float(np.median(passes))
+    q1, q3 = np.percentile(passes, [25, 75])
+    return {
+        "lines": lines,
+        "passes": len(passes),
+        "samples": len(samples),
+        "seconds": round(median, 4),
+        "iqr_s": round(float(q3 - q1), 4),
+        "lines_per_s": round(lines / median, 1) if throughput and median else None,
+        "p50_ms": round(float(np.percentile(samples, 50)) * 1000, 3),
+        "p95_ms": round(float(np.percentile(samples, 95)) * 1000, 3),
+        "peak_rss_mb": round(peak / 2 ** 20, 1),
+    }
+
+
+def _machine() -> dict:
+    """What the numbers were measured on."""
+    cpu = platform.processor()
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpu = next((line.split(":", 1)[1].strip() for line in f if line.startswith("model name")), cpu)
+    except OSError:
+        pass
+    try:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        memory = None
+
+    versions = {}
+    for name in ("numpy", "pandas", "pyarrow", "torch", "transformers", "drain3"):
+        try:
+            from importlib.metadata import version
+            versions[name] = version(name)
+        except Exception:
+            versions[name] = None
+
+    import torch
+    return {
+        "cpu": cpu or None,
+        "cpus": os.cpu_count(),
+        "cpus_usable": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "memory_gb": round(memory / 2 ** 30, 1) if memory else None,
+        "versions": versions,
+    }
+
+
+def _chunks(items, size: int = CHUNK_LINES):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class _TimedScorer:
+    """Backend wrapper that only times predict() (tokenization excluded)."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.tensor_type = backend.tensor_type
+        self.elapsed = 0.0
+
+    def predict(self, encodings):
+        t = time.perf_counter()
+        try:
+            return self.backend.predict(encodings)
+        finally:
+            self.elapsed += time.perf_counter() - t
+
+
+def _cold_score_cache():
+    import dl_model
+    cache = dl_model.get_score_cache()
+    cache.conn.execute("DELETE FROM scores")
+    cache.conn.commit()
+
+
+def _new_owner(name: str):
+    from models import User
+    from storage import write
+    owner = User(username=name, email=f"{name}@example.com", password="-")
+    write(lambda db: db.add(owner))
+    return owner
+
+
+def _windowed_sample(path: str, name: str, window_lines: int):
+    """Child process: one cold windowed job; returns (seconds, peak RSS)."""
+    import dl_model
+    import jobs
+
+    with _quiet():
+        dl_model.get_model()
+        _cold_score_cache()
+        owner = _new_owner(name)
+
+        with _PeakRss() as rss:
+            t = time.perf_counter()
+            jobs._ingest_windowed(owner.id, os.path.basename(path), "log", path, jobs._Quiet(), {},
+                                  window_lines=window_lines)
+            elapsed = time.perf_counter() - t
+    return elapsed, rss.peak
+
+
+def _sequential_masker(profile: str):
+    """The profile as one stock MaskingInstruction per pattern (what the combined regex replaces)."""
+    from drain3.masking import LogMasker, MaskingInstruction
+    from masking_profiles import PROFILES, _AFTER, _BEFORE
+
+    instructions = [
+        MaskingInstruction(f"{_BEFORE}(?:{pattern}){_AFTER}", mask) for mask, pattern in PROFILES[profile]
+    ]
+    return LogMasker(instructions, "<", ">")
+
+
+def bench_masking(lines, repeat: int, profiles=MASKING_PROFILES) -> dict:
+    """Cluster count and throughput of each masking profile on `lines`."""
+    from drain3 import TemplateMiner
+    from Log_parser import build_template_miner_config
+
+    out = {}
+    for profile in profiles:
+        parse, mask, sequential = [], [], []
+        sequential_masker = _sequential_masker(profile)
+        for _ in range(repeat):
+            tm = TemplateMiner(None, build_template_miner_config(profile))
+            t = time.perf_counter()
+            for line in lines:
+                tm.add_log_message(line)
+            parse.append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            for line in lines:
+                tm.masker.mask(line)
+            mask.append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            for line in lines:
+                sequential_masker.mask(line)
+            sequential.append(time.perf_counter() - t)
+
+        q1, q3 = np.percentile(parse, [25, 75])
+        out[profile] = {
+            "clusters": len(tm.drain.clusters),
+            "seconds": round(float(np.median(parse)), 4),
+            "iqr_s": round(float(q3 - q1), 4),
+            "lines_per_s": round(len(lines) / float(np.median(parse)), 1),
+            "mask_lines_per_s": round(len(lines) / float(np.median(mask)), 1),
+            "sequential_mask_lines_per_s": round(len(lines) / float(np.median(sequential)), 1),
+        }
+    return out
+
+
+# ==============================
+# Stages
+# ==============================
+def bench_scale(lines, scale: int, repeat: int, window_lines: int = WINDOW_LINES,
+                pipeline_max_lines: int = PIPELINE_MAX_LINES) -> dict:
+    """All stages on `lines` (already scaled). Runs inside the scratch directory."""
+    from Log_parser import iter_log_lines, parse_log_lines
+    import dl_model
+    from analysis import summarize
+    from result_store import write_results
+    from blob_store import put_file
+    from models import Upload, User
+    from storage import write
+    import jobs
+
+    n = len(lines)
+    path = write_dataset(lines, f"bench_{scale}x.log")
+    data = open(path, "rb").read()
+    stages = {}
+
+    # ---------------- ingest ----------------
+    raw_chunks = [("\n".join(chunk) + "\n").encode("utf-8") for chunk in _chunks(lines)]
+    samples, passes = [], []
+    with _PeakRss() as rss:
+        for r in range(repeat):
+            start = len(samples)
+            for raw in raw_chunks:
+                t = time.perf_counter()
+                sum(1 for _ in iter_log_lines(io.BytesIO(raw), "log"))
+                samples.append(time.perf_counter() - t)
+            passes.append(sum(samples[start:]))
+    stages["ingest"] = _result(n, samples, rss.peak, passes)
+
+    # ---------------- parse ----------------
+    samples, passes, frames = [], [], []
+    with _PeakRss() as rss, _quiet():
+        for r in range(repeat):
+            # A fresh tenant per pass: every pass mines from an empty tree
+            start = len(samples)
+            for i, chunk in enumerate(_chunks(lines)):
+                t = time.perf_counter()
+                df = parse_log_lines(chunk, tenant=f"bench_{scale}x_{r}", line_offset=i * CHUNK_LINES)
+                samples.append(time.perf_counter() - t)
+                if r == 0:
+                    frames.append(df)
+            passes.append(sum(samples[start:]))
+    stages["parse"] = _result(n, samples, rss.peak, passes)
+
+    import pandas as pd
+    df = pd.concat(frames, ignore_index=True)
+    texts = df["Content"].astype(str).tolist()
+
+    # ---------------- tokenize ----------------
+    model = dl_model.get_model()
+    samples, passes = [], []
+    with _PeakRss() as rss:
+        for r in range(repeat):
+            start = len(samples)
+            for chunk in _chunks(texts):
+                t = time.perf_counter()
+                model.tokenizer(chunk, truncation=True, max_length=dl_model.MAX_LENGTH)
+                samples.append(time.perf_counter() - t)
+            passes.append(sum(samples[start:]))
+    stages["tokenize"] = _result(n, samples, rss.peak, passes)
+
+    # ---------------- inference ----------------
+    samples, passes, scores = [], [], []
+    with _PeakRss() as rss, _quiet():
+        for r in range(repeat):
+            start = len(samples)
+            for chunk in _chunks(texts):
+                scorer = _TimedScorer(model.backend)
+                chunk_scores, _ = dl_model._score_texts(chunk, scorer=scorer)
+                samples.append(scorer.elapsed)
+                if r == 0:
+                    scores.append(chunk_scores)
+            passes.append(sum(samples[start:]))
+    stages["inference"] = _result(n, samples, rss.peak, passes)
+
+    df["anomaly_score"] = np.concatenate(scores)
+    df["pred_label"] = (df["anomaly_score"] >= dl_model.THRESHOLD).astype(int)
+
+    # ---------------- serialize ----------------
+    samples, summary = [], None
+    with _PeakRss() as rss:
+        for r in range(repeat):
+            t = time.perf_counter()
+            summary = json.dumps(summarize(df, threshold=dl_model.THRESHOLD))
+            write_results(df, os.path.join("results", f"bench_{scale}x_{r}.parquet"))
+            put_file(path)
+            samples.append(time.perf_counter() - t)
+    stages["serialize"] = _result(n, samples, rss.peak)
+
+    # ---------------- db_write ----------------
+    user = User(username=f"bench_{scale}x", email=f"bench_{scale}x@example.com", password="-")
+    write(lambda db: db.add(user))
+    samples = []
+    with _PeakRss() as rss:
+        for r in range(repeat):
+            upload = Upload(user_id=user.id, filename=f"bench_{scale}x_{r}.log", summary=summary,
+                            result_rows=n, filesize=len(data))
+            t = time.perf_counter()
+            write(lambda db: db.add(upload))
+            samples.append(time.perf_counter() - t)
+    stages["db_write"] = _result(n, samples, rss.peak, throughput=False)  # one row, any size
+
+    # ---------------- pipeline ----------------
+    samples = []
+    with _PeakRss() as rss, _quiet():
+        for r in range(repeat if n <= pipeline_max_lines else 0):
+            # Cold: empty score cache, new user (fresh Drain3 miner)
+            _cold_score_cache()
+            owner = _new_owner(f"bench_{scale}x_{r}")
+
+            t = time.perf_counter()
+            jobs._ingest_new(owner.id, f"bench_{scale}x.log", "log", path, jobs._Quiet(), {})
+            samples.append(time.perf_counter() - t)
+    if samples:
+        stages["pipeline"] = _result(n, samples, rss.peak)
+
+    # ---------------- windowed ----------------
+    samples, peak = [], 0
+    for r in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+            elapsed, sample_peak = pool.submit(
+                _windowed_sample, os.path.abspath(path), f"bench_{scale}x_w{r}", window_lines
+            ).result()
+        samples.append(elapsed)
+        peak = max(peak, sample_peak)
+    stages["windowed"] = _result(n, samples, peak)
+
+    return stages
+
+
+def run(scales=SCALES, repeat: int = REPEAT, dataset: str = DATASET, window_lines: int = WINDOW_LINES,
+        masking=MASKING_PROFILES, report_path: str = None,
+        pipeline_max_lines: int = PIPELINE_MAX_LINES) -> dict:
+    """
+    Build the scratch environment, run every scale, return the report.
+    With `report_path`, the report so far is also written after each
+    scale, so a long run that dies keeps the scales it finished.
+    """
+    lines = load_lines(dataset)
+    scratch = tempfile.mkdtemp(prefix="log_analyzer_bench_")
+    cwd = os.getcwd()
+
+    try:
+        os.chdir(scratch)
+        sys.path.insert(0, REPO_DIR)
+        os.environ.setdefault("LOG_ANALYZER_WARM_UP", "0")
+
+        import dl_model
+        from Log_parser import PARSE_CACHE
+        from masking_profiles import DEFAULT_PROFILE
+        build_tiny_model(dl_model.MODEL_DIR, lines)
+
+        from storage import init_db
+        with _quiet():
+            init_db()
+            t = time.perf_counter()
+            dl_model.get_model()
+            model_load = time.perf_counter() - t
+
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                **_machine(),
+                "backend": dl_model.BACKEND,
+                "dedup": dl_model.DEDUP_MODE,
+                "masking_profile": DEFAULT_PROFILE,
+                "parse_cache": PARSE_CACHE,
+                "dataset": os.path.basename(dataset),
+                "chunk_lines": CHUNK_LINES,
+                "window_lines": window_lines,
+                "pipeline_max_lines": pipeline_max_lines,
+                "repeat": repeat,
+            },
+            "model_load_s": round(model_load, 3),
+            "scales": {},
+            "masking": {},
+            "skipped": [],
+        }
+
+        for scale in scales:
+            print(f"⏱️  {scale}x ({len(lines) * scale:,} lines)...")
+            stages = bench_scale(scale_lines(lines, scale), scale, repeat, window_lines, pipeline_max_lines)
+            report["scales"][f"{scale}x"] = stages
+            if "pipeline" not in stages:
+                report["skipped"].append(f"{scale}x/pipeline")
+                print(f"   ➤ pipeline skipped: {len(lines) * scale:,} lines > --pipeline-max-lines")
+            for name, stats in stages.items():
+                rate = f"{stats['lines_per_s']:>12,.0f} lines/s" if stats["lines_per_s"] else f"{'-':>12} lines/s"
+                print(f"   ➤ {name:<10} {rate}  "
+                      f"pass {stats['seconds']:>8.3f} s ± IQR {stats['iqr_s']:<7.3f}  "
+                      f"p50 {stats['p50_ms']:>9.2f} ms  p95 {stats['p95_ms']:>9.2f} ms  "
+                      f"RSS {stats['peak_rss_mb']:>7.1f} MB")
+
+            if masking:
+                profiles = bench_masking(scale_lines(lines, scale), repeat, masking)
+                report["masking"][f"{scale}x"] = profiles
+                for profile, stats in profiles.items():
+                    print(f"   ➤ mask {profile:<12} {stats['clusters']:>6} clusters  "
+                          f"parse {stats['lines_per_s']:>10,.0f} lines/s  "
+                          f"mask {stats['mask_lines_per_s']:>10,.0f} lines/s "
+                          f"(per-mask regexes {stats['sequential_mask_lines_per_s']:,.0f})")
+
+            if report_path:
+                with open(report_path, "w") as f:
+                    json.dump(report, f, indent=2)
+        return report
+
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+# ==============================
+# Baseline comparison
+# ==============================
+def compare(report: dict, baseline: dict, throughput_tol: float = THROUGHPUT_TOLERANCE,
+            latency_tol: float = LATENCY_TOLERANCE, rss_tol: float = RSS_TOLERANCE):
+    """Regressions of `report` against `baseline` as human-readable strings."""
+    problems = []
+    for scale, stages in report["scales"].items():
+        for name, now in stages.items():
+            before = baseline.get("scales", {}).get(scale, {}).get(name)
+            if not before:
+                continue
+            label = f"{scale}/{name}"
+            if before.get("lines_per_s") and now["lines_per_s"] is not None \
+                    and now["lines_per_s"] < before["lines_per_s"] * (1 - throughput_tol):
+                problems.append(f"{label}: {now['lines_per_s']:,.0f} lines/s < baseline {before['lines_per_s']:,.0f}")
+            if before.get("p95_ms") and now["p95_ms"] > before["p95_ms"] * (1 + latency_tol):
+                problems.append(f"{label}: p95 {now['p95_ms']:.2f} ms > baseline {before['p95_ms']:.2f} ms")
+            if before.get("peak_rss_mb") and now["peak_rss_mb"] > before["peak_rss_mb"] * (1 + rss_tol):
+                problems.append(f"{label}: peak RSS {now['peak_rss_mb']:.1f} MB > baseline {before['peak_rss_mb']:.1f} MB")
+
+    for scale, profiles in report.get("masking", {}).items():
+        for profile, now in profiles.items():
+            before = baseline.get("masking", {}).get(scale, {}).get(profile)
+            if before and now["lines_per_s"] < before["lines_per_s"] * (1 - throughput_tol):
+                problems.append(f"{scale}/mask {profile}: {now['lines_per_s']:,.0f} lines/s "
+                                f"< baseline {before['lines_per_s']:,.0f}")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the log analysis pipeline.")
+    parser.add_argument("--scales", default=",".join(map(str, SCALES)), help="e.g. 1,10,100")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="samples for whole-file stages")
+    parser.add_argument("--dataset", default=DATASET)
+    parser.add_argument("--window-lines", type=int, default=WINDOW_LINES, help="window size of the windowed stage")
+    parser.add_argument("--pipeline-max-lines", type=int, default=PIPELINE_MAX_LINES,
+                        help="skip the in-memory pipeline stage above this many lines")
+    parser.add_argument("--masking", default=",".join(MASKING_PROFILES),
+                        help="masking profiles to compare, e.g. none,syslog ('' to skip)")
+    parser.add_argument("--report", default=REPORT_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="write this run as the baseline")
+    parser.add_argument("--throughput-tolerance", type=float, default=THROUGHPUT_TOLERANCE)
+    parser.add_argument("--latency-tolerance", type=float, default=LATENCY_TOLERANCE)
+    parser.add_argument("--rss-tolerance", type=float, default=RSS_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    masking = [p for p in args.masking.split(",") if p.strip()]
+    report_path = os.path.abspath(args.report)
+    report = run(scales, args.repeat, os.path.abspath(args.dataset), args.window_lines, masking, report_path,
+                 args.pipeline_max_lines)
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Report written to {args.report}")
+
+    if args.update_baseline:
+        shutil.copyfile(args.report, args.baseline)
+        print(f"📌 Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠️ No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    problems = compare(report, baseline, args.throughput_tolerance, args.latency_tolerance, args.rss_tolerance)
+
+    if problems:
+        print("❌ Performance regressions:")
+        for problem in problems:
+            print(f"   ➤ {problem}")
+        return 1
+
+    print("✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+Power BI export: one partition per upload instead of one shared CSV.
+
+Every upload's results are exported to
+
+    EXPORT_DIR/user=<user_id>/upload=<upload_id>/part-NNNNN.parquet
+
+(Hive-style folders, so Power BI / pyarrow see user and upload as
+columns). A new upload writes part 0, each append to it one more part
+with the appended rows only. Files are written to a dot-prefixed temp
+name and renamed into place, so a refresh never reads a half-written
+part, and concurrent jobs never touch each other's files.
+
+MANIFEST is an append-only JSON-lines log of written and removed
+partitions: {"op": "add" | "remove", "path", "user_id", "upload_id",
+"rows", "written_at"}. A BI refresh remembers how many lines it has
+read and only loads the parts added since. Each entry is a single
+O_APPEND write, safe across worker processes.
+
+The export runs in the job worker after the upload is saved, reading
+the stored results in batches; it never runs in a request.
+"""
+
+import os
+import json
+import shutil
+from datetime import datetime
+
+import pyarrow.parquet as pq
+
+from result_store import COMPRESSION, to_table
+
+
+# ==============================
+# CONFIG
+# ==============================
+EXPORT_DIR = "powerbi_output"
+MANIFEST = os.path.join(EXPORT_DIR, "manifest.jsonl")
+EXPORT_FORMAT = os.environ.get("LOG_ANALYZER_BI_FORMAT", "parquet")  # parquet | csv | off
+BATCH_ROWS = 50_000  # rows read from the stored results per write
+
+
+def partition_dir(user_id: int, upload_id: int) -> str:
+    return os.path.join(EXPORT_DIR, f"user={int(user_id)}", f"upload={int(upload_id)}")
+
+
+def _next_part(folder: str) -> str:
+    numbers = [
+        int(name[len("part-"):].split(".")[0])
+        for name in os.listdir(folder) if name.startswith("part-")
+    ]
+    n = max(numbers) + 1 if numbers else 0
+    return os.path.join(folder, f"part-{n:05d}.{EXPORT_FORMAT}")
+
+
+def _log(entry: dict):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    entry["written_at"] = datetime.utcnow().isoformat(timespec="seconds")
+    line = (json.dumps(entry) + "\n").encode("utf-8")
+    fd = os.open(MANIFEST, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def _write_parquet(frames, tmp_path: str) -> int:
+    writer, rows = None, 0
+    try:
+        for df in frames:
+            table = to_table(df)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema, compression=COMPRESSION)
+            writer.write_table(table.cast(writer.schema))
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def _write_csv(frames, tmp_path: str) -> int:
+    rows = 0
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        for df in frames:
+            df.to_csv(f, index=False, header=rows == 0)
+            rows += len(df)
+    return rows
+
+
+def export_upload(user_id: int, upload_id: int, frames):
+    """
+    Write `frames` (an iterable of result DataFrames) as the upload's next
+    partition part and record it in the manifest. Returns the manifest
+    entry, or None when exporting is off or there was nothing to write.
+    """
+    if EXPORT_FORMAT == "off":
+        return None
+
+    folder = partition_dir(user_id, upload_id)
+    os.makedirs(folder, exist_ok=True)
+    path = _next_part(folder)
+    tmp_path = os.path.join(folder, f".{os.path.basename(path)}.tmp")
+
+    try:
+        write = _write_csv if EXPORT_FORMAT == "csv" else _write_parquet
+        rows = write(frames, tmp_path)
+        if not rows:
+            return None
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    entry = {
+        "op": "add",
+        "path": os.path.relpath(path, EXPORT_DIR),
+        "user_id": int(user_id),
+        "upload_id": int(upload_id),
+        "rows": rows,
+    }
+    _log(entry)
+    return entry
+
+
+def remove_upload(user_id: int, upload_id: int):
+    """Drop an upload's partition (its uploads row is being deleted)."""
+    folder = partition_dir(user_id, upload_id)
+    if not os.path.isdir(folder):
+        return
+    shutil.rmtree(folder)
+    _log({
+        "op": "remove",
+        "path": os.path.relpath(folder, EXPORT_DIR),
+        "user_id": int(user_id),
+        "upload_id": int(upload_id),
+    })
+
+
+def read_manifest(since: int = 0):
+    """
+    Manifest entries from line `since` on, plus the line count to pass as
+    `since` next time: a refresh loads the "add" parts and drops the
+    "remove"d folders it got.
+    """
+    if not os.path.exists(MANIFEST):
+        return [], 0
+    with open(MANIFEST, encoding="utf-8") as f:
+        lines = f.readlines()
+    entries = [json.loads(line) for line in lines[since:] if line.endswith("\n")]
+    return entries, since + len(entries)
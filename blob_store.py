@@ -0,0 +1,228 @@
+"""
+Content-addressed, compressed blob store for raw uploaded logs.
+
+A raw log is stored exactly once, compressed, at BLOB_DIR/<h[:2]>/<h>
+where h is the SHA-256 of the original bytes. Re-uploading the same file
+costs no extra disk. zstd is used when the `zstandard` package is
+installed, gzip otherwise; readers detect the codec from the magic bytes,
+so both kinds can live side by side.
+
+Blobs are written and read as streams; a multi-GB log never has to be in
+memory at once. Appended bytes are stored as further segments chained to
+the upload's blob (see append_segment).
+"""
+
+import io
+import os
+import gzip
+import hashlib
+import shutil
+import uuid
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# ==============================
+# CONFIG
+# ==============================
+BLOB_DIR = "blobs"
+CHUNK_SIZE = 1 << 20
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def blob_path(digest: str) -> str:
+    return os.path.join(BLOB_DIR, digest[:2], digest)
+
+
+class _HashingReader:
+    """File wrapper that hashes and counts whatever is read through it."""
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.sha = hashlib.sha256()
+        self.size = 0
+
+    def read(self, n=-1):
+        data = self.fh.read(n)
+        self.sha.update(data)
+        self.size += len(data)
+        return data
+
+
+def _compress(src, dst):
+    if zstandard:
+        zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream(src, dst, read_size=CHUNK_SIZE)
+    else:
+        with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=GZIP_LEVEL, mtime=0) as gz:
+            shutil.copyfileobj(src, gz, CHUNK_SIZE)
+
+
+def put_file(path: str) -> dict:
+    """
+    Compress the file at `path` into the store.
+    Returns {"hash", "size", "stored_size"}; an existing blob is reused.
+    """
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    tmp_path = os.path.join(BLOB_DIR, f".{uuid.uuid4().hex}.tmp")
+
+    with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+        reader = _HashingReader(src)
+        _compress(reader, dst)
+
+    digest = reader.sha.hexdigest()
+    final_path = blob_path(digest)
+
+    if os.path.exists(final_path):
+        os.remove(tmp_path)  # same content already stored
+    else:
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)
+
+    return {
+        "hash": digest,
+        "size": reader.size,
+        "stored_size": os.path.getsize(final_path),
+    }
+
+
+def open_blob(digest: str):
+    """Binary file-like object yielding the decompressed content."""
+    fh = open(blob_path(digest), "rb")
+    magic = fh.read(4)
+    fh.seek(0)
+
+    if magic.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            fh.close()
+            raise RuntimeError("Blob is zstd-compressed but `zstandard` is not installed")
+        # Appended blobs are several frames back to back
+        return zstandard.ZstdDecompressor().stream_reader(fh, closefd=True, read_across_frames=True)
+    if magic.startswith(_GZIP_MAGIC):
+        fh.close()
+        return gzip.open(blob_path(digest), "rb")
+
+    fh.close()
+    raise ValueError(f"Unknown blob format: {digest}")
+
+
+def iter_blob(digest: str, chunk_size: int = CHUNK_SIZE):
+    """Stream-decompress a blob in chunks (for HTTP responses)."""
+    with open_blob(digest) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+# ==============================
+# Appends (incremental uploads)
+# ==============================
+# An appended upload is a chain of segments: its first blob, then one
+# blob per append holding only the appended bytes. Segment i is stored
+# under h_i = SHA-256(h_{i-1} ‖ segment bytes) (h_0 is the plain content
+# hash), so an append never reads what is already stored, and the last
+# digest still identifies the whole content.
+
+def append_segment(digest: str, path: str, offset: int = 0) -> dict:
+    """
+    Store file[offset:] as the segment chained after `digest`.
+    Returns {"hash", "size", "stored_size"} of the new segment.
+    """
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    tmp_path = os.path.join(BLOB_DIR, f".{uuid.uuid4().hex}.tmp")
+
+    with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+        src.seek(offset)
+        reader = _HashingReader(src)
+        reader.sha.update(digest.encode("ascii"))
+        _compress(reader, dst)
+
+    new_digest = reader.sha.hexdigest()
+    final_path = blob_path(new_digest)
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)
+
+    return {
+        "hash": new_digest,
+        "size": reader.size,
+        "stored_size": os.path.getsize(final_path),
+    }
+
+
+def matches_prefix(segments, path: str) -> bool:
+    """True if the file at `path` starts with the content of these (digest, size) segments."""
+    total = sum(size for _, size in segments)
+    if os.path.getsize(path) < total:
+        return False
+
+    previous = None
+    with open(path, "rb") as f:
+        for digest, size in segments:
+            sha = hashlib.sha256()
+            if previous is not None:
+                sha.update(previous.encode("ascii"))
+            remaining = size
+            while remaining:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    return False
+                sha.update(chunk)
+                remaining -= len(chunk)
+            previous = sha.hexdigest()
+            if previous != digest:
+                return False
+    return True
+
+
+class _SegmentReader(io.RawIOBase):
+    """The decompressed segments of an appended upload, read back to back."""
+
+    def __init__(self, digests):
+        self.digests = list(digests)
+        self.current = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self.current is None:
+                if not self.digests:
+                    return 0
+                self.current = open_blob(self.digests.pop(0))
+            data = self.current.read(len(buffer))
+            if data:
+                buffer[:len(data)] = data
+                return len(data)
+            self.current.close()
+            self.current = None
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+        super().close()
+
+
+def open_segments(digests):
+    """Binary file-like object over several blobs in order."""
+    if len(digests) == 1:
+        return open_blob(digests[0])
+    return io.BufferedReader(_SegmentReader(digests), CHUNK_SIZE)
+
+
+def remove_blob(digest: str):
+    path = blob_path(digest)
+    if os.path.exists(path):
+        os.remove(path)
@@ -1,100 +1,379 @@
-# dl_model.py (Ultra Optimized for RTX 2060 SUPER)
+# dl_model.py (CPU / GPU inference with pluggable backends)
+#
+# Importing this module is cheap: transformers / torch / onnxruntime are
+# only imported when the model is first needed (get_model / warm_up).
 
+import os
+import re
+import sys
 import time
+import hashlib
+import threading
+import numpy as np
 import pandas as pd
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from score_cache import ScoreCache, content_key
+from metrics import current_trace
+from inference_server import SERVER_ADDRESS, InferenceClient
 
 # ==============================
 # CONFIG
 # ==============================
 MODEL_DIR = "ILFA_Deployment/best_model_balanced"
 THRESHOLD = 0.8
+MAX_LENGTH = 256
+
+# torch | onnx | onnx-int8  (see inference_backends.py)
+BACKEND = os.environ.get("LOG_ANALYZER_BACKEND", "torch")
 
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# Send cache misses to a shared inference server instead of loading the
+# model in every worker (see inference_server.py)
+INFERENCE_SERVER = SERVER_ADDRESS
 
-print("🔧 Initializing Deep Learning Model...")
-print(f"   ➤ Detected device: {DEVICE}")
 
 # ==============================
-# LOAD TOKENIZER & MODEL
+# LAZY MODEL SINGLETON
 # ==============================
-tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
+class LoadedModel:
+    """Tokenizer + config + inference backend, loaded together once."""
+
+    def __init__(self, backend_name: str = BACKEND):
+        from transformers import AutoTokenizer, AutoConfig
+        from inference_backends import load_backend
+
+        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
+        self.config = AutoConfig.from_pretrained(MODEL_DIR)
+        self.backend = load_backend(backend_name, MODEL_DIR)
+        self.device = self.backend.device
+
+
+_model = None
+_model_lock = threading.Lock()
+load_seconds = None  # how long the (first) load took, for startup tracking
+
+
+def get_model() -> LoadedModel:
+    """Thread-safe lazy load; concurrent callers wait for the same load."""
+    global _model, load_seconds
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                print("🔧 Initializing Deep Learning Model...")
+                t = time.time()
+                model = LoadedModel()
+                load_seconds = time.time() - t
+                print(f"   ➤ Backend: {model.backend.name}  (device={model.device})")
+                print(f"✅ DL Model Loaded and Ready in {load_seconds:.2f}s!\n")
+                _model = model
+    return _model
+
+
+def warm_up(background: bool = True):
+    """Load the model now, optionally on a background thread."""
+    if INFERENCE_SERVER:
+        return  # the model lives in the inference server process
+    if background:
+        threading.Thread(target=get_model, name="dl-model-warm-up", daemon=True).start()
+    else:
+        get_model()
+
+
+# ==============================
+# DEDUP + SCORE CACHE
+# ==============================
+# "exact": identical Content is scored once.
+# "masked": numbers / hex ids / IPs are masked first, so lines that only
+#           differ in timestamps or node ids share one score.
+DEDUP_MODE = os.environ.get("LOG_ANALYZER_DEDUP", "exact")
+
+_MASK_RE = re.compile(
+    r"(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?"   # IPv4 (+port)
+    r"|0x[0-9a-fA-F]+"                      # hex literals
+    r"|\b[0-9a-fA-F]{8,}\b"                # long hex ids / hashes
+    r"|\d+"                                 # any other number
+)
+
+
+def normalize_content(text: str) -> str:
+    return _MASK_RE.sub("<*>", text)
+
+
+def model_version() -> str:
+    """Identifies the weights on disk; part of every score-cache key."""
+    global _model_version
+    if _model_version is None:
+        h = hashlib.blake2b(digest_size=8)
+        h.update(f"{BACKEND}|{MAX_LENGTH}|".encode())
+        for name in sorted(os.listdir(MODEL_DIR)):
+            st = os.stat(os.path.join(MODEL_DIR, name))
+            h.update(f"{name}:{st.st_size}:{st.st_mtime_ns}|".encode())
+        _model_version = h.hexdigest()
+    return _model_version
 
-if DEVICE == "cuda":
-    print("   ➤ Loading model in FP16 (GPU accelerated)...")
-    model = AutoModelForSequenceClassification.from_pretrained(
-        MODEL_DIR,
-        torch_dtype=torch.float16
-    )
-else:
-    print("   ➤ Loading model in FP32 (CPU mode)...")
-    model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR)
 
-model.to(DEVICE)
-model.eval()
+_model_version = None
+_score_cache = None
 
-print("✅ DL Model Loaded and Ready!\n")
+
+def get_score_cache() -> ScoreCache:
+    global _score_cache
+    if _score_cache is None:
+        _score_cache = ScoreCache(model_version())
+    return _score_cache
+
+
+# ==============================
+# LENGTH-BUCKETED DYNAMIC BATCHING
+# ==============================
+# Texts are tokenized once, sorted by token length and packed into batches
+# under a tokens-per-batch budget (rows × longest row), so short lines are
+# no longer padded to the longest line of a fixed 512-row slice.
+TOKEN_BUDGET = int(os.environ.get("LOG_ANALYZER_TOKEN_BUDGET", "0"))  # 0 = auto
+BUDGET_MEMORY_FRACTION = 0.25   # share of free memory activations may use
+TOKENIZE_CHUNK = 50_000         # texts tokenized / bucketed at a time
+
+_token_budget = None
+
+
+def _available_memory(device: str) -> int:
+    if device == "cuda":
+        import torch
+        free, _ = torch.cuda.mem_get_info()
+        return free
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return 2 << 30
+
+
+def get_token_budget() -> int:
+    """Tokens per batch, tuned once from the device and free memory."""
+    global _token_budget
+    if TOKEN_BUDGET:
+        return TOKEN_BUDGET
+
+    if _token_budget is None:
+        m = get_model()
+        dtype_bytes = 2 if m.device == "cuda" else 4
+        # Rough peak activation cost per token for one encoder layer pass
+        per_token = m.config.hidden_size * dtype_bytes * 24
+        budget = int(_available_memory(m.device) * BUDGET_MEMORY_FRACTION / per_token)
+
+        # Past a few thousand tokens CPU batches stop getting faster
+        cap = 65536 if m.device == "cuda" else 16384
+        _token_budget = max(MAX_LENGTH, min(cap, budget))
+        print(f"   ➤ Token budget per batch: {_token_budget}")
+
+    return _token_budget
+
+
+_client = None
+
+
+def _remote_client() -> InferenceClient:
+    global _client
+    if _client is None:
+        _client = InferenceClient(INFERENCE_SERVER)
+    return _client
+
+
+def _make_batches(lengths, budget: int, max_rows: int):
+    """Group indices (sorted by length) so rows × max_len stays under budget."""
+    batches, current = [], []
+
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+        if current and ((len(current) + 1) * lengths[i] > budget or len(current) >= max_rows):
+            batches.append(current)
+            current = []
+        current.append(i)
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _score_texts(texts, batch_size: int = 512, progress=None, scorer=None):
+    """
+    Run the model over `texts`, returning anomaly probabilities in input
+    order plus batching stats. `batch_size` caps rows per batch.
+    `scorer` overrides the configured backend (used by parity_check).
+    With INFERENCE_SERVER set, texts are scored by the shared server.
+    """
+    n = len(texts)
+    scores = np.zeros(n, dtype=np.float32)
+    if not n:
+        # Everything came from the score cache: don't even load the model
+        return scores, {"batches": 0, "token_budget": 0, "padding_efficiency": 1.0}
+
+    if INFERENCE_SERVER and scorer is None:
+        return _remote_client().score(texts, progress)
+
+    trace = current_trace()
+    with trace.span("model_load"):  # waits for a warm-up still in progress
+        m = get_model()
+    scorer = scorer or m.backend
+    budget = get_token_budget()
+    real_tokens = padded_tokens = n_batches = 0
+
+    for chunk_start in range(0, n, TOKENIZE_CHUNK):
+        chunk = texts[chunk_start:chunk_start + TOKENIZE_CHUNK]
+
+        # Tokenize once, no padding yet
+        with trace.span("tokenize"):
+            encoded = m.tokenizer(chunk, truncation=True, max_length=MAX_LENGTH)
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+
+        batches = _make_batches(lengths, budget, batch_size)
+
+        for b, batch in enumerate(batches):
+            t = time.perf_counter()
+            features = {k: [encoded[k][i] for i in batch] for k in encoded.keys()}
+            encodings = m.tokenizer.pad(features, return_tensors=scorer.tensor_type)
+            trace.add("tokenize", time.perf_counter() - t)
+
+            longest = encodings["input_ids"].shape[1]
+            real_tokens += sum(lengths[i] for i in batch)
+            padded_tokens += longest * len(batch)
+            n_batches += 1
+
+            t = time.perf_counter()
+            probs = scorer.predict(encodings)
+            elapsed = time.perf_counter() - t
+            trace.add("inference", elapsed)
+            trace.batch(elapsed)
+
+            # Restore original order
+            scores[[chunk_start + i for i in batch]] = probs
+
+            if progress:
+                progress((chunk_start + (b + 1) / len(batches) * len(chunk)) / n)
+
+        print(f"   ➤ Scored {min(n, chunk_start + TOKENIZE_CHUNK)}/{n} ({len(batches)} batches)")
+
+    batch_stats = {
+        "batches": n_batches,
+        "token_budget": budget,
+        "padding_efficiency": round(real_tokens / padded_tokens, 4) if padded_tokens else 1.0,
+    }
+    return scores, batch_stats
 
 
 # ==============================
 # MAIN INFERENCE FUNCTION
 # ==============================
-def run_dl_on_parsed(df: pd.DataFrame, batch_size: int = 512) -> pd.DataFrame:
+def run_dl_on_parsed(df: pd.DataFrame, batch_size: int = 512, progress=None) -> pd.DataFrame:
     """
     Runs anomaly detection on a structured log DataFrame.
-    GPU optimized for RTX 2060 SUPER.
+    Only unique (optionally masked) contents missing from the score cache
+    go through the model, in length-bucketed batches under a token budget
+    (`batch_size` caps rows per batch); scores are scattered back to every row.
+    Cache hit / miss counts and padding efficiency end up in
+    df.attrs["inference_stats"].
+    `progress(fraction)` is called after every batch when given.
     """
 
     if "Content" not in df.columns:
         raise ValueError("Structured DF must contain 'Content' column.")
 
-    texts = df["Content"].astype(str).tolist()
+    texts = df["Content"].astype(str)
     n = len(texts)
 
-    print(f"🧠 Running Deep Learning Model on {n} lines (device={DEVICE})...")
+    print(f"🧠 Running Deep Learning Model on {n} lines (backend={BACKEND})...")
     t_start = time.time()
 
-    scores = []
-
-    num_batches = max(1, (n + batch_size - 1) // batch_size)
-
-    for b in range(num_batches):
-        start = b * batch_size
-        end = min(start + batch_size, n)
-        batch_texts = texts[start:end]
+    # Dedup: codes[i] → index of row i's unique key
+    keys = texts.map(normalize_content) if DEDUP_MODE == "masked" else texts
+    codes, uniques = pd.factorize(keys)
+    _, first_rows = np.unique(codes, return_index=True)
+    representatives = texts.iloc[first_rows].tolist()
 
-        print(f"   ➤ Batch {b + 1}/{num_batches}  ({start}–{end - 1})")
+    # Cache lookup
+    trace = current_trace()
+    t_cache = time.perf_counter()
+    cache = get_score_cache()
+    hashes = [content_key(f"{DEDUP_MODE}|{u}") for u in uniques]
+    cached = cache.get_many(hashes)
+    trace.add("score_cache", time.perf_counter() - t_cache)
 
-        # Tokenize
-        encodings = tokenizer(
-            batch_texts,
-            padding=True,
-            truncation=True,
-            max_length=256,
-            return_tensors="pt"
-        )
+    todo = [j for j, h in enumerate(hashes) if h not in cached]
+    print(f"   ➤ {len(uniques)} unique inputs, {len(cached)} cached, {len(todo)} to score")
 
-        # Fast transfer to GPU
-        encodings = {k: v.to(DEVICE, non_blocking=True) for k, v in encodings.items()}
+    fresh, batch_stats = _score_texts([representatives[j] for j in todo], batch_size, progress)
+    with trace.span("score_cache"):
+        cache.put_many({hashes[j]: score for j, score in zip(todo, fresh)})
 
-        # GPU optimized inference
-        with torch.inference_mode():
-            logits = model(**encodings).logits
-
-            # 🔥 Softmax on GPU (faster)
-            probs = torch.softmax(logits, dim=-1)[:, 1]
-
-            # Move ONLY the final vector to CPU
-            probs = probs.float().cpu().numpy()
-
-        scores.extend(probs)
+    unique_scores = np.array([cached.get(h, 0.0) for h in hashes], dtype=np.float32)
+    unique_scores[todo] = fresh
 
     # Attach results
-    df["anomaly_score"] = scores
+    df["anomaly_score"] = unique_scores[codes]
     df["pred_label"] = (df["anomaly_score"] >= THRESHOLD).astype(int)
 
+    df.attrs["inference_stats"] = {
+        "rows": n,
+        "unique_inputs": len(uniques),
+        "cache_hits": len(cached),
+        "cache_misses": len(todo),
+        "dedup_mode": DEDUP_MODE,
+        **batch_stats,
+    }
+
     t_total = time.time() - t_start
     print(f"✅ DL Inference Completed in {t_total:.2f} seconds.\n")
 
     return df
+
+
+# ==============================
+# BACKEND PARITY CHECK
+# ==============================
+def parity_check(reference_path: str = "test.csv", backend_name: str = BACKEND, limit: int = None) -> dict:
+    """
+    Score `reference_path` (one log line per row) with the PyTorch baseline
+    and with `backend_name`, bypassing the score cache, and report drift.
+    """
+    with open(reference_path, encoding="utf-8", errors="replace") as f:
+        texts = [line.strip() for line in f if line.strip()]
+    texts = list(dict.fromkeys(texts))[:limit]
+
+    from inference_backends import load_backend
+
+    current = get_model().backend
+    baseline = current if current.name == "torch" else load_backend("torch", MODEL_DIR)
+    candidate = current if current.name == backend_name else load_backend(backend_name, MODEL_DIR)
+
+    def score_with(scorer):
+        t = time.time()
+        scores, _ = _score_texts(texts, scorer=scorer)
+        return scores, time.time() - t
+
+    base_scores, base_time = score_with(baseline)
+    cand_scores, cand_time = score_with(candidate)
+
+    drift = np.abs(base_scores - cand_scores)
+    report = {
+        "reference": reference_path,
+        "backend": backend_name,
+        "rows": len(texts),
+        "max_abs_drift": float(drift.max()) if len(drift) else 0.0,
+        "mean_abs_drift": float(drift.mean()) if len(drift) else 0.0,
+        "p99_abs_drift": float(np.quantile(drift, 0.99)) if len(drift) else 0.0,
+        "label_agreement": float(
+            ((base_scores >= THRESHOLD) == (cand_scores >= THRESHOLD)).mean()
+        ) if len(drift) else 1.0,
+        "baseline_seconds": round(base_time, 3),
+        "backend_seconds": round(cand_time, 3),
+    }
+
+    print("📏 Parity check:")
+    for k, v in report.items():
+        print(f"   ➤ {k}: {v}")
+    return report
+
+
+if __name__ == "__main__":
+    # python dl_model.py [reference.csv] [backend]
+    parity_check(
+        sys.argv[1] if len(sys.argv) > 1 else "test.csv",
+        sys.argv[2] if len(sys.argv) > 2 else "onnx-int8",
+    )
@@ -0,0 +1,147 @@
+"""
+Streaming download responses for raw logs and result files.
+
+Nothing is materialized in full: raw logs are stream-decompressed from the
+blob store and result CSVs are generated chunk by chunk from the Parquet
+file. Both support:
+
+  - gzip on the fly when the client sends Accept-Encoding: gzip
+  - ETag / Last-Modified, so repeat downloads are answered with 304
+  - HTTP Range for raw logs (uncompressed responses only)
+
+Result downloads take query parameters:
+
+  ?columns=Content,anomaly_score   only these columns
+  ?label=1                         only rows with pred_label == 1
+"""
+
+import hashlib
+import zlib
+
+from flask import Response, abort, request
+from werkzeug.wsgi import wrap_file
+
+
+# ==============================
+# CONFIG
+# ==============================
+CHUNK_SIZE = 256 * 1024
+CSV_BATCH_ROWS = 10_000
+GZIP_LEVEL = 6
+
+
+def _wants_gzip() -> bool:
+    return "gzip" in request.accept_encodings and not request.range
+
+
+def _gzip(chunks):
+    """Compress a byte/str iterator into a gzip stream."""
+    z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 → gzip container
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def _read_chunks(fh):
+    try:
+        while True:
+            chunk = fh.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fh.close()
+
+
+def _finish(rv: Response, upload, etag: str, gzipped: bool, ranges: bool = False, length=None):
+    rv.headers["Vary"] = "Accept-Encoding"
+    if gzipped:
+        rv.headers["Content-Encoding"] = "gzip"
+        etag += "-gzip"
+
+    rv.set_etag(etag)
+    rv.last_modified = upload.updated_at or upload.uploaded_at
+    rv.cache_control.private = True
+    rv.cache_control.no_cache = True  # always revalidate (cheap: 304)
+
+    return rv.make_conditional(request, accept_ranges=ranges, complete_length=length)
+
+
+# ==============================
+# Raw log
+# ==============================
+def raw_response(upload) -> Response:
+    gzipped = _wants_gzip()
+    fh = upload.open_raw()
+
+    if gzipped:
+        body, direct = _gzip(_read_chunks(fh)), False
+    else:
+        body, direct = wrap_file(request.environ, fh, CHUNK_SIZE), True
+
+    rv = Response(body, mimetype="text/plain", direct_passthrough=direct)
+    rv.headers["Content-Disposition"] = f"attachment;filename={upload.filename}"
+
+    length = upload.filesize
+    if not gzipped and length is not None:
+        rv.content_length = length
+
+    etag = upload.raw_hash or f"raw-{upload.id}"
+    return _finish(rv, upload, etag, gzipped, ranges=not gzipped, length=length)
+
+
+# ==============================
+# Result CSV
+# ==============================
+def _result_query(upload):
+    """?columns= / ?label= → (columns, filters); 400 on unknown columns."""
+    columns = None
+    if request.args.get("columns"):
+        columns = [c.strip() for c in request.args["columns"].split(",") if c.strip()]
+        unknown = set(columns) - set(upload.structured_columns())
+        if unknown:
+            abort(400, f"Unknown column(s): {', '.join(sorted(unknown))}")
+
+    filters = None
+    label = request.args.get("label")
+    if label not in (None, ""):
+        try:
+            filters = [("pred_label", "==", int(label))]
+        except ValueError:
+            abort(400, "label must be an integer")
+
+    return columns, filters
+
+
+def _csv_chunks(upload, columns, filters):
+    header = True
+    for chunk in upload.iter_structured(columns, filters, CSV_BATCH_ROWS):
+        yield chunk.to_csv(index=False, header=header)
+        header = False
+
+    if header:  # no rows matched: still send the header line
+        cols = columns or upload.structured_columns()
+        yield ",".join(cols) + "\n"
+
+
+def result_response(upload, download_name: str) -> Response:
+    columns, filters = _result_query(upload)
+    gzipped = _wants_gzip()
+
+    body = _csv_chunks(upload, columns, filters)
+    if gzipped:
+        body = _gzip(body)
+
+    rv = Response(body, mimetype="text/csv")
+    rv.headers["Content-Disposition"] = f"attachment;filename={download_name}"
+
+    # Same file + same row count (appends add rows) + same query → same bytes
+    version = f"{upload.result_path}:{upload.result_rows}" if upload.result_path else f"legacy-{upload.id}"
+    etag = hashlib.blake2b(
+        f"{version}|{request.query_string.decode()}".encode(), digest_size=12
+    ).hexdigest()
+    return _finish(rv, upload, etag, gzipped)
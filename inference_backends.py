@@ -0,0 +1,153 @@
+"""
+Pluggable inference backends for the anomaly classifier.
+
+  torch      FP32 PyTorch on CPU, FP16 on CUDA (the original path)
+  onnx       ONNX Runtime on CPU, exported from the PyTorch model
+  onnx-int8  ONNX Runtime with dynamic int8 weight quantization
+
+Every backend takes a padded tokenizer batch and returns the anomaly
+probability (softmax of class 1) for each row as a float32 numpy array.
+ONNX files are exported next to the model on first use.
+"""
+
+import os
+import numpy as np
+
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def onnx_paths(model_dir: str):
+    folder = os.path.join(model_dir, "onnx")
+    return os.path.join(folder, "model.onnx"), os.path.join(folder, "model.int8.onnx")
+
+
+def _softmax_class1(logits: np.ndarray) -> np.ndarray:
+    logits = logits.astype(np.float32)
+    logits -= logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp[:, 1] / exp.sum(axis=-1)
+
+
+# ==============================
+# PyTorch
+# ==============================
+class TorchBackend:
+    name = "torch"
+    tensor_type = "pt"
+
+    def __init__(self, model_dir: str):
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        self.torch = torch
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+
+        if self.device == "cuda":
+            print("   ➤ Loading model in FP16 (GPU accelerated)...")
+            self.model = AutoModelForSequenceClassification.from_pretrained(
+                model_dir,
+                torch_dtype=torch.float16
+            )
+        else:
+            print("   ➤ Loading model in FP32 (CPU mode)...")
+            self.model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+
+        self.model.to(self.device)
+        self.model.eval()
+
+    def predict(self, encodings) -> np.ndarray:
+        torch = self.torch
+        encodings = {k: v.to(self.device, non_blocking=True) for k, v in encodings.items()}
+
+        with torch.inference_mode():
+            logits = self.model(**encodings).logits
+
+            # 🔥 Softmax on device, move ONLY the final vector to CPU
+            probs = torch.softmax(logits, dim=-1)[:, 1]
+            return probs.float().cpu().numpy()
+
+
+# ==============================
+# ONNX Runtime
+# ==============================
+def export_onnx(model_dir: str, onnx_path: str, opset: int = 17):
+    """Export the PyTorch classifier with dynamic batch / sequence axes."""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    print(f"   ➤ Exporting ONNX model → {onnx_path}")
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir).eval()
+
+    sample = tokenizer(["export sample log line"], return_tensors="pt")
+    input_names = list(sample.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    kwargs = dict(
+        input_names=input_names,
+        output_names=["logits"],
+        dynamic_axes=dynamic_axes,
+        opset_version=opset,
+    )
+    with torch.inference_mode():
+        try:
+            # TorchScript exporter: its graphs go through quantize_dynamic cleanly
+            torch.onnx.export(model, (dict(sample),), onnx_path, dynamo=False, **kwargs)
+        except TypeError:  # torch < 2.5 has no `dynamo` switch
+            torch.onnx.export(model, (dict(sample),), onnx_path, **kwargs)
+
+
+def quantize_int8(onnx_path: str, int8_path: str):
+    """Dynamic int8 quantization of the exported model's weights."""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    print(f"   ➤ Quantizing ONNX model (int8) → {int8_path}")
+    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+
+
+class OnnxBackend:
+    name = "onnx"
+    tensor_type = "np"
+    device = "cpu"
+
+    def __init__(self, model_dir: str, quantized: bool = False):
+        import onnxruntime as ort
+
+        onnx_path, int8_path = onnx_paths(model_dir)
+        if not os.path.exists(onnx_path):
+            export_onnx(model_dir, onnx_path)
+
+        path = onnx_path
+        if quantized:
+            self.name = "onnx-int8"
+            if not os.path.exists(int8_path):
+                quantize_int8(onnx_path, int8_path)
+            path = int8_path
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = os.cpu_count() or 1
+
+        print(f"   ➤ Loading ONNX Runtime session ({self.name})...")
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        # The exporter drops inputs the graph doesn't use (e.g. token_type_ids)
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def predict(self, encodings) -> np.ndarray:
+        feed = {name: np.asarray(encodings[name], dtype=np.int64) for name in self.input_names}
+        logits = self.session.run(["logits"], feed)[0]
+        return _softmax_class1(logits)
+
+
+def load_backend(name: str, model_dir: str):
+    if name == "torch":
+        return TorchBackend(model_dir)
+    if name == "onnx":
+        return OnnxBackend(model_dir)
+    if name == "onnx-int8":
+        return OnnxBackend(model_dir, quantized=True)
+    raise ValueError(f"Unknown inference backend '{name}' (choose from {', '.join(BACKENDS)})")
@@ -0,0 +1,371 @@
+"""
+Out-of-process inference server with cross-request micro-batching.
+
+One process owns the model. Job workers send scoring requests over a
+localhost TCP port or a Unix socket (multiprocessing.connection, pickled
+messages, shared authkey). The authkey comes from
+LOG_ANALYZER_INFERENCE_AUTHKEY or, when that is unset, from a random
+per-install key file (mode 0600) that the server and its clients share. A single batcher thread packs requests from
+all connections into micro-batches: it waits up to MAX_LATENCY_MS after
+the first queued request for more to arrive, or until MAX_BATCH_TEXTS
+texts are queued, then scores everything in one pass through
+dl_model._score_texts (which still buckets by token length).
+
+Backpressure: at most MAX_QUEUED_TEXTS texts wait in the queue. A
+connection handler stops reading its socket while the queue is full, so
+clients block on their next request instead of piling up memory.
+
+Startup: the server binds its address before it loads the model and
+answers pings right away, reporting whether the model is ready yet.
+ensure_server() polls those pings with backoff until the model is loaded.
+
+    python inference_server.py            # serve on INFERENCE_SERVER
+    LOG_ANALYZER_INFERENCE_SERVER=127.0.0.1:8765 python App.py
+
+dl_model.run_dl_on_parsed keeps its signature. When
+LOG_ANALYZER_INFERENCE_SERVER is set, only cache misses are sent here.
+"""
+
+import os
+import sys
+import time
+import socket
+import secrets
+import threading
+import subprocess
+from collections import deque
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+
+
+# ==============================
+# CONFIG
+# ==============================
+# "host:port" or a Unix socket path; unset = every worker scores in-process
+SERVER_ADDRESS = os.environ.get("LOG_ANALYZER_INFERENCE_SERVER")
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+AUTHKEY_ENV = os.environ.get("LOG_ANALYZER_INFERENCE_AUTHKEY")
+AUTHKEY_FILE = os.environ.get("LOG_ANALYZER_INFERENCE_KEY_FILE", "inference_server.key")
+START_TIMEOUT = float(os.environ.get("LOG_ANALYZER_INFERENCE_START_TIMEOUT", "300"))
+
+MAX_LATENCY_MS = 20            # how long the first request waits for company
+MAX_BATCH_TEXTS = 4096         # texts per micro-batch
+MAX_QUEUED_TEXTS = 32768       # backpressure threshold
+REQUEST_CHUNK = 1024           # client-side split, so big jobs interleave
+
+
+def parse_address(address: str):
+    """'host:port' → (host, port); anything else is a Unix socket path."""
+    if isinstance(address, tuple):
+        return address
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def _family(address):
+    return "AF_INET" if isinstance(address, tuple) else "AF_UNIX"
+
+
+_authkey = None
+
+
+def authkey() -> bytes:
+    """The env var if set, otherwise the per-install key file (created on first use)."""
+    global _authkey
+    if _authkey is None:
+        _authkey = AUTHKEY_ENV.encode() if AUTHKEY_ENV else _read_key_file(AUTHKEY_FILE)
+    return _authkey
+
+
+def _read_key_file(path):
+    if not os.path.exists(path):
+        # Write a private temp file, then link it into place: concurrent
+        # first runs all end up with whichever key was linked first
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+
+    with open(path, encoding="ascii") as f:
+        return f.read().strip().encode()
+
+
+# ==============================
+# SERVER SIDE
+# ==============================
+class _Pending:
+    __slots__ = ("texts", "enqueued", "done", "scores", "stats", "error")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.scores = None
+        self.stats = None
+        self.error = None
+
+
+class MicroBatcher:
+
+    def __init__(self, max_latency_ms=MAX_LATENCY_MS, max_batch=MAX_BATCH_TEXTS, max_queued=MAX_QUEUED_TEXTS):
+        self.max_latency = max_latency_ms / 1000
+        self.max_batch = max_batch
+        self.max_queued = max_queued
+        self._queue = deque()
+        self._queued_texts = 0
+        self._cond = threading.Condition()
+
+    def submit(self, texts) -> _Pending:
+        """Queue a request; blocks while the queue is over its limit."""
+        pending = _Pending(texts)
+        with self._cond:
+            while self._queued_texts and self._queued_texts + len(texts) > self.max_queued:
+                self._cond.wait()
+            self._queue.append(pending)
+            self._queued_texts += len(texts)
+            self._cond.notify_all()
+        return pending
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+
+            # Latency window starts with the oldest queued request
+            deadline = self._queue[0].enqueued + self.max_latency
+            while self._queued_texts < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, size = [], 0
+            while self._queue and (not batch or size + len(self._queue[0].texts) <= self.max_batch):
+                pending = self._queue.popleft()
+                batch.append(pending)
+                size += len(pending.texts)
+
+            self._queued_texts -= size
+            self._cond.notify_all()
+            return batch
+
+    def run(self):
+        from dl_model import _score_texts
+
+        while True:
+            batch = self._next_batch()
+            texts = [t for pending in batch for t in pending.texts]
+
+            try:
+                scores, stats = _score_texts(texts)
+            except Exception as e:
+                for pending in batch:
+                    pending.error = str(e)
+                    pending.done.set()
+                continue
+
+            stats = {**stats, "requests": len(batch), "texts": len(texts)}
+            offset = 0
+            for pending in batch:
+                pending.scores = scores[offset:offset + len(pending.texts)]
+                pending.stats = stats
+                offset += len(pending.texts)
+                pending.done.set()
+
+
+def _serve_connection(conn, batcher, ready):
+    try:
+        while True:
+            try:
+                op, payload = conn.recv()
+            except EOFError:
+                return
+
+            if op == "ping":
+                conn.send(("ok", ready.is_set(), None))
+                continue
+
+            pending = batcher.submit(payload)
+            pending.done.wait()
+
+            if pending.error:
+                conn.send(("error", pending.error, None))
+            else:
+                conn.send(("ok", pending.scores, pending.stats))
+    finally:
+        conn.close()
+
+
+def serve(address: str = None):
+    address = parse_address(address or SERVER_ADDRESS or DEFAULT_ADDRESS)
+
+    # A leftover socket file from a dead server; never unlink a live one
+    if _family(address) == "AF_UNIX" and os.path.exists(address) and not is_running(address):
+        os.remove(address)
+
+    batcher = MicroBatcher()
+    ready = threading.Event()
+
+    with Listener(address, family=_family(address), authkey=authkey()) as listener:
+        print(f"🛰️  Inference server listening on {address}")
+        # Accept (and answer pings) while the model loads
+        acceptor = threading.Thread(target=_accept, args=(listener, batcher, ready), name="acceptor", daemon=True)
+        acceptor.start()
+
+        import dl_model
+        dl_model.INFERENCE_SERVER = None  # this process *is* the server: score locally
+        dl_model.get_model()
+
+        threading.Thread(target=batcher.run, name="micro-batcher", daemon=True).start()
+        ready.set()
+        print("   ➤ Model loaded, ready")
+        acceptor.join()
+
+
+def _accept(listener, batcher, ready):
+    while True:
+        try:
+            conn = listener.accept()
+        except AuthenticationError as e:
+            print(f"   ➤ Rejected connection: {e}")
+            continue
+        except (OSError, EOFError):  # dropped handshake, e.g. an is_running() probe
+            continue
+        threading.Thread(target=_serve_connection, args=(conn, batcher, ready), daemon=True).start()
+
+
+def is_running(address: str) -> bool:
+    """Whether something accepts connections on the address."""
+    address = parse_address(address)
+    family = socket.AF_INET if _family(address) == "AF_INET" else socket.AF_UNIX
+    try:
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(0.5)
+            sock.connect(address)
+            return True
+    except OSError:
+        return False
+
+
+def ping(address: str):
+    """True once the server's model is loaded, False while it loads, None if nothing answers."""
+    if not is_running(address):
+        return None
+    address = parse_address(address)
+    try:
+        with Client(address, family=_family(address), authkey=authkey()) as conn:
+            conn.send(("ping", None))
+            _, ready, _ = conn.recv()
+            return bool(ready)
+    except (OSError, EOFError, AuthenticationError):
+        return None
+
+
+def wait_until_ready(address: str, timeout: float = START_TIMEOUT, proc=None) -> bool:
+    """Poll ping() with exponential backoff; False on timeout or if `proc` died first."""
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while True:
+        state = ping(address)
+        if state:
+            return True
+        # Our launch failed and nobody else is serving either
+        if state is None and proc is not None and proc.poll() is not None:
+            return False
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        delay = min(delay * 2, 2.0)
+
+
+def ensure_server(address: str, timeout: float = START_TIMEOUT):
+    """
+    Launch `python inference_server.py` in the background if nothing is
+    listening, then wait until the server has loaded its model.
+    """
+    proc = None
+    if not is_running(address):
+        authkey()  # create the key file before the server races to do the same
+        env = {**os.environ, "LOG_ANALYZER_INFERENCE_SERVER": address}
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "inference_server.py")
+        proc = subprocess.Popen([sys.executable, script], env=env)
+
+    if not wait_until_ready(address, timeout, proc):
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"Inference server on {address} exited with code {proc.returncode}")
+        raise TimeoutError(f"Inference server on {address} not ready after {timeout:.0f}s")
+    return proc
+
+
+# ==============================
+# CLIENT SIDE
+# ==============================
+class InferenceClient:
+    """One connection per thread; requests are split into REQUEST_CHUNK texts."""
+
+    def __init__(self, address: str):
+        self.address = parse_address(address)
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, family=_family(self.address), authkey=authkey())
+            self._local.conn = conn
+        return conn
+
+    def _request(self, texts):
+        for attempt in range(2):
+            try:
+                conn = self._conn()
+                conn.send(("score", texts))
+                status, payload, stats = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._local.conn = None
+                # Server restarting: wait for it (with backoff) before the retry
+                if attempt or not wait_until_ready(self.address):
+                    raise
+
+        if status != "ok":
+            raise RuntimeError(f"Inference server error: {payload}")
+        return payload, stats
+
+    def score(self, texts, progress=None):
+        n = len(texts)
+        scores = np.zeros(n, dtype=np.float32)
+        real = padded = 0.0
+        batches = 0
+
+        for start in range(0, n, REQUEST_CHUNK):
+            chunk = texts[start:start + REQUEST_CHUNK]
+            chunk_scores, stats = self._request(chunk)
+            scores[start:start + len(chunk)] = chunk_scores
+
+            batches += 1
+            real += stats["padding_efficiency"] * len(chunk)
+            padded += len(chunk)
+
+            if progress:
+                progress(min(n, start + REQUEST_CHUNK) / n)
+
+        return scores, {
+            "batches": batches,
+            "token_budget": stats["token_budget"] if n else 0,
+            "padding_efficiency": round(real / padded, 4) if padded else 1.0,
+            "remote": True,
+        }
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,687 @@
+"""
+Background job queue for the upload → Drain3 → DL pipeline.
+
+The upload POST only spools the file to disk and inserts a Job row.
+The heavy work runs in a local process pool, so Drain3 and torch never
+compete with the Flask request threads for the GIL. Each worker writes
+its stage and progress back to the Job row, which the status endpoint
+and the My Uploads page poll.
+
+An append job (Job.append_to) adds a grown or follow-up log to an
+existing upload: only the bytes past the stored raw log are parsed,
+scored and indexed, and the results land in a new part file.
+
+Big files (and every file once an RSS budget is set) run in windowed
+mode: fixed-size windows of lines go through the whole pipeline one after
+the other and are spilled to result parts, so memory stays flat however
+large the log is.
+"""
+
+import os
+import gc
+import json
+import time
+import uuid
+import ctypes
+import threading
+import traceback
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Optional
+
+from sqlmodel import Session, select
+from sqlalchemy import update
+
+from models import Job, Upload, engine
+from storage import write, submit_write
+from result_store import remove_results
+from masking_profiles import DEFAULT_PROFILE, valid_profile
+from metrics import Trace, current_trace, record_job, rss_bytes, tracing
+from inference_server import SERVER_ADDRESS, ensure_server
+
+
+# ==========================================
+# CONFIG
+# ==========================================
+SPOOL_DIR = "uploads_spool"
+MAX_WORKERS = int(os.environ.get("LOG_ANALYZER_WORKERS", "2"))
+PROGRESS_INTERVAL = 0.5  # seconds between progress writes to the DB
+# Load the DL model in the background as soon as a worker starts, so it
+# overlaps with the Drain3 stage of the first job
+WARM_UP_MODEL = os.environ.get("LOG_ANALYZER_WARM_UP", "1") == "1"
+
+# Memory-capped (windowed) mode, see _ingest_windowed
+WINDOW_LINES = int(os.environ.get("LOG_ANALYZER_WINDOW_LINES", "100000"))
+MIN_WINDOW_LINES = 5_000
+WINDOWED_MIN_BYTES = int(float(os.environ.get("LOG_ANALYZER_WINDOWED_MIN_MB", "256")) * 2 ** 20)
+RSS_BUDGET_BYTES = int(float(os.environ.get("LOG_ANALYZER_RSS_BUDGET_MB", "0")) * 2 ** 20)  # 0 = none
+
+STAGES = ("parse", "infer", "save", "index", "export")
+APPEND_EXTS = {"log", "txt"}  # line-oriented formats can be extended in place
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    if WARM_UP_MODEL:
+        from dl_model import warm_up
+        warm_up(background=True)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _get_pool():
+    """Create the worker pool on first use (spawn: safe with torch)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS,
+                mp_context=mp.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def start_workers():
+    """
+    Spawn the worker processes now (they warm up the model) instead of on
+    the first upload, and the shared inference server if one is configured.
+    """
+    if SERVER_ADDRESS:
+        ensure_server(SERVER_ADDRESS)
+
+    pool = _get_pool()
+    for _ in range(MAX_WORKERS):
+        pool.submit(_ping)
+
+
+# ==========================================
+# WEB SIDE (called from request handlers)
+# ==========================================
+def spool_upload(file, ext: str) -> str:
+    """Stream the uploaded file to the spool directory and return its path."""
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    path = os.path.join(SPOOL_DIR, f"{uuid.uuid4().hex}.{ext}")
+    file.save(path)
+    return path
+
+
+def enqueue_upload(user_id: int, filename: str, ext: str, spool_path: str, masking_profile: str = None) -> Job:
+    """Insert a queued Job and hand it to the worker pool (unknown profiles → DEFAULT_PROFILE)."""
+    job = Job(
+        user_id=user_id, filename=filename, ext=ext, spool_path=spool_path,
+        masking_profile=valid_profile(masking_profile),
+    )
+    write(lambda db: db.add(job))
+
+    submit_job(job.id)
+    return job
+
+
+def _add_append_job(db, job: Job) -> bool:
+    target = db.exec(
+        select(Upload.id).where(
+            Upload.id == job.append_to, Upload.user_id == job.user_id, Upload.result_path.is_not(None)
+        )
+    ).first()
+    busy = db.exec(
+        select(Job.id).where(Job.append_to == job.append_to, Job.status.in_(("queued", "running")))
+    ).first()
+    if target is None or busy is not None:
+        return False
+    db.add(job)
+    return True
+
+
+def enqueue_append(user_id: int, upload_id: int, filename: str, ext: str, spool_path: str) -> Optional[Job]:
+    """
+    Queue an append to one of the user's uploads. Returns None if the upload
+    does not exist or already has an append in flight (appends to one
+    upload run one at a time, in order).
+    """
+    job = Job(user_id=user_id, filename=filename, ext=ext, spool_path=spool_path, append_to=upload_id)
+    if not write(_add_append_job, job):
+        os.remove(spool_path)
+        return None
+
+    submit_job(job.id)
+    return job
+
+
+def _job_finished(future):
+    """Pool callback (web process): fold the job's trace into /metrics."""
+    try:
+        result = future.result()
+    except Exception:
+        return
+    if result:
+        record_job(result["timings"], result["status"])
+
+
+def submit_job(job_id: int):
+    _get_pool().submit(run_job, job_id).add_done_callback(_job_finished)
+
+
+def submit_task(fn, *args):
+    """Run fn(*args) in the worker pool (live stream batches); returns a Future."""
+    return _get_pool().submit(fn, *args)
+
+
+def recover_jobs():
+    """
+    Re-submit jobs left queued/running by a previous server process.
+    Workers claim jobs atomically, so a double submit is harmless.
+    """
+    write(lambda db: db.exec(
+        update(Job)
+        .where(Job.status == "running")
+        .values(status="queued", stage=None, progress=0.0)
+    ))
+
+    with Session(engine) as db:
+        job_ids = db.exec(select(Job.id).where(Job.status == "queued")).all()
+
+    for job_id in job_ids:
+        submit_job(job_id)
+
+    if job_ids:
+        print(f"🔁 Re-queued {len(job_ids)} unfinished job(s)")
+
+
+def get_job(job_id: int, user_id: int):
+    with Session(engine) as db:
+        return db.exec(
+            select(Job).where(Job.id == job_id, Job.user_id == user_id)
+        ).first()
+
+
+def pending_jobs(user_id: int):
+    """Jobs that have not produced an Upload yet (queued, running, failed)."""
+    with Session(engine) as db:
+        return db.exec(
+            select(Job)
+            .where(Job.user_id == user_id, Job.status != "done")
+            .order_by(Job.created_at.desc())
+        ).all()
+
+
+def _delete_job(db, job_id: int, user_id: int):
+    job = db.exec(
+        select(Job).where(Job.id == job_id, Job.user_id == user_id)
+    ).first()
+    if not job or job.status in {"queued", "running"}:
+        return False
+
+    if os.path.exists(job.spool_path):
+        os.remove(job.spool_path)
+    db.delete(job)
+    return True
+
+
+def delete_job(job_id: int, user_id: int):
+    """Remove a finished or failed job (and its spool file)."""
+    return write(_delete_job, job_id, user_id)
+
+
+# ==========================================
+# WORKER SIDE (runs inside the process pool)
+# ==========================================
+def _claim(job_id: int) -> bool:
+    """queued → running, only if nobody else got there first."""
+    result = write(lambda db: db.exec(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "queued")
+        .values(status="running", started_at=datetime.utcnow())
+    ))
+    return result.rowcount == 1
+
+
+def _update(job_id: int, wait: bool = True, **values):
+    """Write Job fields; wait=False queues it (progress ticks never stall the job)."""
+    fn = write if wait else submit_write
+    fn(lambda db: db.exec(update(Job).where(Job.id == job_id).values(**values)))
+
+
+class _Progress:
+    """Stage tracker that throttles progress writes to the Job row."""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self._last = 0.0
+
+    def stage(self, name: str):
+        print(f"   ➤ Job {self.job_id}: {name}")
+        self._last = time.time()
+        _update(self.job_id, wait=False, stage=name, progress=0.0)
+
+    def __call__(self, fraction: float):
+        now = time.time()
+        if now - self._last >= PROGRESS_INTERVAL:
+            self._last = now
+            current_trace().sample_memory()
+            _update(self.job_id, wait=False, progress=min(1.0, float(fraction)))
+
+
+class _Quiet:
+    """Progress sink for stream batches (they have no Job row)."""
+
+    def stage(self, name: str):
+        pass
+
+    def __call__(self, fraction: float):
+        pass
+
+
+def _index(user_id: int, upload_id: int, df, stats: dict, append: bool = False):
+    # Search is secondary: a failure here must not fail a saved upload
+    from search_index import get_search_index
+
+    try:
+        get_search_index().add_upload(user_id, upload_id, df, append=append)
+    except Exception as e:
+        print(f"⚠️ Upload {upload_id}: search indexing failed: {e}")
+        stats["search_index_error"] = str(e)[:200]
+
+
+def _export(user_id: int, upload_id: int, frames, stats: dict):
+    # Like search, the Power BI partition is secondary to the saved upload
+    from bi_export import export_upload
+
+    try:
+        entry = export_upload(user_id, upload_id, frames)
+        if entry:
+            stats["export"] = entry["path"]
+    except Exception as e:
+        print(f"⚠️ Upload {upload_id}: Power BI export failed: {e}")
+        stats["export_error"] = str(e)[:200]
+
+
+def _ingest_new(user_id, filename, ext, path, progress, stats, export=True, masking=DEFAULT_PROFILE) -> int:
+    """parse → infer → save → index → export a file as a new Upload; returns its id."""
+    # Heavy imports stay in the worker process
+    from Log_parser import iter_log_lines, parse_log_lines
+    from dl_model import THRESHOLD, run_dl_on_parsed
+    from analysis import SummaryBuilder, summarize
+
+    trace = current_trace()
+
+    # ---------------- parse ----------------
+    # Lines stream from the spool file straight into the user's resident miner;
+    # reading them is timed as "ingest", the rest as "parse"
+    progress.stage("parse")
+    with open(path, "rb") as f, trace.span("parse", exclude="ingest"):
+        structured_df = parse_log_lines(
+            trace.timed_lines(iter_log_lines(f, ext, progress=progress)),
+            tenant=f"user_{user_id}",
+            masking=masking,
+        )
+    trace.lines = len(structured_df)
+    stats["parse"] = structured_df.attrs.get("parse_stats")
+
+    # ---------------- infer ----------------
+    # tokenize / inference / score_cache spans come from dl_model
+    progress.stage("infer")
+    structured_df = run_dl_on_parsed(structured_df, progress=progress)
+    stats["inference"] = structured_df.attrs.get("inference_stats")
+
+    # ---------------- save ----------------
+    progress.stage("save")
+    upload = Upload(
+        user_id=user_id,
+        filename=filename,
+        masking_profile=masking,
+        uploaded_at=datetime.utcnow()
+    )
+    with trace.span("serialize"):
+        upload.set_raw_file(path)
+        upload.set_structured(structured_df)
+        upload.summary = json.dumps(summarize(structured_df, threshold=THRESHOLD))
+        builder = SummaryBuilder()
+        builder.add(structured_df)
+        upload.summary_state = json.dumps(builder.state())
+
+    with trace.span("db_write"):
+        write(lambda db: db.add(upload))
+
+    # ---------------- index ----------------
+    progress.stage("index")
+    with trace.span("index"):
+        _index(user_id, upload.id, structured_df, stats)
+
+    # ---------------- export ----------------
+    if export:
+        progress.stage("export")
+        with trace.span("export"):
+            _export(user_id, upload.id, [structured_df], stats)
+    return upload.id
+
+
+def _add_counts(totals: dict, counts):
+    """Sum the integer counters of one window's stats into `totals`."""
+    for key, value in (counts or {}).items():
+        if isinstance(value, int):
+            totals[key] = totals.get(key, 0) + value
+
+
+def _over_budget(rss: int) -> bool:
+    return bool(RSS_BUDGET_BYTES) and rss > RSS_BUDGET_BYTES
+
+
+def _release_memory() -> int:
+    """Collect garbage and hand freed heap pages back to the OS; returns RSS."""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass  # not glibc
+    return rss_bytes()
+
+
+def use_windows(path: str) -> bool:
+    """Process this spool file in memory-capped windows (see _ingest_windowed)?"""
+    return bool(RSS_BUDGET_BYTES) or os.path.getsize(path) >= WINDOWED_MIN_BYTES
+
+
+def _ingest_windowed(user_id, filename, ext, path, progress, stats, window_lines=None, masking=DEFAULT_PROFILE) -> int:
+    """
+    _ingest_new for files too big to hold at once: lines stream from the
+    spool file in windows of `window_lines`, and each window is parsed,
+    scored and spilled to its own result part before the next
+    is read. Only the summary statistics, the miner and one window live
+    in memory. A window that ends above RSS_BUDGET_BYTES halves the next
+    one; the job fails once even MIN_WINDOW_LINES does not fit.
+    """
+    from Log_parser import hit_rate, iter_log_lines, parse_log_lines
+    from dl_model import THRESHOLD, run_dl_on_parsed
+    from analysis import SummaryBuilder
+    from result_store import new_result_path
+
+    trace = current_trace()
+    size = window_lines or WINDOW_LINES
+    upload = Upload(user_id=user_id, filename=filename, masking_profile=masking, uploaded_at=datetime.utcnow())
+    upload.result_path = new_result_path(user_id)[:-len(".parquet")]
+    summary = SummaryBuilder()
+    parse, inference = {}, {}
+    windows = offset = rows = 0
+
+    # ---------------- parse → infer → spill, per window ----------------
+    progress.stage("parse")
+    try:
+        with open(path, "rb") as f:
+            lines = trace.timed_lines(iter_log_lines(f, ext, progress=progress))
+            while True:
+                with trace.span("parse", exclude="ingest"):
+                    window = list(islice(lines, size))
+                    if not window:
+                        break
+                    df = parse_log_lines(window, tenant=f"user_{user_id}", line_offset=offset, masking=masking)
+                offset += len(window)
+                del window
+                _add_counts(parse, df.attrs.get("parse_stats"))
+                if not len(df):
+                    continue
+
+                df = run_dl_on_parsed(df)
+                _add_counts(inference, df.attrs.get("inference_stats"))
+
+                with trace.span("serialize"):
+                    upload.append_structured(df, compact=False)
+                    summary.add(df)
+                windows += 1
+                rows += len(df)
+                trace.lines = rows
+
+                rss = rss_bytes()
+                trace.sample_memory()
+                del df
+                if _over_budget(rss):
+                    idle = _release_memory()
+                    if size <= MIN_WINDOW_LINES or _over_budget(idle):
+                        raise MemoryError(
+                            f"Over the {RSS_BUDGET_BYTES / 2 ** 20:.0f} MB memory budget: "
+                            f"{rss / 2 ** 20:.0f} MB with {size}-line windows, "
+                            f"{idle / 2 ** 20:.0f} MB between windows"
+                        )
+                    size = max(MIN_WINDOW_LINES, size // 2)
+                    print(f"   ➤ Over the memory budget: next windows have {size} lines")
+
+        if not windows:
+            raise ValueError("No log lines found in the file")
+    except BaseException:
+        remove_results(upload.result_path)
+        raise
+
+    stats["windows"] = {"count": windows, "last_lines": size}
+    stats["parse"] = {**parse, "hit_rate": hit_rate(parse)}
+    stats["inference"] = inference
+
+    # ---------------- save ----------------
+    progress.stage("save")
+    with trace.span("serialize"):
+        upload.set_raw_file(path)
+        upload.summary = json.dumps(summary.result(threshold=THRESHOLD))
+        upload.summary_state = json.dumps(summary.state())
+        upload.updated_at = None
+
+    with trace.span("db_write"):
+        write(lambda db: db.add(upload))
+
+    # ---------------- index ----------------
+    # Re-read from the spilled parts, one window at a time
+    progress.stage("index")
+    with trace.span("index"):
+        columns = ["LineId", "Content", "EventId", "EventTemplate"]
+        for i, chunk in enumerate(upload.iter_structured(columns=columns, batch_size=size)):
+            _index(user_id, upload.id, chunk, stats, append=i > 0)
+
+    # ---------------- export ----------------
+    # Streamed from the spilled parts as well
+    progress.stage("export")
+    with trace.span("export"):
+        _export(user_id, upload.id, upload.iter_structured(batch_size=size), stats)
+    return upload.id
+
+
+def _summary_builder(upload):
+    """The upload's SummaryBuilder, rebuilt once for uploads stored before summary states."""
+    from analysis import SUMMARY_COLUMNS, SummaryBuilder
+
+    state = upload.get_summary_state()
+    if state is not None:
+        return SummaryBuilder.from_state(state)
+
+    summary = SummaryBuilder()
+    for chunk in upload.iter_structured(columns=SUMMARY_COLUMNS):
+        summary.add(chunk)
+    summary.top = (upload.get_summary() or {}).get("top_anomalies", [])
+    return summary
+
+
+def _ingest_append(upload, ext, path, offset, progress, stats, export=True, raw=True):
+    """
+    parse → infer → save → index → export for path[offset:] only, appended
+    to `upload`. raw=False leaves the raw blob alone (streams batch it).
+    """
+    from Log_parser import iter_log_lines, parse_log_lines
+    from dl_model import THRESHOLD, run_dl_on_parsed
+
+    trace = current_trace()
+
+    # ---------------- parse ----------------
+    # Same resident miner (and masking) as the original upload, so templates
+    # carry over; uploads from before masking profiles were mined unmasked
+    progress.stage("parse")
+    with open(path, "rb") as f, trace.span("parse", exclude="ingest"):
+        f.seek(offset)
+        structured_df = parse_log_lines(
+            trace.timed_lines(iter_log_lines(f, ext, progress=progress)),
+            tenant=f"user_{upload.user_id}",
+            masking=upload.masking_profile or "none",
+            line_offset=upload.line_count if upload.line_count is not None else (upload.result_rows or 0),
+        )
+    stats["lines"] = trace.lines = len(structured_df)
+    stats["parse"] = structured_df.attrs.get("parse_stats")
+    if not len(structured_df):
+        return
+
+    # ---------------- infer ----------------
+    progress.stage("infer")
+    structured_df = run_dl_on_parsed(structured_df, progress=progress)
+    stats["inference"] = structured_df.attrs.get("inference_stats")
+
+    # ---------------- save ----------------
+    # Nothing already stored is rewritten or re-read: the new bytes become one
+    # more raw segment, the new rows one more result part, and the summary
+    # state absorbs the new rows only
+    progress.stage("save")
+    with trace.span("serialize"):
+        summary = _summary_builder(upload)
+        summary.add(structured_df)
+        if raw:
+            upload.append_raw_file(path, offset)
+        upload.append_structured(structured_df)
+        upload.summary = json.dumps(summary.result(threshold=THRESHOLD))
+        upload.summary_state = json.dumps(summary.state())
+
+    with trace.span("db_write"):
+        write(lambda db: db.merge(upload))
+
+    # ---------------- index ----------------
+    progress.stage("index")
+    with trace.span("index"):
+        _index(upload.user_id, upload.id, structured_df, stats, append=True)
+
+    # ---------------- export ----------------
+    # Only the appended rows: one more part in the upload's partition
+    if export:
+        progress.stage("export")
+        with trace.span("export"):
+            _export(upload.user_id, upload.id, [structured_df], stats)
+
+
+def _persisted(timings: dict) -> str:
+    """Job.timings JSON: everything except the raw per-batch latencies."""
+    return json.dumps({k: v for k, v in timings.items() if k != "batch_seconds"})
+
+
+def run_job(job_id: int):
+    """
+    Full pipeline for one job: parse → infer → save → index → export.
+    Returns {"status", "timings"} for the web process's metrics.
+    """
+    if not _claim(job_id):
+        return None
+
+    with Session(engine) as db:
+        job = db.get(Job, job_id)
+        user_id, filename, ext, spool_path = job.user_id, job.filename, job.ext, job.spool_path
+        append_to, masking = job.append_to, valid_profile(job.masking_profile)
+        queue_wait = (job.started_at - job.created_at).total_seconds()
+
+    progress = _Progress(job_id)
+    stats = {}
+    trace = Trace("upload" if append_to is None else "append")
+    t_start = time.time()
+
+    try:
+        with tracing(trace):
+            if append_to is None:
+                print(f"\n📥 Job {job_id} started: {filename}")
+                ingest = _ingest_windowed if use_windows(spool_path) else _ingest_new
+                upload_id = ingest(user_id, filename, ext, spool_path, progress, stats, masking=masking)
+            else:
+                print(f"\n📥 Job {job_id} appending to upload {append_to}")
+                upload_id = _append(append_to, ext, spool_path, progress, stats)
+
+        timings = trace.to_dict(queue_wait)
+        _update(
+            job_id, status="done", progress=1.0, stats=json.dumps(stats), timings=_persisted(timings),
+            upload_id=upload_id, finished_at=datetime.utcnow()
+        )
+        os.remove(spool_path)
+
+        print(f"🎉 Job {job_id} done in {time.time() - t_start:.2f}s  {timings['spans']}")
+        return {"status": "done", "timings": timings}
+
+    except Exception as e:
+        traceback.print_exc()
+        timings = trace.to_dict(queue_wait)
+        _update(
+            job_id, status="failed", error=str(e)[:500], timings=_persisted(timings),
+            finished_at=datetime.utcnow()
+        )
+        return {"status": "failed", "timings": timings}
+
+
+def _new_bytes_offset(upload: Upload, path: str) -> int:
+    """
+    Where the new lines start in `path`: right after the stored raw log if
+    the file begins with it (a grown log), else 0 (the file only holds new lines).
+    """
+    from blob_store import matches_prefix
+
+    if upload.raw_hash and upload.filesize and matches_prefix(upload.raw_segment_list(), path):
+        return upload.filesize
+    return 0
+
+
+def _append(upload_id: int, ext: str, spool_path: str, progress, stats) -> int:
+    """Append job: only the new lines of the file are processed."""
+    with Session(engine) as db:
+        upload = db.get(Upload, upload_id)
+    if upload is None or not upload.result_path or not upload.raw_hash:
+        raise ValueError("Upload cannot be appended to (missing or legacy results)")
+    if ext not in APPEND_EXTS:
+        raise ValueError("Only LOG or TXT files can be appended")
+
+    offset = _new_bytes_offset(upload, spool_path)
+    stats["append"] = {"offset": offset, "bytes": os.path.getsize(spool_path) - offset}
+    if stats["append"]["bytes"] > 0:
+        _ingest_append(upload, ext, spool_path, offset, progress, stats)
+    return upload_id
+
+
+# ==========================================
+# STREAM BATCHES (live ingestion, see streams.py)
+# ==========================================
+def run_stream_batch(user_id: int, upload_id: Optional[int], filename: str, path: str):
+    """
+    One micro-batch of a live stream. The first batch creates the stream's
+    Upload; later ones append to it, leaving the raw blob to
+    flush_stream_raw. Returns (upload_id, stats); stats["timings"] is the
+    batch's trace.
+    """
+    stats = {}
+    trace = Trace("stream")
+    with tracing(trace):
+        if upload_id is None:
+            upload_id = _ingest_new(user_id, filename, "log", path, _Quiet(), stats, export=False)
+        else:
+            with Session(engine) as db:
+                upload = db.get(Upload, upload_id)
+            if upload is None:
+                raise ValueError(f"Stream upload {upload_id} no longer exists")
+            _ingest_append(upload, "log", path, 0, _Quiet(), stats, export=False, raw=False)
+
+    os.remove(path)
+    stats["timings"] = trace.to_dict()
+    return upload_id, stats
+
+
+def flush_stream_raw(upload_id: int, path: str) -> bool:
+    """Append the raw lines of the batches since the last flush to the stream's blob."""
+    with Session(engine) as db:
+        upload = db.get(Upload, upload_id)
+    if upload is None:
+        return False
+
+    upload.append_raw_file(path, 0)
+    upload.updated_at = datetime.utcnow()
+    write(lambda db: db.merge(upload))
+    return True
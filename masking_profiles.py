@@ -0,0 +1,104 @@
+"""
+Named Drain3 masking profiles.
+
+Variable tokens (epochs, dates, IPs, hex ids, PIDs, node names, "#8#"
+placeholders) are replaced by <NAME> masks before mining, so they no
+longer open separate tree branches and clusters. A profile is a list of
+(mask name, regex); all of it is compiled into ONE alternation with a
+named group per mask, so a line is scanned once instead of once per
+instruction as with a list of stock Drain3 MaskingInstructions.
+
+Profiles build on GENERIC: specific patterns come first and win where
+both match. Masks only apply to whole tokens (not inside identifiers
+such as x86_64 or Thunderbird_A8 unless a profile says so).
+
+The profile is chosen per upload. Miners are per (user, profile), so a
+tree is never mined with two different maskings. The default is "none",
+Drain3 without masking as before profiles existed (same templates,
+EventIds and user_<id> miners); LOG_ANALYZER_MASKING_PROFILE opts in.
+"""
+
+import os
+import re
+from functools import lru_cache
+
+from drain3.masking import AbstractMaskingInstruction
+
+
+# ==============================
+# CONFIG
+# ==============================
+DEFAULT_PROFILE = os.environ.get("LOG_ANALYZER_MASKING_PROFILE", "none")
+
+_BEFORE = r"(?<![A-Za-z0-9_])"
+_AFTER = r"(?![A-Za-z0-9_])"
+
+GENERIC = [
+    ("TS", r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"),
+    ("DATE", r"\d{4}[./-]\d{2}[./-]\d{2}"),
+    ("TIME", r"\d{2}:\d{2}:\d{2}(?:[.,]\d+)?"),
+    ("IP", r"\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?"),
+    ("HEX", r"0[xX][0-9a-fA-F]+|(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{8,}"),
+    ("PH", r"#\d+#"),
+    ("NUM", r"[-+]?\d+(?:\.\d+)?"),
+]
+
+PROFILES = {
+    "none": [],
+    "syslog": GENERIC,
+    # - 1131565352 2005.11.09 tbird-admin1 Nov 9 11:42:32 local@tbird-admin1 ... [Thunderbird_A8]
+    "thunderbird": [
+        ("NODE", r"tbird-[a-z]+\d+|[a-z]{2}\d{1,4}|Thunderbird_[A-Z]\d+"),
+    ] + GENERIC,
+    # - 1117838570 2005.06.03 R02-M1-N0-C:J12-U11 2005-06-03-15.42.50.675872 R02-M1-N0-C:J12-U11 RAS KERNEL ...
+    "bgl": [
+        ("TS", r"\d{4}-\d{2}-\d{2}-\d{2}\.\d{2}\.\d{2}\.\d{6}"),
+        ("NODE", r"R\d{2}-M\d(?:-[A-Z0-9]+(?::[A-Z0-9]+)?)*"),
+    ] + GENERIC,
+    # 081109 203615 148 INFO dfs.DataNode$PacketResponder: ... blk_-1608999687919862906 src: /10.250.19.102:54106
+    "hdfs": [
+        ("BLK", r"blk_-?\d+"),
+    ] + GENERIC,
+}
+
+
+def compile_profile(name: str):
+    """One regex for the whole profile (None for "none"); same-named masks are merged."""
+    groups = {}
+    for mask, pattern in PROFILES[name]:
+        groups.setdefault(mask, []).append(pattern)
+    if not groups:
+        return None
+    alternatives = "|".join(f"(?P<{mask}>{'|'.join(patterns)})" for mask, patterns in groups.items())
+    return re.compile(f"{_BEFORE}(?:{alternatives}){_AFTER}")
+
+
+class CombinedMaskingInstruction(AbstractMaskingInstruction):
+    """A whole profile as a single Drain3 masking instruction (one regex pass)."""
+
+    def __init__(self, profile: str):
+        super().__init__(profile)
+        self.profile = profile
+        self.regex = compile_profile(profile)
+        self._masks = {}  # (prefix, suffix) → {group: replacement}
+
+    def mask(self, content: str, mask_prefix: str, mask_suffix: str) -> str:
+        masks = self._masks.get((mask_prefix, mask_suffix))
+        if masks is None:
+            masks = self._masks[mask_prefix, mask_suffix] = {
+                name: f"{mask_prefix}{name}{mask_suffix}" for name in self.regex.groupindex
+            }
+        return self.regex.sub(lambda m: masks[m.lastgroup], content)
+
+
+@lru_cache(maxsize=None)
+def masking_instructions(profile: str) -> tuple:
+    """Drain3 masking_instructions for a profile (the same objects every time)."""
+    if not PROFILES[profile]:
+        return ()
+    return (CombinedMaskingInstruction(profile),)
+
+
+def valid_profile(name) -> str:
+    """`name` if it is a known profile, else DEFAULT_PROFILE."""
+    return name if name in PROFILES else DEFAULT_PROFILE
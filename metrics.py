@@ -0,0 +1,275 @@
+"""
+Per-job tracing and Prometheus metrics.
+
+Trace: span timings of one job (ingest, parse, tokenize, inference,
+serialize, db_write, ...), inference batch latencies, queue wait and peak
+memory. The worker activates it for the job's thread; instrumented code
+calls current_trace(), which is a no-op object when nothing is traced.
+Hooks sit at chunk / batch granularity (never per line) and only add
+perf_counter() calls, so their cost disappears next to the work measured.
+
+Registry: counters and histograms aggregated in the web process and
+rendered in Prometheus text format by /metrics. Workers return the job's
+trace (a small dict) with the job result; jobs.py feeds it to
+record_job(), so nothing else crosses process boundaries. The same dict
+is stored on Job.timings for diagnosing slow uploads later.
+"""
+
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+
+# ==============================
+# CONFIG
+# ==============================
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+BATCH_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+INGEST_CHUNK = 1024  # lines read per timed ingest step
+
+
+def rss_bytes() -> int:
+    """Current resident set size (0 where it cannot be read)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # best effort: process peak
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# ==============================
+# Tracing (worker side)
+# ==============================
+class Trace:
+    """Timings of one job; spans with the same name add up."""
+
+    def __init__(self, kind: str = "upload"):
+        self.kind = kind
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.batches = []
+        self.peak_rss = rss_bytes()
+        self.lines = 0
+
+    def add(self, name: str, seconds: float):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    @contextmanager
+    def span(self, name: str, exclude: str = None):
+        """Time the block into `name`, minus what span `exclude` gained inside it."""
+        t = time.perf_counter()
+        inner = self.spans.get(exclude, 0.0)
+        try:
+            yield
+        finally:
+            inner = self.spans.get(exclude, 0.0) - inner
+            self.add(name, time.perf_counter() - t - inner)
+            self.sample_memory()
+
+    def batch(self, seconds: float):
+        self.batches.append(seconds)
+
+    def sample_memory(self):
+        self.peak_rss = max(self.peak_rss, rss_bytes())
+
+    def timed_lines(self, lines, name: str = "ingest"):
+        """Wrap a line iterator; time spent producing lines goes to span `name`."""
+        it = iter(lines)
+        while True:
+            t = time.perf_counter()
+            chunk = []
+            for line in it:
+                chunk.append(line)
+                if len(chunk) == INGEST_CHUNK:
+                    break
+            self.add(name, time.perf_counter() - t)
+            if not chunk:
+                return
+            yield from chunk
+
+    def to_dict(self, queue_wait: float = None) -> dict:
+        total = time.perf_counter() - self.started
+        out = {
+            "kind": self.kind,
+            "total_s": round(total, 4),
+            "queue_wait_s": round(queue_wait, 4) if queue_wait is not None else None,
+            "lines": self.lines,
+            "lines_per_s": round(self.lines / total, 1) if total and self.lines else None,
+            "peak_rss_mb": round(self.peak_rss / 2 ** 20, 1),
+            "spans": {name: round(seconds, 4) for name, seconds in self.spans.items()},
+        }
+        if self.batches:
+            b = np.asarray(self.batches)
+            out["inference_batches"] = {
+                "count": len(b),
+                "p50_ms": round(float(np.percentile(b, 50)) * 1000, 3),
+                "p95_ms": round(float(np.percentile(b, 95)) * 1000, 3),
+                "max_ms": round(float(b.max()) * 1000, 3),
+            }
+            out["batch_seconds"] = [round(s, 5) for s in self.batches]  # consumed by record_job
+        return out
+
+
+class _NullTrace:
+    """What current_trace() returns outside a traced job."""
+
+    def add(self, name, seconds):
+        pass
+
+    @contextmanager
+    def span(self, name, exclude=None):
+        yield
+
+    def batch(self, seconds):
+        pass
+
+    def sample_memory(self):
+        pass
+
+    def timed_lines(self, lines, name="ingest"):
+        return lines
+
+
+_NULL = _NullTrace()
+_local = threading.local()
+
+
+def current_trace():
+    return getattr(_local, "trace", None) or _NULL
+
+
+@contextmanager
+def tracing(trace: Trace):
+    """Make `trace` the current trace of this thread."""
+    previous = getattr(_local, "trace", None)
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+# ==============================
+# Registry (web process)
+# ==============================
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+class Counter:
+
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self.values = {}
+
+    def inc(self, value: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with _registry_lock:
+            self.values[key] = self.values.get(key, 0.0) + value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in self.values.items():
+            yield f"{self.name}{_labels(dict(key))} {_number(value)}"
+
+
+class Histogram:
+
+    def __init__(self, name: str, help: str, buckets=DURATION_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels → [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with _registry_lock:
+            series = self.series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, series in self.series.items():
+            labels = dict(key)
+            for bound, count in zip(self.buckets, series):
+                yield f"{self.name}_bucket{_labels({**labels, 'le': _number(bound)})} {count}"
+            yield f"{self.name}_bucket{_labels({**labels, 'le': '+Inf'})} {series[-1]}"
+            yield f"{self.name}_sum{_labels(labels)} {_number(series[-2])}"
+            yield f"{self.name}_count{_labels(labels)} {series[-1]}"
+
+
+_registry_lock = threading.Lock()
+
+JOBS = Counter("log_analyzer_jobs_total", "Finished jobs by kind and status.")
+LINES = Counter("log_analyzer_lines_processed_total", "Log lines parsed and scored.")
+JOB_SECONDS = Histogram("log_analyzer_job_duration_seconds", "Wall time of a job, queue wait excluded.")
+QUEUE_SECONDS = Histogram("log_analyzer_job_queue_wait_seconds", "Time between enqueue and a worker picking the job up.")
+STAGE_SECONDS = Histogram("log_analyzer_stage_duration_seconds", "Time per pipeline stage within one job.")
+BATCH_SECONDS = Histogram("log_analyzer_inference_batch_seconds", "Latency of one model forward pass.", BATCH_BUCKETS)
+JOB_RSS = Histogram(
+    "log_analyzer_job_peak_rss_bytes", "Peak worker RSS seen during a job.",
+    tuple(2 ** n for n in range(27, 36)),  # 128 MB … 32 GB
+)
+
+METRICS = (JOBS, LINES, JOB_SECONDS, QUEUE_SECONDS, STAGE_SECONDS, BATCH_SECONDS, JOB_RSS)
+
+
+def record_job(timings: dict, status: str = "done"):
+    """Fold one job's trace (Trace.to_dict) into the registry."""
+    if not timings:
+        return
+    kind = timings.get("kind", "upload")
+    JOBS.inc(kind=kind, status=status)
+    LINES.inc(timings.get("lines") or 0, kind=kind)
+    JOB_SECONDS.observe(timings["total_s"], kind=kind)
+    if timings.get("queue_wait_s") is not None:
+        QUEUE_SECONDS.observe(timings["queue_wait_s"], kind=kind)
+    for stage, seconds in timings.get("spans", {}).items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    for seconds in timings.get("batch_seconds", ()):
+        BATCH_SECONDS.observe(seconds)
+    if timings.get("peak_rss_mb"):
+        JOB_RSS.observe(timings["peak_rss_mb"] * 2 ** 20, kind=kind)
+
+
+def render(gauges=()) -> str:
+    """
+    Prometheus text exposition of the registry plus scrape-time gauges:
+    `gauges` is an iterable of (name, help, [(labels, value), ...]).
+    """
+    out = []
+    with _registry_lock:
+        for metric in METRICS:
+            out.extend(metric.render())
+
+    for name, help, samples in gauges:
+        out.append(f"# HELP {name} {help}")
+        out.append(f"# TYPE {name} gauge")
+        out.extend(f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples)
+
+    return "\n".join(out) + "\n"
@@ -0,0 +1,292 @@
+"""
+Versioned schema / data migrations, applied in order by storage.init_db().
+
+Each entry is (version, name, migrate(engine)). The database records the
+last applied version in PRAGMA user_version. Migrations must be
+idempotent: a fresh users.db built by create_all already has every column.
+New migrations go at the end with the next version number.
+"""
+
+import os
+import tempfile
+
+from sqlalchemy import inspect, text
+
+from storage import add_missing_columns
+
+
+def _has_table(engine, table: str) -> bool:
+    return table in inspect(engine).get_table_names()
+
+
+def _vacuum(engine):
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM")
+
+
+# ==============================
+# 1. filesize (was migration_fill_filesize.py)
+# ==============================
+def fill_filesize(engine):
+    if not _has_table(engine, "upload"):
+        return
+    with engine.begin() as conn:
+        add_missing_columns(conn, "upload", {"filesize": "INTEGER"})
+        conn.execute(text(
+            "UPDATE upload SET filesize = length(CAST(raw_log AS BLOB)) "
+            "WHERE filesize IS NULL AND raw_log IS NOT NULL AND raw_log != ''"
+        ))
+
+
+# ==============================
+# 2. Job.stats
+# ==============================
+def job_stats_column(engine):
+    if not _has_table(engine, "job"):
+        return
+    with engine.begin() as conn:
+        add_missing_columns(conn, "job", {"stats": "VARCHAR"})
+
+
+# ==============================
+# 3. Results → Parquet (was migration_results_to_parquet.py)
+# ==============================
+# Plain SQL, not the Upload model: later migrations add columns the
+# model already declares.
+def results_to_parquet(engine):
+    import json
+    import pandas as pd
+    from result_store import new_result_path, write_results
+
+    if not _has_table(engine, "upload"):
+        return
+    with engine.begin() as conn:
+        add_missing_columns(conn, "upload", {
+            "result_path": "VARCHAR",
+            "result_rows": "INTEGER",
+            "result_anomalies": "INTEGER",
+            "result_bytes": "INTEGER",
+        })
+        upload_ids = conn.execute(text(
+            "SELECT id FROM upload WHERE structured_log IS NOT NULL AND result_path IS NULL"
+        )).scalars().all()
+
+    # One upload at a time, so only one JSON blob is in memory
+    for upload_id in upload_ids:
+        with engine.begin() as conn:
+            user_id, structured = conn.execute(
+                text("SELECT user_id, structured_log FROM upload WHERE id = :id"), {"id": upload_id}
+            ).one()
+
+            path = new_result_path(user_id)
+            meta = write_results(pd.DataFrame(json.loads(structured)), path)
+            conn.execute(text(
+                "UPDATE upload SET result_path = :path, result_rows = :rows, "
+                "result_anomalies = :anomalies, result_bytes = :bytes, structured_log = NULL "
+                "WHERE id = :id"
+            ), {"id": upload_id, "path": path, **meta})
+        print(f"   ➤ Upload {upload_id} results → {path}")
+
+    if upload_ids:
+        _vacuum(engine)
+
+
+# ==============================
+# 4. Raw logs → blob store (was migration_raw_to_blobs.py)
+# ==============================
+def raw_to_blobs(engine):
+    from blob_store import put_file
+
+    if not _has_table(engine, "upload"):
+        return
+    with engine.begin() as conn:
+        add_missing_columns(conn, "upload", {
+            "raw_hash": "VARCHAR",
+            "raw_stored_size": "INTEGER",
+        })
+        upload_ids = conn.execute(text(
+            "SELECT id FROM upload WHERE raw_log != '' AND raw_hash IS NULL"
+        )).scalars().all()
+
+    for upload_id in upload_ids:
+        with engine.begin() as conn:
+            raw_log = conn.execute(
+                text("SELECT raw_log FROM upload WHERE id = :id"), {"id": upload_id}
+            ).scalar_one()
+
+            fd, tmp_path = tempfile.mkstemp(suffix=".raw")
+            with os.fdopen(fd, "wb") as f:
+                f.write(raw_log.encode("utf-8"))
+            try:
+                meta = put_file(tmp_path)
+            finally:
+                os.remove(tmp_path)
+
+            conn.execute(text(
+                "UPDATE upload SET raw_hash = :hash, filesize = :size, "
+                "raw_stored_size = :stored_size, raw_log = '' WHERE id = :id"
+            ), {"id": upload_id, **meta})
+        print(f"   ➤ Upload {upload_id} raw log → blob {meta['hash'][:12]} "
+              f"({meta['size']} → {meta['stored_size']} bytes)")
+
+    if upload_ids:
+        _vacuum(engine)
+
+
+# ==============================
+# 5. Precomputed analysis summaries
+# ==============================
+def analysis_summaries(engine):
+    import json
+    from analysis import summarize
+    from dl_model import THRESHOLD
+    from result_store import read_results
+
+    if not _has_table(engine, "upload"):
+        return
+    with engine.begin() as conn:
+        add_missing_columns(conn, "upload", {"summary": "VARCHAR"})
+        rows = conn.execute(text(
+            "SELECT id, result_path FROM upload WHERE result_path IS NOT NULL AND summary IS NULL"
+        )).all()
+
+    for upload_id, path in rows:
+        if not os.path.exists(path):
+            continue
+        summary = summarize(read_results(path), threshold=THRESHOLD)
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE upload SET summary = :summary WHERE id = :id"),
+                {"id": upload_id, "summary": json.dumps(summary)},
+            )
+        print(f"   ➤ Upload {upload_id} summary computed")
+
+
+# ==============================
+# 6. Timestamps in result files
+# ==============================
+def result_timestamps(engine):
+    from Log_parser import extract_timestamps
+    from result_store import read_results, write_results
+
+    if not _has_table(engine, "upload"):
+        return
+    with engine.begin() as conn:
+        add_missing_columns(conn, "upload", {"time_start": "DATETIME", "time_end": "DATETIME"})
+        rows = conn.execute(text(
+            "SELECT id, result_path FROM upload WHERE result_path IS NOT NULL AND time_start IS NULL"
+        )).all()
+
+    for upload_id, path in rows:
+        if not os.path.exists(path):
+            continue
+
+        df = read_results(path)
+        if "Timestamp" not in df.columns:
+            df["Timestamp"] = extract_timestamps(df["Content"])
+        meta = write_results(df, path)
+
+        with engine.begin() as conn:
+            conn.execute(text(
+                "UPDATE upload SET time_start = :time_start, time_end = :time_end, "
+                "result_bytes = :bytes WHERE id = :id"
+            ), {"id": upload_id, **meta})
+        print(f"   ➤ Upload {upload_id} timestamps: {meta['time_start']} → {meta['time_end']}")
+
+
+# ==============================
+# 7. Search index for existing uploads
+# ==============================
+def search_index_backfill(engine):
+    from result_store import read_results
+    from search_index import get_search_index
+
+    if not _has_table(engine, "upload"):
+        return
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT id, user_id, result_path FROM upload WHERE result_path IS NOT NULL"
+        )).all()
+
+    index = get_search_index()
+    for upload_id, user_id, path in rows:
+        if index.is_indexed(upload_id) or not os.path.exists(path):
+            continue
+        index.add_upload(user_id, upload_id, read_results(
+            path, columns=["LineId", "Content", "EventId", "EventTemplate"]
+        ))
+        print(f"   ➤ Upload {upload_id} indexed for search")
+
+
+# ==============================
+# 8. Appendable uploads
+# ==============================
+def appendable_uploads(engine):
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    if not _has_table(engine, "upload"):
+        return
+    with engine.begin() as conn:
+        add_missing_columns(conn, "upload", {"line_count": "INTEGER", "updated_at": "DATETIME"})
+        if _has_table(engine, "job"):
+            add_missing_columns(conn, "job", {"append_to": "INTEGER REFERENCES upload (id)"})
+        rows = conn.execute(text(
+            "SELECT id, result_path FROM upload WHERE result_path IS NOT NULL AND line_count IS NULL"
+        )).all()
+
+    for upload_id, path in rows:
+        if not os.path.exists(path):
+            continue
+        last = pc.max(pq.read_table(path, columns=["LineId"])["LineId"]).as_py()
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE upload SET line_count = :n WHERE id = :id"),
+                {"id": upload_id, "n": 0 if last is None else last + 1},
+            )
+
+
+# ==============================
+# 9. Per-job timings
+# ==============================
+def job_timings_column(engine):
+    if not _has_table(engine, "job"):
+        return
+    with engine.begin() as conn:
+        add_missing_columns(conn, "job", {"timings": "TEXT"})
+
+
+# ==============================
+# 10. Per-upload masking profiles
+# ==============================
+def masking_profile_columns(engine):
+    # Existing uploads stay NULL: their miners were unmasked ("none")
+    with engine.begin() as conn:
+        add_missing_columns(conn, "upload", {"masking_profile": "TEXT"})
+        if _has_table(engine, "job"):
+            add_missing_columns(conn, "job", {"masking_profile": "TEXT"})
+
+
+# ==============================
+# 11. Append state: raw segments + summary state
+# ==============================
+def append_state_columns(engine):
+    # Both stay NULL on existing rows: a single raw blob, and a summary
+    # state rebuilt on the upload's first append
+    with engine.begin() as conn:
+        add_missing_columns(conn, "upload", {"raw_segments": "TEXT", "summary_state": "TEXT"})
+
+
+MIGRATIONS = [
+    (1, "fill upload.filesize", fill_filesize),
+    (2, "add job.stats", job_stats_column),
+    (3, "move structured results to Parquet", results_to_parquet),
+    (4, "move raw logs to the blob store", raw_to_blobs),
+    (5, "precompute analysis summaries", analysis_summaries),
+    (6, "extract timestamps into result files", result_timestamps),
+    (7, "build the search index", search_index_backfill),
+    (8, "add upload.line_count / updated_at and job.append_to", appendable_uploads),
+    (9, "add job.timings", job_timings_column),
+    (10, "add upload/job.masking_profile", masking_profile_columns),
+    (11, "add upload.raw_segments / summary_state", append_state_columns),
+]
@@ -0,0 +1,210 @@
+"""
+Resident, per-tenant Drain3 template miners.
+
+Every tenant (one user, or one log source) gets its own TemplateMiner and
+its own snapshot file, so uploads from different users no longer share one
+tree and one 20,000-cluster cap. Miners stay in memory between jobs of the
+same worker process and the least recently used ones are evicted.
+
+State is written as compressed snapshots every SNAPSHOT_INTERVAL_MINUTES
+while mining and once at the end of each job, never on every cluster
+change. A per-tenant file lock serialises jobs across worker processes;
+a miner whose snapshot was rewritten by another process is reloaded.
+"""
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from drain3 import TemplateMiner
+from drain3.file_persistence import FilePersistence
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# ==========================================
+# CONFIG
+# ==========================================
+MINER_DIR = "drain3_state"
+MAX_RESIDENT_MINERS = int(os.environ.get("LOG_ANALYZER_MAX_MINERS", "16"))
+IDLE_EVICT_SECONDS = 30 * 60
+SNAPSHOT_INTERVAL_MINUTES = 5
+
+
+# ==========================================
+# Persistence + locking helpers
+# ==========================================
+class AtomicFilePersistence(FilePersistence):
+    """FilePersistence that never leaves a half-written snapshot behind."""
+
+    def save_state(self, state):
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(state)
+        os.replace(tmp_path, self.file_path)
+
+
+class _FileLock:
+    """Exclusive inter-process lock on `<snapshot>.lock`."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = None
+
+    def acquire(self):
+        self._fh = open(self.path, "a+b")
+        if fcntl:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+        else:
+            self._fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+
+    def release(self):
+        if fcntl:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+        else:
+            self._fh.seek(0)
+            msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+        self._fh.close()
+        self._fh = None
+
+
+class ResidentTemplateMiner(TemplateMiner):
+    """
+    TemplateMiner that only snapshots periodically.
+    Stock Drain3 serialises the whole tree on every cluster change.
+    """
+
+    def get_snapshot_reason(self, change_type, cluster_id):
+        if time.time() - self.last_save_time >= self.config.snapshot_interval_minutes * 60:
+            return "periodic"
+        return None
+
+    def snapshot(self, reason="end of job"):
+        self.save_state(reason)
+        self.last_save_time = time.time()
+
+
+# ==========================================
+# Registry
+# ==========================================
+class _Entry:
+    __slots__ = ("tm", "path", "masking", "lock", "file_lock", "stamp", "last_used")
+
+    def __init__(self, path, masking="none"):
+        self.tm = None
+        self.path = path
+        self.masking = masking
+        self.lock = threading.Lock()
+        self.file_lock = _FileLock(f"{path}.lock")
+        self.stamp = None
+        self.last_used = time.time()
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except FileNotFoundError:
+        return None
+
+
+def tenant_state_path(tenant: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", str(tenant))
+    return os.path.join(MINER_DIR, f"{safe}.bin")
+
+
+class MinerRegistry:
+    """LRU map of tenant → resident TemplateMiner."""
+
+    def __init__(self, max_miners=MAX_RESIDENT_MINERS, idle_seconds=IDLE_EVICT_SECONDS):
+        self.max_miners = max_miners
+        self.idle_seconds = idle_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, entry):
+        from Log_parser import build_template_miner_config
+
+        cfg = build_template_miner_config(entry.masking)
+        cfg.snapshot_interval_minutes = SNAPSHOT_INTERVAL_MINUTES
+        cfg.snapshot_compress_state = True
+
+        entry.tm = ResidentTemplateMiner(AtomicFilePersistence(entry.path), cfg)
+        entry.stamp = _file_stamp(entry.path)
+
+    def _entry(self, tenant, masking):
+        with self._lock:
+            entry = self._entries.get(tenant)
+            if entry is None:
+                os.makedirs(MINER_DIR, exist_ok=True)
+                entry = _Entry(tenant_state_path(tenant), masking)
+                self._entries[tenant] = entry
+            self._entries.move_to_end(tenant)
+            entry.last_used = time.time()
+            self._evict(keep=tenant)
+            return entry
+
+    def _evict(self, keep=None):
+        """Drop idle / least recently used miners that nobody is using."""
+        now = time.time()
+        for tenant in list(self._entries):
+            if tenant == keep:
+                continue
+            if len(self._entries) <= self.max_miners and now - self._entries[tenant].last_used < self.idle_seconds:
+                continue
+            entry = self._entries[tenant]
+            if entry.lock.acquire(blocking=False):
+                try:
+                    entry.tm = None  # already snapshotted at end of its last job
+                    del self._entries[tenant]
+                finally:
+                    entry.lock.release()
+
+    @contextmanager
+    def checkout(self, tenant, masking="none"):
+        """
+        Exclusive use of a tenant's miner for one job.
+        `masking` is the profile the tenant is mined with; it must not
+        change for a tenant (key one tenant per profile instead).
+        The snapshot is written when the block exits.
+        """
+        entry = self._entry(tenant, masking)
+
+        with entry.lock:
+            entry.file_lock.acquire()
+            try:
+                # Another process may have advanced this tenant's state
+                if entry.tm is None or _file_stamp(entry.path) != entry.stamp:
+                    self._load(entry)
+
+                yield entry.tm
+
+                entry.tm.snapshot()
+                entry.stamp = _file_stamp(entry.path)
+            except BaseException:
+                # The in-memory tree may be half-updated; reload next time
+                entry.tm = None
+                raise
+            finally:
+                entry.last_used = time.time()
+                entry.file_lock.release()
+
+    def resident(self):
+        with self._lock:
+            return [t for t, e in self._entries.items() if e.tm is not None]
+
+
+registry = MinerRegistry()
@@ -1,8 +1,31 @@
-from sqlmodel import SQLModel, Field, Relationship, create_engine
+from sqlmodel import SQLModel, Field, Relationship, select
+from sqlalchemy import Index, or_, tuple_
 from datetime import datetime
 from typing import Optional, List
 import pandas as pd
 import json
+import io
+
+from result_store import (
+    new_result_path, write_results, append_results, read_results, iter_results,
+    result_columns, result_size, filter_frame, remove_results,
+)
+from blob_store import put_file, append_segment, open_segments, remove_blob
+from search_index import get_search_index
+from bi_export import remove_upload as remove_export
+
+
+PAGE_SIZE = 50  # uploads per listing page
+
+
+def readable_size(size: Optional[int]) -> str:
+    if not size:
+        return "N/A"
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.2f} {unit}"
+        size /= 1024
+    return f"{size:.2f} TB"
 
 
 # ================================
@@ -10,8 +33,8 @@ import json
 # ================================
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    username: str
-    email: str
+    username: str = Field(index=True, unique=True)  # looked up on every signin
+    email: str = Field(index=True, unique=True)
     password: str
 
     uploads: List["Upload"] = Relationship(back_populates="user")
@@ -21,15 +44,36 @@ class User(SQLModel, table=True):
 # Upload Model
 # ================================
 class Upload(SQLModel, table=True):
+    # Serves "WHERE user_id = ? ORDER BY uploaded_at DESC, id DESC" listings
+    __table_args__ = (Index("ix_upload_user_id_uploaded_at", "user_id", "uploaded_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
 
     filename: str
-    raw_log: str  # Raw uploaded file content
-    structured_log: Optional[str] = None  # JSON string (for parsed logs)
+    raw_log: str = ""  # Legacy: inline raw content (empty for blob-stored uploads)
+    structured_log: Optional[str] = None  # Legacy: JSON string (pre-Parquet rows)
+
+    # Parsed + scored results live in a Parquet file (see result_store.py)
+    result_path: Optional[str] = None
+    result_rows: Optional[int] = None
+    result_anomalies: Optional[int] = None
+    result_bytes: Optional[int] = None
+    summary: Optional[str] = None  # JSON from analysis.summarize, computed at ingest
+    summary_state: Optional[str] = None  # JSON analysis.SummaryBuilder state; appends merge into it
+    time_start: Optional[datetime] = None  # first / last extracted log timestamp
+    time_end: Optional[datetime] = None
+    line_count: Optional[int] = None  # LineId of the next appended line
+    masking_profile: Optional[str] = None  # masking_profiles.PROFILES key; None: mined unmasked
+
+    # Raw upload lives compressed in the blob store (see blob_store.py)
+    raw_hash: Optional[str] = Field(default=None, index=True)  # SHA-256 of the original bytes (chained once appended)
+    raw_stored_size: Optional[int] = None  # compressed size on disk
+    raw_segments: Optional[str] = None  # JSON [[digest, size], ...] once appended to; None: just raw_hash
 
-    filesize: Optional[int] = None
+    filesize: Optional[int] = None  # original size
     uploaded_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: Optional[datetime] = None  # last append
 
     user: Optional[User] = Relationship(back_populates="uploads")
 
@@ -38,45 +82,265 @@ class Upload(SQLModel, table=True):
     # -------------------------------
     @property
     def size_readable(self):
-        if not self.filesize:
-            return "N/A"
-        size = self.filesize
-        for unit in ["B", "KB", "MB", "GB"]:
-            if size < 1024:
-                return f"{size:.2f} {unit}"
-            size /= 1024
-        return f"{size:.2f} TB"
+        return readable_size(self.filesize)
+
+    @property
+    def has_results(self) -> bool:
+        return bool(self.result_path or self.structured_log)
 
     # -------------------------------
-    # Save structured log (DataFrame → JSON)
+    # Save structured log (DataFrame → Parquet file)
     # -------------------------------
     def set_structured(self, df: pd.DataFrame):
         """
-        Stores DataFrame as JSON list of records.
-        Example:
-        [
-            {"LineId": 0, "Content": "...", ...},
-            {"LineId": 1, "Content": "...", ...}
-        ]
+        Writes the DataFrame to a new Parquet file and stores only the
+        path + row / anomaly counts on the row.
         """
-        self.structured_log = df.to_json(orient="records")
+        if not self.result_path:
+            self.result_path = new_result_path(self.user_id)
+
+        meta = write_results(df, self.result_path)
+        self.result_rows = meta["rows"]
+        self.result_anomalies = meta["anomalies"]
+        self.result_bytes = meta["bytes"]
+        self.time_start = meta["time_start"]
+        self.time_end = meta["time_end"]
+        self.line_count = int(df["LineId"].max()) + 1 if len(df) else 0
+        self.structured_log = None
+
+    def append_structured(self, df: pd.DataFrame, compact: bool = True):
+        """Add the results of appended lines as a new part (old parts are untouched)."""
+        self.result_path, meta = append_results(df, self.result_path, compact=compact)
+        self.result_rows = (self.result_rows or 0) + meta["rows"]
+        self.result_anomalies = (self.result_anomalies or 0) + meta["anomalies"]
+        self.result_bytes = result_size(self.result_path)
+
+        starts = [t for t in (self.time_start, meta["time_start"]) if t is not None]
+        ends = [t for t in (self.time_end, meta["time_end"]) if t is not None]
+        self.time_start = min(starts) if starts else None
+        self.time_end = max(ends) if ends else None
+
+        if len(df):
+            self.line_count = int(df["LineId"].max()) + 1
+        self.updated_at = datetime.utcnow()
 
     # -------------------------------
-    # Load structured log (JSON → DataFrame)
+    # Load structured log (Parquet / legacy JSON → DataFrame)
     # -------------------------------
-    def get_structured(self) -> Optional[pd.DataFrame]:
+    def get_structured(self, columns=None, filters=None) -> Optional[pd.DataFrame]:
         """
-        Reads structured_log JSON and returns a valid DataFrame.
+        Returns the results as a DataFrame.
+        columns: only load these columns
+        filters: pyarrow-style row filters, e.g. [("pred_label", "==", 1)]
         """
+        if self.result_path:
+            return read_results(self.result_path, columns=columns, filters=filters)
+
         if not self.structured_log:
             return None
 
-        # Convert JSON string → Python list → DataFrame
+        # Legacy rows: Convert JSON string → Python list → DataFrame
         data_list = json.loads(self.structured_log)
-        return pd.DataFrame(data_list)
+        df = pd.DataFrame(data_list)
+        if columns or filters:
+            df = filter_frame(df, columns, filters)
+        return df
+
+    # -------------------------------
+    # Raw log (file → blob store → stream)
+    # -------------------------------
+    def set_raw_file(self, path: str):
+        """Compress the uploaded file into the blob store."""
+        meta = put_file(path)
+        self.raw_hash = meta["hash"]
+        self.filesize = meta["size"]
+        self.raw_stored_size = meta["stored_size"]
+        self.raw_log = ""
+
+    def raw_segment_list(self) -> list:
+        """[(digest, size), ...] of the raw log's blobs, in order."""
+        if self.raw_segments:
+            return [tuple(segment) for segment in json.loads(self.raw_segments)]
+        return [(self.raw_hash, self.filesize or 0)] if self.raw_hash else []
+
+    def append_raw_file(self, path: str, offset: int):
+        """Store path[offset:] (the appended bytes) as one more raw segment."""
+        segments = self.raw_segment_list()
+        meta = append_segment(self.raw_hash, path, offset)
+        segments.append((meta["hash"], meta["size"]))
+        self.raw_segments = json.dumps(segments)
+        self.raw_hash = meta["hash"]
+        self.filesize = (self.filesize or 0) + meta["size"]
+        self.raw_stored_size = (self.raw_stored_size or 0) + meta["stored_size"]
+
+    def release_blob(self, db, digest: str):
+        """Remove a blob this upload no longer uses, unless another upload does."""
+        shared = db.exec(
+            select(Upload.id).where(
+                or_(Upload.raw_hash == digest, Upload.raw_segments.contains(digest)),
+                Upload.id != self.id,
+            )
+        ).first()
+        if shared is None and digest != self.raw_hash:
+            remove_blob(digest)
+
+    def open_raw(self):
+        """Binary file-like object with the original upload (decompressed)."""
+        if self.raw_hash:
+            return open_segments([digest for digest, _ in self.raw_segment_list()])
+        return io.BytesIO(self.raw_log.encode("utf-8"))
+
+    def iter_structured(self, columns=None, filters=None, batch_size: int = 10_000):
+        """Yield the results as DataFrame chunks (same arguments as get_structured)."""
+        if self.result_path:
+            yield from iter_results(self.result_path, columns, filters, batch_size)
+            return
+
+        df = self.get_structured(columns, filters)
+        if df is not None:
+            for start in range(0, len(df), batch_size):
+                yield df.iloc[start:start + batch_size]
+
+    def structured_columns(self) -> List[str]:
+        if self.result_path:
+            return result_columns(self.result_path)
+        df = self.get_structured()
+        return list(df.columns) if df is not None else []
+
+    def get_summary(self) -> Optional[dict]:
+        return json.loads(self.summary) if self.summary else None
+
+    def get_summary_state(self) -> Optional[dict]:
+        return json.loads(self.summary_state) if self.summary_state else None
+
+    def delete_files(self, db):
+        """
+        Remove the result file, and the raw blob unless another upload
+        has the same content. Call before deleting the row.
+        """
+        remove_results(self.result_path)
+        self.result_path = None
+
+        if self.raw_hash:
+            segments, self.raw_hash, self.raw_segments = self.raw_segment_list(), None, None
+            for digest, _ in segments:
+                self.release_blob(db, digest)
+
+
+def remove_upload(db, upload_id: int, user_id: int) -> bool:
+    """Delete one of the user's uploads and its files (run via storage.write)."""
+    upload = db.exec(
+        select(Upload).where(Upload.id == upload_id, Upload.user_id == user_id)
+    ).first()
+    if not upload:
+        return False
+
+    upload.delete_files(db)
+    get_search_index().remove_upload(upload.id)
+    remove_export(upload.user_id, upload.id)
+    db.delete(upload)
+    return True
+
+
+# ================================
+# Upload listings (metadata only, keyset-paginated)
+# ================================
+class UploadListing:
+    """One row of a listing page; never carries the raw / result blobs."""
+    __slots__ = ("id", "filename", "filesize", "uploaded_at", "has_results")
+
+    def __init__(self, row):
+        self.id = row.id
+        self.filename = row.filename
+        self.filesize = row.filesize
+        self.uploaded_at = row.uploaded_at
+        self.has_results = bool(row.has_results)
+
+    @property
+    def size_readable(self):
+        return readable_size(self.filesize)
+
+    @property
+    def cursor(self) -> str:
+        return f"{self.uploaded_at.isoformat()}_{self.id}"
+
+
+def _parse_cursor(cursor: Optional[str]):
+    try:
+        stamp, _, upload_id = cursor.rpartition("_")
+        return datetime.fromisoformat(stamp), int(upload_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def list_uploads(db, user_id: int, cursor: Optional[str] = None, limit: int = PAGE_SIZE):
+    """
+    Newest-first page of a user's uploads and the cursor of the next page
+    (None on the last page). Only metadata columns are selected.
+    """
+    query = (
+        select(
+            Upload.id,
+            Upload.filename,
+            Upload.filesize,
+            Upload.uploaded_at,
+            or_(Upload.result_path.is_not(None), Upload.structured_log.is_not(None)).label("has_results"),
+        )
+        .where(Upload.user_id == user_id)
+        .order_by(Upload.uploaded_at.desc(), Upload.id.desc())
+        .limit(limit + 1)
+    )
+
+    after = _parse_cursor(cursor)
+    if after:
+        query = query.where(tuple_(Upload.uploaded_at, Upload.id) < tuple_(*after))
+
+    rows = [UploadListing(row) for row in db.exec(query).all()]
+    next_cursor = rows[limit - 1].cursor if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+# ================================
+# Job Model (background processing)
+# ================================
+class Job(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    upload_id: Optional[int] = Field(default=None, foreign_key="upload.id")
+    append_to: Optional[int] = Field(default=None, foreign_key="upload.id")  # append job: target upload
+
+    filename: str
+    ext: str
+    spool_path: str  # Uploaded file saved to disk, waiting for the worker
+    masking_profile: Optional[str] = None  # Drain3 masking profile for the new upload
+
+    status: str = "queued"  # queued | running | done | failed
+    stage: Optional[str] = None  # parse | infer | save | index | export
+    progress: float = 0.0  # 0.0 → 1.0 within the current stage
+    error: Optional[str] = None
+    stats: Optional[str] = None  # JSON: per-job counters (e.g. score-cache hits)
+    timings: Optional[str] = None  # JSON: metrics.Trace (spans, queue wait, throughput, peak RSS)
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    def to_status(self) -> dict:
+        """JSON-friendly view used by the status endpoint."""
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 3),
+            "error": self.error,
+            "upload_id": self.upload_id,
+            "stats": json.loads(self.stats) if self.stats else None,
+            "timings": json.loads(self.timings) if self.timings else None,
+        }
 
 
 # ================================
-# Database Engine
+# Database Engine (tuned + shared, see storage.py)
 # ================================
-engine = create_engine("sqlite:///users.db")
+from storage import engine  # noqa: E402
@@ -0,0 +1,268 @@
+"""
+Columnar on-disk storage for structured results.
+
+Each upload's parsed + scored DataFrame is written once as a Parquet file
+under RESULTS_DIR; the Upload row keeps only the relative path and a few
+metadata fields. EventTemplate (and EventId) are dictionary-encoded, so a
+template repeated on a million rows is stored once per row group, and
+scores are float32.
+
+Appending to an upload (see jobs.py) adds part files: the result path is
+then a directory that pyarrow reads as one dataset.
+
+Readers project columns and push row filters down to Parquet, e.g.
+
+    read_results(path, columns=["Content", "anomaly_score"],
+                 filters=[("pred_label", "==", 1)])
+
+only decodes the two columns and skips row groups with no anomalies.
+
+Rows stay in LineId order on disk. Logs are written roughly in time
+order, so the Timestamp min/max statistics of each row group already let
+time-range filters skip most of the file; time_window() orders what it
+returns.
+"""
+
+import os
+import shutil
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+# ==============================
+# CONFIG
+# ==============================
+RESULTS_DIR = "results"
+ROW_GROUP_SIZE = 64_000   # rows per row group (unit of filter skipping)
+COMPRESSION = "zstd"
+COMPACT_PARTS = 16        # merge a trailing run of this many small parts into one
+
+# Column → Arrow type; anything else is inferred
+SCHEMA_TYPES = {
+    "LineId": pa.int64(),
+    "Content": pa.string(),
+    "EventId": pa.int32(),
+    "EventTemplate": pa.dictionary(pa.int32(), pa.string()),
+    "anomaly_score": pa.float32(),
+    "pred_label": pa.int8(),
+    "Timestamp": pa.timestamp("us"),
+}
+
+
+def new_result_path(user_id: int) -> str:
+    """Relative path for a fresh result file of this user."""
+    return os.path.join(RESULTS_DIR, f"user_{user_id}", f"{uuid.uuid4().hex}.parquet")
+
+
+def to_table(df: pd.DataFrame) -> pa.Table:
+    """DataFrame → Arrow table with the compact result schema."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    for name, type_ in SCHEMA_TYPES.items():
+        idx = table.schema.get_field_index(name)
+        if idx >= 0 and table.schema.field(idx).type != type_:
+            table = table.set_column(idx, name, table.column(idx).cast(type_))
+
+    # pandas metadata would restore the old dtypes on read; drop it
+    return table.replace_schema_metadata(None)
+
+
+def write_results(df: pd.DataFrame, path: str) -> dict:
+    """Atomically write `df` to `path`; returns metadata for the Upload row."""
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    table = to_table(df)
+    time_start = time_end = None
+    if "Timestamp" in table.column_names:
+        bounds = pc.min_max(table["Timestamp"]).as_py()
+        time_start, time_end = bounds["min"], bounds["max"]
+
+    # Dot-prefixed: dataset discovery of a parts directory ignores it
+    tmp_path = os.path.join(folder, f".{os.path.basename(path)}.tmp")
+    pq.write_table(
+        table,
+        tmp_path,
+        row_group_size=ROW_GROUP_SIZE,
+        compression=COMPRESSION,
+        use_dictionary=["EventId", "EventTemplate"],
+    )
+    os.replace(tmp_path, path)
+
+    anomalies = None
+    if "pred_label" in df.columns:
+        anomalies = int((df["pred_label"] == 1).sum())
+
+    return {
+        "rows": table.num_rows,
+        "anomalies": anomalies,
+        "bytes": os.path.getsize(path),
+        "time_start": time_start,
+        "time_end": time_end,
+    }
+
+
+def _part_path(folder: str, n: int) -> str:
+    return os.path.join(folder, f"part-{n:05d}.parquet")
+
+
+def append_results(df: pd.DataFrame, path: str, compact: bool = True):
+    """
+    Add `df` to an upload's results as a new part file. A single-file
+    result becomes a directory of parts on its first append, a missing
+    path an empty one; readers (pyarrow datasets) treat both the same.
+    compact=False skips _compact_tail (windowed jobs keep memory flat).
+    Returns (path, part metadata).
+    """
+    if os.path.isfile(path):
+        folder = path[:-len(".parquet")] if path.endswith(".parquet") else f"{path}.d"
+        os.makedirs(folder, exist_ok=True)
+        os.replace(path, _part_path(folder, 0))
+        path = folder
+    else:
+        os.makedirs(path, exist_ok=True)
+
+    parts = _parts(path)
+    n = int(parts[-1][len("part-"):-len(".parquet")]) + 1 if parts else 0
+    meta = write_results(df, _part_path(path, n))
+    if compact:
+        _compact_tail(path)
+    return path, meta
+
+
+def _parts(folder: str):
+    return sorted(f for f in os.listdir(folder) if f.startswith("part-"))
+
+
+def _compact_tail(folder: str):
+    """
+    Frequent small appends (live streams) would leave thousands of tiny
+    parts. Once the newest COMPACT_PARTS parts are all smaller than a row
+    group they are merged into one, so every row is rewritten only a few
+    times over the upload's life.
+    """
+    run = []
+    for name in reversed(_parts(folder)):
+        part = os.path.join(folder, name)
+        if pq.ParquetFile(part).metadata.num_rows >= ROW_GROUP_SIZE:
+            break
+        run.append(part)
+    if len(run) < COMPACT_PARTS:
+        return
+
+    run.reverse()
+    merged = ds.dataset(run, format="parquet").to_table().to_pandas()
+    write_results(merged, run[-1])  # atomic replace of the newest part
+    for part in run[:-1]:
+        os.remove(part)
+
+
+def result_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, f)) for f in _parts(path))
+    return os.path.getsize(path)
+
+
+def _filter_table(table: pa.Table, columns=None, filters=None) -> pa.Table:
+    if filters:
+        table = table.filter(pq.filters_to_expression(filters))
+    if columns:
+        table = table.select([c for c in columns if c in table.column_names])
+    return table
+
+
+def read_results(path: str, columns=None, filters=None) -> pd.DataFrame:
+    """
+    Load a result file. `columns` projects, `filters` uses the pyarrow
+    DNF syntax ([("col", "op", value), ...]) and is pushed down to Parquet.
+    """
+    table = pq.read_table(path, columns=columns, filters=filters)
+    return table.to_pandas()
+
+
+def iter_results(path: str, columns=None, filters=None, batch_size: int = 10_000):
+    """Yield the result file as DataFrame chunks (never fully in memory)."""
+    scanner = ds.dataset(path, format="parquet").scanner(
+        columns=columns,
+        filter=pq.filters_to_expression(filters) if filters else None,
+        batch_size=batch_size,
+    )
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def filter_frame(df: pd.DataFrame, columns=None, filters=None) -> pd.DataFrame:
+    """Same projection / filter semantics for DataFrames already in memory."""
+    return _filter_table(to_table(df), columns, filters).to_pandas()
+
+
+# ==============================
+# Time-range queries
+# ==============================
+def _time_filters(start=None, end=None, anomalies_only=False):
+    filters = []
+    if start is not None:
+        filters.append(("Timestamp", ">=", pd.Timestamp(start)))
+    if end is not None:
+        filters.append(("Timestamp", "<", pd.Timestamp(end)))
+    if anomalies_only:
+        filters.append(("pred_label", "==", 1))
+    return filters or None
+
+
+def time_window(path: str, start=None, end=None, columns=None, anomalies_only=False, limit=None):
+    """
+    Rows with start <= Timestamp < end, ordered by (Timestamp, LineId);
+    rows without a timestamp come last. With `limit`, only the first
+    `limit` rows in that order are kept while scanning.
+    """
+    filters = _time_filters(start, end, anomalies_only)
+    read_columns = None
+    if columns:
+        read_columns = list(columns) + [c for c in ("Timestamp", "LineId") if c not in columns]
+
+    def ordered(df):
+        return df.sort_values(["Timestamp", "LineId"], na_position="last", kind="stable")
+
+    if limit is None:
+        df = ordered(read_results(path, columns=read_columns, filters=filters))
+    else:
+        df = None
+        for chunk in iter_results(path, read_columns, filters):
+            df = chunk if df is None else pd.concat([df, chunk], ignore_index=True)
+            df = ordered(df).head(limit)
+        if df is None:
+            return pd.DataFrame(columns=columns)
+
+    df = df.reset_index(drop=True)
+    return df[list(columns)] if columns else df
+
+
+def time_buckets(path: str, start=None, end=None, freq: str = "1min") -> pd.DataFrame:
+    """Lines / anomalies / anomaly rate per time bucket (buckets with lines only)."""
+    df = read_results(
+        path, columns=["Timestamp", "pred_label"], filters=_time_filters(start, end)
+    ).dropna(subset=["Timestamp"])
+
+    bucket = df["Timestamp"].dt.floor(freq)
+    out = df.groupby(bucket)["pred_label"].agg(lines="size", anomalies="sum").reset_index()
+    out["rate"] = (out["anomalies"] / out["lines"]).round(6)
+    return out.rename(columns={"Timestamp": "time"})
+
+
+def result_columns(path: str):
+    return ds.dataset(path, format="parquet").schema.names
+
+
+def remove_results(path: str):
+    if path and os.path.isdir(path):
+        shutil.rmtree(path)
+    elif path and os.path.exists(path):
+        os.remove(path)
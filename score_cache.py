@@ -0,0 +1,92 @@
+"""
+Persistent anomaly-score cache.
+
+Scores are keyed by (model version, hash of the normalized content), so
+re-uploads and overlapping logs skip inference for lines the current model
+has already scored. The cache lives in its own SQLite file, is shared by
+all worker processes and is bounded to `max_entries` rows, evicting the
+least recently used ones.
+"""
+
+import hashlib
+import sqlite3
+import time
+
+
+CACHE_PATH = "score_cache.db"
+CACHE_MAX_ENTRIES = 2_000_000
+_SQL_CHUNK = 500  # keep IN (...) lists under SQLite's variable limit
+
+
+def content_key(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ScoreCache:
+
+    def __init__(self, model_version: str, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " version TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " score REAL NOT NULL,"
+            " last_used INTEGER NOT NULL,"
+            " PRIMARY KEY (version, key))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_scores_last_used ON scores (last_used)")
+        self.conn.commit()
+
+    def get_many(self, keys) -> dict:
+        """Return {key: score} for the keys that are cached; touches them."""
+        found = {}
+        keys = list(keys)
+
+        for i in range(0, len(keys), _SQL_CHUNK):
+            chunk = keys[i:i + _SQL_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, score FROM scores WHERE version = ? AND key IN ({marks})",
+                [self.model_version, *chunk],
+            ).fetchall()
+            found.update(rows)
+
+        if found:
+            now = int(time.time())
+            hit_keys = list(found)
+            for i in range(0, len(hit_keys), _SQL_CHUNK):
+                chunk = hit_keys[i:i + _SQL_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                self.conn.execute(
+                    f"UPDATE scores SET last_used = ? WHERE version = ? AND key IN ({marks})",
+                    [now, self.model_version, *chunk],
+                )
+            self.conn.commit()
+
+        return found
+
+    def put_many(self, scores: dict):
+        if not scores:
+            return
+
+        now = int(time.time())
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO scores (version, key, score, last_used) VALUES (?, ?, ?, ?)",
+            [(self.model_version, k, float(v), now) for k, v in scores.items()],
+        )
+        self.conn.commit()
+        self._evict()
+
+    def _evict(self):
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM scores WHERE rowid IN "
+                "(SELECT rowid FROM scores ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self.conn.commit()
@@ -0,0 +1,233 @@
+"""
+Full-text and template search across all of a user's uploads.
+
+A separate SQLite FTS5 database (like score_cache.db, it keeps users.db
+small and never locks it) holds, per upload:
+
+  line_fts      distinct line contents, with first LineId, EventId and
+                how often the line occurs in the upload
+  template_fts  the upload's templates with their line counts
+
+Every row carries an indexed `owner` token (u<user_id>), so a search is an
+index intersection, never a scan over other users' data. Rows of one
+indexing pass are inserted contiguously; `segments` records their rowid
+ranges so deleting an upload is a few range deletes.
+
+Indexing runs in the job worker right after the upload is saved. Appending
+to an upload indexes only the new lines as one more segment (a line that
+already occurs in an earlier segment is then listed once per segment).
+"""
+
+import threading
+
+import pandas as pd
+import sqlite3
+
+
+# ==============================
+# CONFIG
+# ==============================
+INDEX_PATH = "search_index.db"
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+_INSERT_CHUNK = 10_000
+
+
+def _owner(user_id: int) -> str:
+    return f"u{int(user_id)}"
+
+
+def fts_query(text: str) -> str:
+    """User input → FTS5 query: every word must appear (each quoted, so no syntax errors)."""
+    terms = [t for t in text.split() if t]
+    return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+class SearchIndex:
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS line_fts USING fts5("
+            " content, owner,"
+            " upload_id UNINDEXED, line_id UNINDEXED, event_id UNINDEXED, occurrences UNINDEXED);"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS template_fts USING fts5("
+            " template, owner,"
+            " upload_id UNINDEXED, event_id UNINDEXED, lines UNINDEXED);"
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " upload_id INTEGER NOT NULL, user_id INTEGER NOT NULL,"
+            " line_first INTEGER, line_last INTEGER,"
+            " template_first INTEGER, template_last INTEGER);"
+            "CREATE INDEX IF NOT EXISTS ix_segments_upload_id ON segments (upload_id);"
+        )
+        # Older indexes kept exactly one range per upload
+        if self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'uploads'").fetchone():
+            self.conn.executescript(
+                "INSERT INTO segments SELECT upload_id, user_id, line_first, line_last,"
+                " template_first, template_last FROM uploads;"
+                "DROP TABLE uploads;"
+            )
+        self.conn.commit()
+
+    # -------------------------------
+    # Indexing
+    # -------------------------------
+    def _insert(self, table, columns, rows):
+        marks = ",".join("?" * len(columns))
+        first = last = None
+        for i in range(0, len(rows), _INSERT_CHUNK):
+            self.conn.executemany(
+                f"INSERT INTO {table} ({','.join(columns)}) VALUES ({marks})", rows[i:i + _INSERT_CHUNK]
+            )
+        if rows:
+            (last,) = self.conn.execute(f"SELECT max(rowid) FROM {table}").fetchone()
+            first = last - len(rows) + 1
+        return first, last
+
+    def add_upload(self, user_id: int, upload_id: int, df: pd.DataFrame, append: bool = False):
+        """
+        Index one upload's results (replaces a previous index of it), or
+        with append=True add `df` (the new lines only) as another segment.
+        """
+        owner = _owner(user_id)
+
+        lines = (
+            df.groupby("Content", sort=False, observed=True)
+            .agg(line_id=("LineId", "min"), event_id=("EventId", "first"), occurrences=("LineId", "size"))
+            .reset_index()
+            .sort_values("line_id")
+        )
+        line_rows = [
+            (str(r.Content), owner, upload_id, int(r.line_id), int(r.event_id), int(r.occurrences))
+            for r in lines.itertuples(index=False)
+        ]
+
+        templates = (
+            df.groupby("EventId", sort=False, observed=True)
+            .agg(template=("EventTemplate", "first"), lines=("LineId", "size"))
+            .reset_index()
+        )
+        template_rows = [
+            (str(r.template), owner, upload_id, int(r.EventId), int(r.lines))
+            for r in templates.itertuples(index=False)
+        ]
+
+        with self.lock:
+            try:
+                if not append:
+                    self._remove(upload_id)
+                line_range = self._insert(
+                    "line_fts", ("content", "owner", "upload_id", "line_id", "event_id", "occurrences"), line_rows
+                )
+                template_range = self._insert(
+                    "template_fts", ("template", "owner", "upload_id", "event_id", "lines"), template_rows
+                )
+                self.conn.execute(
+                    "INSERT INTO segments VALUES (?, ?, ?, ?, ?, ?)",
+                    (upload_id, user_id, *line_range, *template_range),
+                )
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def _remove(self, upload_id: int):
+        rows = self.conn.execute(
+            "SELECT line_first, line_last, template_first, template_last FROM segments WHERE upload_id = ?",
+            (upload_id,),
+        ).fetchall()
+        for line_first, line_last, template_first, template_last in rows:
+            if line_first is not None:
+                self.conn.execute("DELETE FROM line_fts WHERE rowid BETWEEN ? AND ?", (line_first, line_last))
+            if template_first is not None:
+                self.conn.execute(
+                    "DELETE FROM template_fts WHERE rowid BETWEEN ? AND ?", (template_first, template_last)
+                )
+        self.conn.execute("DELETE FROM segments WHERE upload_id = ?", (upload_id,))
+
+    def remove_upload(self, upload_id: int):
+        with self.lock:
+            self._remove(upload_id)
+            self.conn.commit()
+
+    def is_indexed(self, upload_id: int) -> bool:
+        with self.lock:
+            return self.conn.execute(
+                "SELECT 1 FROM segments WHERE upload_id = ?", (upload_id,)
+            ).fetchone() is not None
+
+    # -------------------------------
+    # Queries
+    # -------------------------------
+    def _match(self, column: str, user_id: int, text: str) -> str:
+        return f'owner:{_owner(user_id)} AND {column}:({fts_query(text)})'
+
+    def search_lines(self, user_id: int, text: str, cursor: int = 0, limit: int = PAGE_SIZE) -> dict:
+        """
+        Lines containing every word of `text`, across the user's uploads:
+        per-upload counts plus one page of hits (keyset on rowid).
+        """
+        if not fts_query(text):
+            return {"total_lines": 0, "total_occurrences": 0, "per_upload": [], "hits": [], "next_cursor": None}
+
+        match = self._match("content", user_id, text)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        with self.lock:
+            counts = self.conn.execute(
+                "SELECT upload_id, count(*), sum(occurrences) FROM line_fts "
+                "WHERE line_fts MATCH ? GROUP BY upload_id ORDER BY upload_id",
+                (match,),
+            ).fetchall()
+            hits = self.conn.execute(
+                "SELECT rowid, upload_id, line_id, event_id, occurrences, content FROM line_fts "
+                "WHERE line_fts MATCH ? AND rowid > ? ORDER BY rowid LIMIT ?",
+                (match, cursor or 0, limit + 1),
+            ).fetchall()
+
+        next_cursor = hits[limit - 1][0] if len(hits) > limit else None
+        return {
+            "total_lines": sum(c[1] for c in counts),
+            "total_occurrences": sum(c[2] for c in counts),
+            "per_upload": [{"upload_id": u, "lines": n, "occurrences": o} for u, n, o in counts],
+            "hits": [
+                {"upload_id": u, "line_id": l, "event_id": e, "occurrences": o, "content": c}
+                for _, u, l, e, o, c in hits[:limit]
+            ],
+            "next_cursor": next_cursor,
+        }
+
+    def search_templates(self, user_id: int, text: str, limit: int = PAGE_SIZE) -> dict:
+        """Templates containing every word of `text`, with line counts per upload."""
+        if not fts_query(text):
+            return {"templates": []}
+
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT template, upload_id, event_id, lines FROM template_fts "
+                "WHERE template_fts MATCH ? ORDER BY rank LIMIT ?",
+                (self._match("template", user_id, text), max(1, min(limit, MAX_PAGE_SIZE))),
+            ).fetchall()
+
+        by_template = {}
+        for template, upload_id, event_id, lines in rows:
+            item = by_template.setdefault(template, {"template": template, "lines": 0, "uploads": []})
+            item["lines"] += lines
+            item["uploads"].append({"upload_id": upload_id, "event_id": event_id, "lines": lines})
+
+        return {"templates": sorted(by_template.values(), key=lambda t: -t["lines"])}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex()
+        return _index
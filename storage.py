@@ -0,0 +1,208 @@
+"""
+Shared SQLite storage layer.
+
+Owns the one engine every module uses (`from storage import engine`,
+re-exported by models.py) and tunes each connection for concurrent use:
+WAL (readers never wait for writers), synchronous=NORMAL, a busy timeout,
+mmap and a larger page cache.
+
+Writes go through `write()` / `submit_write()`: a single writer thread
+per process runs them in FIFO order on a separate engine whose
+transactions start with BEGIN IMMEDIATE, so concurrent writers queue on
+the busy timeout instead of failing with "database is locked". Writes that
+arrive together are group-committed in one transaction, each inside its
+own savepoint.
+
+`init_db()` creates missing tables, applies the versioned migrations in
+migrations.py (tracked with PRAGMA user_version) and creates any missing
+index.
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from sqlalchemy import event, inspect, text
+from sqlmodel import SQLModel, Session, create_engine
+
+
+# ==============================
+# CONFIG
+# ==============================
+DATABASE_URL = os.environ.get("LOG_ANALYZER_DATABASE_URL", "sqlite:///users.db")
+BUSY_TIMEOUT_MS = 30_000
+MMAP_SIZE = 256 * 1024 * 1024        # bytes
+CACHE_SIZE_KB = 64 * 1024            # page cache per connection
+WRITE_QUEUE_SIZE = 10_000
+WRITE_BATCH = 64                     # max writes per group commit
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    f"PRAGMA mmap_size={MMAP_SIZE}",
+    f"PRAGMA cache_size=-{CACHE_SIZE_KB}",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+def _make_engine(immediate: bool = False):
+    eng = create_engine(
+        DATABASE_URL,
+        connect_args={"timeout": BUSY_TIMEOUT_MS / 1000, "check_same_thread": False},
+    )
+
+    @event.listens_for(eng, "connect")
+    def _on_connect(dbapi_conn, _record):
+        if immediate:
+            # Let SQLAlchemy emit BEGIN itself (see _on_begin)
+            dbapi_conn.isolation_level = None
+        cur = dbapi_conn.cursor()
+        for pragma in PRAGMAS:
+            cur.execute(pragma)
+        cur.close()
+
+    if immediate:
+        @event.listens_for(eng, "begin")
+        def _on_begin(conn):
+            # Take the write lock up front: a deferred transaction that has
+            # to upgrade fails with SQLITE_BUSY without waiting
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return eng
+
+
+engine = _make_engine()
+write_engine = _make_engine(immediate=True)
+
+
+# ==============================
+# Single writer
+# ==============================
+class _Writer:
+    """One thread per process that applies all writes in FIFO order."""
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((fn, args, kwargs, future))  # blocks when the queue is full
+        return future
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        while len(batch) < WRITE_BATCH:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            done = []
+
+            try:
+                with Session(write_engine, expire_on_commit=False) as db:
+                    for fn, args, kwargs, future in batch:
+                        if not future.set_running_or_notify_cancel():
+                            continue
+                        try:
+                            with db.begin_nested():
+                                result = fn(db, *args, **kwargs)
+                                db.flush()
+                            done.append((future, result))
+                        except Exception as e:
+                            future.set_exception(e)
+                    db.commit()
+            except Exception as e:
+                # Commit failed: none of the batch was written
+                for future, _ in done:
+                    future.set_exception(e)
+                continue
+
+            for future, result in done:
+                future.set_result(result)
+
+
+_writer = _Writer()
+
+
+def submit_write(fn, *args, **kwargs) -> Future:
+    """
+    Queue `fn(db, *args, **kwargs)` on the writer thread; returns a Future.
+    `fn` must not commit: the writer commits (and rolls back on error).
+    """
+    return _writer.submit(fn, *args, **kwargs)
+
+
+def write(fn, *args, **kwargs):
+    """Run `fn(db, *args, **kwargs)` on the writer thread and wait for it."""
+    return submit_write(fn, *args, **kwargs).result()
+
+
+# ==============================
+# Schema
+# ==============================
+def schema_version(conn) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def _set_schema_version(version: int):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"PRAGMA user_version={int(version)}")
+
+
+def add_missing_columns(conn, table: str, columns: dict):
+    """ALTER TABLE ... ADD COLUMN for each {name: sql_type} the table lacks."""
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    for name, type_ in columns.items():
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {type_}"))
+            print(f"   ➤ Added column {table}.{name}")
+
+
+def init_db():
+    """Create tables, apply pending migrations, create missing indexes."""
+    import models  # noqa: F401  (registers the tables on SQLModel.metadata)
+    from migrations import MIGRATIONS
+
+    with engine.begin() as conn:
+        fresh = not inspect(conn).get_table_names()
+
+    # Creates missing tables only (e.g. the Job table on an existing users.db)
+    SQLModel.metadata.create_all(engine)
+
+    with engine.connect() as conn:
+        current = schema_version(conn)
+
+    if fresh:
+        current = max(version for version, _, _ in MIGRATIONS)  # create_all built the latest schema
+        _set_schema_version(current)
+
+    # Every migration is idempotent, so a crash halfway just re-runs it
+    for version, name, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        print(f"🛠️  Migration {version}: {name}")
+        migrate(engine)
+        _set_schema_version(version)
+
+    # create_all skips indexes on tables that already existed
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
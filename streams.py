@@ -0,0 +1,356 @@
+"""
+Live log ingestion: chunked HTTP / NDJSON and an optional syslog listener.
+
+Every (user, stream name) pair owns one LiveStream: a bounded line queue
+and a thread that cuts it into micro-batches (BATCH_LINES lines or
+BATCH_SECONDS, whichever comes first). Each batch runs through Drain3 and
+the model in the job worker pool (jobs.run_stream_batch) and is appended
+to the stream's Upload ("<name>.stream.log"), so results, the summary and
+the search index grow while the stream is open. One batch per stream is
+in flight at a time; the next one fills up meanwhile.
+
+Backpressure: when inference falls behind the queue fills up and
+producers block (HTTP: the request body is read more slowly, so TCP
+pushes back on the client; after PUT_TIMEOUT the request is answered
+with 503). UDP syslog cannot be slowed down, so its lines are dropped
+and counted instead.
+
+Raw lines are collected in a side file and stored as one more raw segment
+of the upload every RAW_FLUSH_SECONDS and when the stream closes (after
+IDLE_SECONDS without lines), not on every batch. A batch or a flush only
+touches its own lines (see jobs._ingest_append), so a stream's cost stays
+linear over its lifetime.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import queue
+import threading
+import socketserver
+
+from sqlmodel import Session, select
+
+from models import Upload, engine
+from jobs import SPOOL_DIR, submit_task, run_stream_batch, flush_stream_raw
+from metrics import record_job
+
+
+# ==============================
+# CONFIG
+# ==============================
+BATCH_LINES = int(os.environ.get("LOG_ANALYZER_STREAM_BATCH_LINES", "5000"))
+BATCH_SECONDS = float(os.environ.get("LOG_ANALYZER_STREAM_BATCH_SECONDS", "2"))
+MAX_PENDING_LINES = int(os.environ.get("LOG_ANALYZER_STREAM_MAX_PENDING", "50000"))
+PUT_TIMEOUT = 30.0        # seconds a producer may be blocked before giving up
+RAW_FLUSH_SECONDS = 60.0
+IDLE_SECONDS = 300.0      # close a stream after this long without lines
+MAX_LINE_CHARS = 64 * 1024
+
+# e.g. "udp://0.0.0.0:5140" or "tcp://127.0.0.1:5140"; lines go to stream
+# "syslog" of user LOG_ANALYZER_SYSLOG_USER
+SYSLOG_LISTEN = os.environ.get("LOG_ANALYZER_SYSLOG_LISTEN", "")
+SYSLOG_USER_ID = os.environ.get("LOG_ANALYZER_SYSLOG_USER")
+
+_NAME = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+_MESSAGE_KEYS = ("message", "msg", "line", "content", "log")
+
+
+class Backpressure(Exception):
+    """The stream stayed full for PUT_TIMEOUT seconds."""
+
+
+class StreamClosed(Exception):
+    """The stream was closed for idleness; get a fresh one from get_stream()."""
+
+
+def valid_name(name: str) -> bool:
+    return bool(_NAME.match(name or ""))
+
+
+def stream_filename(name: str) -> str:
+    return f"{name}.stream.log"
+
+
+# ==============================
+# One live stream
+# ==============================
+class LiveStream:
+
+    def __init__(self, user_id: int, name: str, upload_id: int = None):
+        self.user_id = user_id
+        self.name = name
+        self.upload_id = upload_id
+        self.queue = queue.Queue(maxsize=MAX_PENDING_LINES)
+        self.retired = False  # unregistered; the thread drains what is left
+        self.closed = threading.Event()
+
+        self.raw_path = os.path.join(SPOOL_DIR, f"stream_{uuid.uuid4().hex}.raw")
+        self._raw_flushed = time.time()
+
+        self.stats = {
+            "received": 0, "processed": 0, "dropped": 0, "batches": 0,
+            "errors": 0, "last_error": None, "lines_per_s": None, "last_batch_at": None,
+        }
+        self.thread = threading.Thread(target=self._run, name=f"stream-{user_id}-{name}", daemon=True)
+        self.thread.start()
+
+    # -------------------------------
+    # Producers
+    # -------------------------------
+    def put(self, line: str, block: bool = True) -> bool:
+        """Queue one line; blocks while the stream is full (False if dropped)."""
+        line = line.rstrip("\r\n")[:MAX_LINE_CHARS]
+        if not line.strip():
+            return True
+        if self.retired:
+            raise StreamClosed(self.name)
+        try:
+            self.queue.put(line, block=block, timeout=PUT_TIMEOUT if block else None)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            if block:
+                raise Backpressure(f"Stream {self.name} is full")
+            return False
+        self.stats["received"] += 1
+        return True
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "user_id": self.user_id,
+            "upload_id": self.upload_id,
+            "pending": self.queue.qsize(),
+            **self.stats,
+        }
+
+    # -------------------------------
+    # Batching thread
+    # -------------------------------
+    def _next_batch(self):
+        try:
+            first = self.queue.get(timeout=IDLE_SECONDS)
+        except queue.Empty:
+            return None
+
+        batch = [first]
+        deadline = time.time() + BATCH_SECONDS
+        while len(batch) < BATCH_LINES:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _process(self, lines):
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        path = os.path.join(SPOOL_DIR, f"stream_{uuid.uuid4().hex}.log")
+        with open(path, "wb") as f:
+            f.write(data)
+
+        created = self.upload_id is None
+        t0 = time.time()
+        try:
+            self.upload_id, stats = submit_task(
+                run_stream_batch, self.user_id, self.upload_id, stream_filename(self.name), path
+            ).result()
+            record_job(stats.get("timings"))
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.stats["last_error"] = str(e)[:200]
+            record_job({"kind": "stream", "total_s": time.time() - t0, "lines": 0}, "failed")
+            print(f"⚠️ Stream {self.name}: batch of {len(lines)} line(s) failed: {e}")
+            if os.path.exists(path):
+                os.remove(path)
+            return
+
+        # The first batch went into the new blob; later ones wait for a flush
+        if not created:
+            with open(self.raw_path, "ab") as f:
+                f.write(data)
+
+        elapsed = time.time() - t0
+        self.stats["processed"] += len(lines)
+        self.stats["batches"] += 1
+        self.stats["lines_per_s"] = round(len(lines) / elapsed, 1) if elapsed else None
+        self.stats["last_batch_at"] = time.time()
+
+    def _flush_raw(self, force: bool = False):
+        if not force and time.time() - self._raw_flushed < RAW_FLUSH_SECONDS:
+            return
+        self._raw_flushed = time.time()
+        if self.upload_id is None or not os.path.exists(self.raw_path):
+            return
+        try:
+            submit_task(flush_stream_raw, self.upload_id, self.raw_path).result()
+            os.remove(self.raw_path)
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.stats["last_error"] = str(e)[:200]
+            print(f"⚠️ Stream {self.name}: raw flush failed: {e}")
+
+    def _run(self):
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                if _close_if_idle(self):
+                    break
+                continue
+            self._process(batch)
+            self._flush_raw()
+
+        # Lines a producer queued while the stream was being retired
+        leftover = []
+        while True:
+            try:
+                leftover.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftover:
+            self._process(leftover)
+        self._flush_raw(force=True)
+        self.closed.set()
+        print(f"⏹️ Stream {self.name} closed: {self.stats['processed']} line(s)")
+
+
+# ==============================
+# Registry (web process)
+# ==============================
+_streams = {}
+_streams_lock = threading.Lock()
+
+
+def _close_if_idle(stream: LiveStream) -> bool:
+    """Unregister an idle stream, unless a producer queued a line meanwhile."""
+    with _streams_lock:
+        if not stream.queue.empty():
+            return False
+        _streams.pop((stream.user_id, stream.name), None)
+        stream.retired = True
+        return True
+
+
+def _existing_upload(user_id: int, name: str):
+    with Session(engine) as db:
+        return db.exec(
+            select(Upload.id)
+            .where(Upload.user_id == user_id, Upload.filename == stream_filename(name))
+            .order_by(Upload.uploaded_at.desc())
+        ).first()
+
+
+def get_stream(user_id: int, name: str) -> LiveStream:
+    """The user's open stream with this name; continues its upload if one exists."""
+    key = (user_id, name)
+    with _streams_lock:
+        stream = _streams.get(key)
+        if stream is None:
+            stream = _streams[key] = LiveStream(user_id, name, _existing_upload(user_id, name))
+            print(f"▶️ Stream {name} opened for user {user_id} (upload {stream.upload_id})")
+        return stream
+
+
+def user_streams(user_id: int = None):
+    """Status of the user's open streams (every user's with user_id=None)."""
+    with _streams_lock:
+        return [s.status() for (uid, _), s in _streams.items() if user_id is None or uid == user_id]
+
+
+def is_live(upload_id: int) -> bool:
+    with _streams_lock:
+        return any(s.upload_id == upload_id for s in _streams.values())
+
+
+# ==============================
+# Line sources
+# ==============================
+def ndjson_message(line: str) -> str:
+    """One NDJSON record → log line ({"message": ...}, a JSON string, or the record itself)."""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return line
+    if isinstance(record, str):
+        return record
+    if isinstance(record, dict):
+        for key in _MESSAGE_KEYS:
+            if isinstance(record.get(key), str):
+                return record[key]
+    return json.dumps(record, separators=(",", ":"))
+
+
+def _put(stream: LiveStream, line: str, block: bool = True) -> LiveStream:
+    """Put a line, reopening the stream if it was just closed; returns the stream used."""
+    try:
+        stream.put(line, block=block)
+    except StreamClosed:
+        stream = get_stream(stream.user_id, stream.name)
+        stream.put(line, block=block)
+    return stream
+
+
+def ingest_lines(stream: LiveStream, raw_lines, ndjson: bool = False) -> int:
+    """Feed an iterator of byte lines (e.g. a chunked request body) to the stream."""
+    accepted = 0
+    for raw in raw_lines:
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        if ndjson and line.strip():
+            line = ndjson_message(line)
+        stream = _put(stream, line)
+        accepted += 1
+    return accepted
+
+
+class _SyslogTCPHandler(socketserver.StreamRequestHandler):
+    """Newline-delimited syslog over TCP; a full stream slows the sender down."""
+
+    def handle(self):
+        stream = get_stream(self.server.user_id, "syslog")
+        for raw in self.rfile:
+            try:
+                stream = _put(stream, raw.decode("utf-8", errors="replace"))
+            except Backpressure:
+                continue  # stalled for PUT_TIMEOUT: drop (counted) and keep reading
+
+
+class _SyslogUDPHandler(socketserver.BaseRequestHandler):
+    """One datagram = one message; dropped (and counted) when the stream is full."""
+
+    def handle(self):
+        data = self.request[0].decode("utf-8", errors="replace")
+        _put(get_stream(self.server.user_id, "syslog"), data, block=False)
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_syslog_listener(address: str = SYSLOG_LISTEN, user_id=SYSLOG_USER_ID):
+    """Serve `udp://host:port` / `tcp://host:port` in a daemon thread (no-op if unset)."""
+    if not address:
+        return None
+    if user_id is None:
+        print("⚠️ LOG_ANALYZER_SYSLOG_LISTEN is set but LOG_ANALYZER_SYSLOG_USER is not; listener disabled")
+        return None
+
+    scheme, _, hostport = address.partition("://")
+    host, _, port = hostport.rpartition(":")
+    if scheme == "tcp":
+        server = _TCPServer((host or "127.0.0.1", int(port)), _SyslogTCPHandler)
+    elif scheme == "udp":
+        server = socketserver.ThreadingUDPServer((host or "127.0.0.1", int(port)), _SyslogUDPHandler)
+        server.daemon_threads = True
+    else:
+        raise ValueError(f"Unsupported syslog address: {address}")
+
+    server.user_id = int(user_id)
+    threading.Thread(target=server.serve_forever, name="syslog", daemon=True).start()
+    print(f"📡 Syslog listener on {address} → user {user_id}, stream 'syslog'")
+    return server
@@ -0,0 +1,59 @@
+"""
+Shared test setup.
+
+The app's modules are flat top-level modules that keep their state
+(users.db, drain3_state/, results/, blobs/, the score cache, ...) relative
+to the working directory, so the whole session runs in a scratch
+directory. Tests that need the model get the same tiny randomly
+initialised stand-in the benchmark uses; no real weights are needed.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET = os.path.join(REPO_DIR, "test.csv")
+
+sys.path.insert(0, REPO_DIR)
+os.environ.setdefault("LOG_ANALYZER_WARM_UP", "0")
+os.environ.setdefault("LOG_ANALYZER_BI_FORMAT", "off")
+
+
+def pytest_configure(config):
+    os.chdir(tempfile.mkdtemp(prefix="log_analyzer_tests_"))
+
+
+@pytest.fixture(scope="session")
+def dataset_lines():
+    """The sample Thunderbird log shipped with the repo, one line per entry."""
+    with open(DATASET, encoding="utf-8", errors="replace") as f:
+        return [line.rstrip("\r\n") for line in f if line.strip()]
+
+
+@pytest.fixture(scope="session")
+def tiny_model(dataset_lines):
+    """Tiny stand-in model at dl_model.MODEL_DIR, and a migrated database."""
+    import dl_model
+    from benchmark import build_tiny_model
+    from storage import init_db
+
+    build_tiny_model(dl_model.MODEL_DIR, dataset_lines)
+    init_db()
+    return dl_model.get_model()
+
+
+@pytest.fixture
+def new_user():
+    """A fresh user (so a fresh resident Drain3 miner)."""
+    import uuid
+    from models import User
+    from storage import init_db, write
+
+    init_db()
+    name = f"user_{uuid.uuid4().hex[:12]}"
+    user = User(username=name, email=f"{name}@example.com", password="-")
+    write(lambda db: db.add(user))
+    return user
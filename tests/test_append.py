@@ -0,0 +1,105 @@
+import os
+
+import pytest
+from sqlmodel import Session
+
+import jobs
+from analysis import summarize
+from blob_store import blob_path
+from models import Upload, engine, remove_upload
+from storage import write
+
+
+def _write(path, lines):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def _load(upload_id) -> Upload:
+    with Session(engine) as db:
+        return db.get(Upload, upload_id)
+
+
+def _raw(upload) -> bytes:
+    with upload.open_raw() as f:
+        return f.read()
+
+
+def _check_results(upload, total):
+    df = upload.get_structured().sort_values("LineId")
+    assert df["LineId"].tolist() == list(range(total))
+    assert upload.result_rows == total
+    assert upload.line_count == total
+
+    summary = upload.get_summary()
+    expected = summarize(df)
+    assert summary["rows"] == total
+    assert summary["anomalies"] == expected["anomalies"]
+    assert {t["event_id"]: t["count"] for t in summary["templates"]} == \
+        {t["event_id"]: t["count"] for t in expected["templates"]}
+
+
+@pytest.fixture
+def lines(dataset_lines):
+    return dataset_lines[:1500]
+
+
+def test_append_grown_file(tiny_model, new_user, lines, tmp_path):
+    first = _write(tmp_path / "a.log", lines[:1000])
+    upload_id = jobs._ingest_new(new_user.id, "a.log", "log", str(first), jobs._Quiet(), {}, export=False)
+
+    # The same log after it grew: only the tail is processed
+    grown = _write(tmp_path / "a2.log", lines)
+    stats = {}
+    jobs._append(upload_id, "log", str(grown), jobs._Quiet(), stats)
+    assert stats["append"]["offset"] == os.path.getsize(first)
+    assert stats["lines"] == 500
+
+    upload = _load(upload_id)
+    assert _raw(upload) == grown.read_bytes()
+    assert upload.filesize == os.path.getsize(grown)
+    assert len(upload.raw_segment_list()) == 2
+    _check_results(upload, 1500)
+
+    # A file that only holds new lines is appended as a whole
+    more = _write(tmp_path / "b.log", lines[:200])
+    jobs._append(upload_id, "log", str(more), jobs._Quiet(), {})
+    upload = _load(upload_id)
+    assert _raw(upload) == grown.read_bytes() + more.read_bytes()
+    _check_results(upload, 1700)
+
+    # Deleting the upload releases every segment
+    segments = upload.raw_segment_list()
+    assert write(remove_upload, upload_id, new_user.id)
+    assert not any(os.path.exists(blob_path(digest)) for digest, _ in segments)
+
+
+def test_append_to_upload_without_summary_state(tiny_model, new_user, lines, tmp_path):
+    path = _write(tmp_path / "a.log", lines[:800])
+    upload_id = jobs._ingest_new(new_user.id, "a.log", "log", str(path), jobs._Quiet(), {}, export=False)
+
+    upload = _load(upload_id)
+    upload.summary_state = None  # as stored before summary states existed
+    write(lambda db: db.merge(upload))
+
+    jobs._append(upload_id, "log", str(_write(tmp_path / "b.log", lines[800:])), jobs._Quiet(), {})
+    _check_results(_load(upload_id), 1500)
+
+
+def test_stream_batches_and_raw_flush(tiny_model, new_user, lines, tmp_path):
+    batches = [lines[:400], lines[400:900], lines[900:]]
+
+    upload_id = None
+    for i, batch in enumerate(batches):
+        path = _write(tmp_path / f"batch{i}.log", batch)
+        upload_id, stats = jobs.run_stream_batch(new_user.id, upload_id, "s.stream.log", str(path))
+        assert not os.path.exists(path)
+
+    # Later batches reach the raw log through flushes
+    raw_path = _write(tmp_path / "pending.raw", batches[1] + batches[2])
+    assert jobs.flush_stream_raw(upload_id, str(raw_path))
+
+    upload = _load(upload_id)
+    assert _raw(upload).decode("utf-8") == "\n".join(batches[0]) + "\n" + raw_path.read_text()
+    _check_results(upload, 1500)
@@ -0,0 +1,42 @@
+from sqlmodel import Session, select
+
+import auth
+from models import User, engine
+
+PASSWORD = "Sup3r-secret!"
+
+
+def _signup(client, username, email):
+    return client.post("/signup", data={"username": username, "email": email, "password": PASSWORD})
+
+
+def _users(username):
+    with Session(engine) as db:
+        return db.exec(select(User).where(User.username == username)).all()
+
+
+def test_signup_rejects_taken_username(new_user):
+    import App
+
+    rv = _signup(App.app.test_client(), new_user.username, "other@example.com")
+    assert rv.status_code == 200
+    assert b"Username already exists." in rv.data
+
+
+def test_signup_race_reports_taken_instead_of_500(new_user, monkeypatch):
+    import App
+
+    # The existence check runs before the other signup commits; the
+    # unique index catches it and the re-check names the conflict
+    real_taken, calls = auth._taken, []
+
+    def taken(username, email):
+        calls.append(username)
+        return real_taken(username, email) if len(calls) > 1 else None
+
+    monkeypatch.setattr(auth, "_taken", taken)
+    rv = _signup(App.app.test_client(), f"{new_user.username}_2", new_user.email)
+
+    assert rv.status_code == 200
+    assert b"Email already registered." in rv.data
+    assert _users(f"{new_user.username}_2") == []
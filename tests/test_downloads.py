@@ -0,0 +1,88 @@
+import gzip
+import io
+
+import pandas as pd
+import pytest
+
+import jobs
+
+
+@pytest.fixture
+def client(new_user):
+    import App
+
+    client = App.app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = new_user.id
+    return client
+
+
+@pytest.fixture
+def upload(tiny_model, new_user, dataset_lines, tmp_path):
+    """An upload grown by one append, so its raw log spans two blob segments."""
+    first = tmp_path / "a.log"
+    first.write_text("\n".join(dataset_lines[:600]) + "\n")
+    upload_id = jobs._ingest_new(new_user.id, "a.log", "log", str(first), jobs._Quiet(), {}, export=False)
+
+    more = tmp_path / "b.log"
+    more.write_text("\n".join(dataset_lines[600:1000]) + "\n")
+    jobs._append(upload_id, "log", str(more), jobs._Quiet(), {})
+    return upload_id, first.read_bytes() + more.read_bytes()
+
+
+def test_raw_download_ranges_and_etag(client, upload):
+    upload_id, raw = upload
+    url = f"/download/{upload_id}"
+
+    full = client.get(url)
+    assert full.status_code == 200
+    assert full.data == raw
+    assert full.headers["Accept-Ranges"] == "bytes"
+    etag = full.headers["ETag"]
+
+    # Ranges inside the first segment, across the boundary, and open-ended
+    for start, end in [(0, 99), (len(raw) // 2 - 50, len(raw) // 2 + 50), (len(raw) - 10, None)]:
+        spec = f"bytes={start}-{'' if end is None else end}"
+        part = client.get(url, headers={"Range": spec})
+        assert part.status_code == 206
+        assert part.data == raw[start:None if end is None else end + 1]
+        assert part.headers["Content-Range"].endswith(f"/{len(raw)}")
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    # A stale If-Range falls back to the whole file
+    stale = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200 and stale.data == raw
+
+    unsatisfiable = client.get(url, headers={"Range": f"bytes={len(raw) + 10}-"})
+    assert unsatisfiable.status_code == 416
+
+
+def test_raw_download_gzip(client, upload):
+    upload_id, raw = upload
+    rv = client.get(f"/download/{upload_id}", headers={"Accept-Encoding": "gzip"})
+
+    assert rv.headers["Content-Encoding"] == "gzip"
+    assert rv.headers["ETag"].endswith('-gzip"')
+    assert gzip.decompress(rv.data) == raw
+
+
+def test_result_download_etag_and_filters(client, upload):
+    upload_id, _ = upload
+    url = f"/download_structured/{upload_id}"
+
+    rv = client.get(url)
+    df = pd.read_csv(io.BytesIO(rv.data))
+    assert df["LineId"].tolist() == list(range(1000))
+    etag = rv.headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    # Another query is another representation
+    anomalies = client.get(f"{url}?columns=LineId,pred_label&label=1")
+    assert anomalies.headers["ETag"] != etag
+    narrowed = pd.read_csv(io.BytesIO(anomalies.data))
+    assert narrowed.columns.tolist() == ["LineId", "pred_label"]
+    assert (narrowed["pred_label"] == 1).all()
+    assert len(narrowed) == int((df["pred_label"] == 1).sum())
+
+    assert client.get(f"{url}?columns=nope").status_code == 400
@@ -0,0 +1,28 @@
+import os
+import socket
+import stat
+
+import inference_server
+
+
+def test_key_file_is_private_and_stable(tmp_path):
+    path = str(tmp_path / "inference_server.key")
+    key = inference_server._read_key_file(path)
+
+    assert len(key) == 64
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert inference_server._read_key_file(path) == key
+
+
+def test_is_running_connects_to_unix_socket(tmp_path):
+    path = str(tmp_path / "server.sock")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen()
+    assert inference_server.is_running(path)
+
+    # The socket file outlives the server that owned it
+    sock.close()
+    assert os.path.exists(path)
+    assert not inference_server.is_running(path)
+    assert inference_server.ping(path) is None
@@ -0,0 +1,29 @@
+import App
+from metrics import Histogram
+
+
+def test_bucket_bounds_keep_precision():
+    hist = Histogram("h", "help", (0.005, 2.5, 2 ** 35))
+    hist.observe(1.0)
+    lines = list(hist.render())
+
+    assert 'h_bucket{le="0.005"} 0' in lines
+    assert 'h_bucket{le="2.5"} 1' in lines
+    assert 'h_bucket{le="34359738368"} 1' in lines
+
+
+def test_metrics_only_served_locally_or_with_token(monkeypatch):
+    client = App.app.test_client()
+
+    rv = client.get("/metrics")
+    assert rv.status_code == 200
+    assert b"log_analyzer_streams" in rv.data
+    assert b'user="' not in rv.data and b'stream="' not in rv.data
+
+    remote = {"REMOTE_ADDR": "10.1.2.3"}
+    assert client.get("/metrics", environ_base=remote).status_code == 403
+
+    monkeypatch.setattr(App, "METRICS_TOKEN", "s3cret")
+    assert client.get("/metrics", environ_base=remote).status_code == 403
+    ok = client.get("/metrics", environ_base=remote, headers={"Authorization": "Bearer s3cret"})
+    assert ok.status_code == 200
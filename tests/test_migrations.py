@@ -0,0 +1,135 @@
+"""
+init_db() on databases written before the migrations existed.
+
+storage.engine is bound when storage is imported, so each migration runs
+in a child process whose working directory holds the old users.db.
+"""
+
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from conftest import REPO_DIR
+
+# Upload as the baseline models.py declared it: results as JSON, raw log inline
+BASELINE_SCHEMA = """
+CREATE TABLE user (
+    id INTEGER NOT NULL, username VARCHAR NOT NULL, email VARCHAR NOT NULL,
+    password VARCHAR NOT NULL, PRIMARY KEY (id)
+);
+CREATE TABLE upload (
+    id INTEGER NOT NULL, user_id INTEGER NOT NULL, filename VARCHAR NOT NULL,
+    raw_log VARCHAR NOT NULL, structured_log VARCHAR, filesize INTEGER,
+    uploaded_at DATETIME NOT NULL, PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id)
+);
+"""
+
+MIGRATE = """
+import json, sys
+sys.path.insert(0, {repo!r})
+from sqlmodel import Session, select
+from storage import engine, init_db, schema_version
+from migrations import MIGRATIONS
+from models import Upload
+from search_index import get_search_index
+
+init_db()
+init_db()  # a second run finds nothing to do
+
+out = {{"max_version": max(v for v, _, _ in MIGRATIONS), "uploads": []}}
+with engine.connect() as conn:
+    out["version"] = schema_version(conn)
+with Session(engine) as db:
+    for upload in db.exec(select(Upload)).all():
+        df = upload.get_structured()
+        with upload.open_raw() as f:
+            raw = f.read().decode("utf-8")
+        out["uploads"].append({{
+            "raw": raw,
+            "raw_log": upload.raw_log,
+            "structured_log": upload.structured_log,
+            "filesize": upload.filesize,
+            "line_ids": df["LineId"].tolist(),
+            "contents": df["Content"].tolist(),
+            "has_timestamps": "Timestamp" in df.columns,
+            "time_start": str(upload.time_start),
+            "summary_rows": upload.get_summary()["rows"],
+            "line_count": upload.line_count,
+            "indexed": get_search_index().is_indexed(upload.id),
+        }})
+print(json.dumps(out))
+"""
+
+
+def _migrate(folder):
+    env = {**os.environ, "LOG_ANALYZER_DATABASE_URL": "sqlite:///users.db"}
+    proc = subprocess.run(
+        [sys.executable, "-c", MIGRATE.format(repo=REPO_DIR)],
+        cwd=folder, env=env, capture_output=True, text=True, timeout=300,
+    )
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture
+def baseline_db(tmp_path, dataset_lines):
+    lines = dataset_lines[:300]
+    df = pd.DataFrame({
+        "LineId": range(1, len(lines) + 1),
+        "Content": lines,
+        "EventId": [i % 7 for i in range(len(lines))],
+        "EventTemplate": [f"template <*> {i % 7}" for i in range(len(lines))],
+        "anomaly_score": [0.9 if i % 50 == 0 else 0.1 for i in range(len(lines))],
+        "pred_label": [1 if i % 50 == 0 else 0 for i in range(len(lines))],
+    })
+    raw = "\n".join(lines) + "\n"
+
+    conn = sqlite3.connect(tmp_path / "users.db")
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO user VALUES (1, 'old', 'old@example.com', '-')")
+    conn.execute(
+        "INSERT INTO upload (id, user_id, filename, raw_log, structured_log, uploaded_at) "
+        "VALUES (1, 1, 'old.log', ?, ?, '2024-01-01 00:00:00')",
+        (raw, df.to_json(orient="records")),
+    )
+    conn.commit()
+    conn.close()
+    return tmp_path, raw, df
+
+
+def test_migrates_baseline_uploads(baseline_db):
+    folder, raw, df = baseline_db
+    out = _migrate(folder)
+
+    assert out["version"] == out["max_version"]
+    [upload] = out["uploads"]
+
+    # Results moved to Parquet in line order, raw log to the blob store
+    assert upload["structured_log"] is None and upload["raw_log"] == ""
+    assert upload["line_ids"] == df["LineId"].tolist()
+    assert upload["contents"] == df["Content"].tolist()
+    assert upload["raw"] == raw
+    assert upload["filesize"] == len(raw.encode("utf-8"))
+
+    # Backfills of later migrations
+    assert upload["has_timestamps"] and upload["time_start"] != "None"
+    assert upload["summary_rows"] == len(df)
+    assert upload["line_count"] == df["LineId"].max() + 1
+    assert upload["indexed"]
+
+
+def test_migrates_tracked_users_db(tmp_path):
+    # The users.db committed with the baseline: users and an old log table only
+    data = subprocess.run(["git", "show", "03de163:users.db"], cwd=REPO_DIR, capture_output=True)
+    if data.returncode != 0:
+        pytest.skip("baseline commit not available")
+    (tmp_path / "users.db").write_bytes(data.stdout)
+
+    out = _migrate(tmp_path)
+    assert out["version"] == out["max_version"]
+    assert out["uploads"] == []
@@ -0,0 +1,51 @@
+import pytest
+from drain3 import TemplateMiner
+
+import Log_parser
+from Log_parser import _parse_parallel, _parse_serial, build_template_miner_config, parse_cache
+
+
+def _parse(lines, profile, mode, parallel=False):
+    tm = TemplateMiner(None, build_template_miner_config(profile))
+    parse_cache(tm, mode)
+    if parallel:
+        return _parse_parallel(lines, tm, workers=2)
+    return _parse_serial(lines, tm)
+
+
+def _differing_rows(a, b):
+    assert len(a) == len(b)
+    return int(((a["EventId"].values != b["EventId"].values)
+                | (a["EventTemplate"].values != b["EventTemplate"].values)).sum())
+
+
+@pytest.mark.parametrize("profile", ["none", "syslog", "thunderbird"])
+@pytest.mark.parametrize("mode", ["exact", "masked"])
+def test_cached_parse_matches_uncached(dataset_lines, profile, mode):
+    uncached = _parse(dataset_lines, profile, "off")
+    cached = _parse(dataset_lines, profile, mode)
+    assert _differing_rows(cached, uncached) == 0
+
+
+def test_warm_miner_hits_the_cache(dataset_lines):
+    tm = TemplateMiner(None, build_template_miner_config("syslog"))
+    cache = parse_cache(tm, "masked")
+    _parse_serial(dataset_lines, tm)
+    before = dict(cache.stats)
+
+    again = _parse_serial(dataset_lines, tm)
+    counts = cache.delta(before)
+
+    assert counts["hit_rate"] > 0.9
+    reference = TemplateMiner(None, build_template_miner_config("syslog"))
+    parse_cache(reference, "off")
+    _parse_serial(dataset_lines, reference)
+    assert _differing_rows(again, _parse_serial(dataset_lines, reference)) == 0
+
+
+@pytest.mark.parametrize("mode", ["off", "masked"])
+def test_parallel_matches_serial(dataset_lines, monkeypatch, mode):
+    monkeypatch.setattr(Log_parser, "PARALLEL_MIN_LINES", 0)
+    serial = _parse(dataset_lines, "syslog", mode)
+    parallel = _parse(dataset_lines, "syslog", mode, parallel=True)
+    assert _differing_rows(parallel, serial) == 0
@@ -0,0 +1,15 @@
+import io
+
+import pytest
+
+from Log_parser import _iter_csv
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"message\nhello world\nfoo bar\n", ["hello world", "foo bar"]),
+    (b'\xef\xbb\xbf"Message"\r\nhello world\r\n', ["hello world"]),
+    (b"hello world\nfoo bar\n", ["hello world", "foo bar"]),
+    (b"level,message\nINFO,started\nWARN,slow disk\n", ["started", "slow disk"]),
+])
+def test_iter_csv_skips_header(data, expected):
+    assert list(_iter_csv(io.BytesIO(data))) == expected
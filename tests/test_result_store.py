@@ -0,0 +1,46 @@
+import pandas as pd
+import pyarrow.parquet as pq
+
+from result_store import time_window, write_results
+
+
+def _frame():
+    # Out-of-order and missing timestamps, as in a merged or noisy log
+    return pd.DataFrame({
+        "LineId": range(6),
+        "Content": [f"line {i}" for i in range(6)],
+        "Timestamp": pd.to_datetime([
+            "2024-05-01 12:00:02", None, "2024-05-01 12:00:00",
+            "2024-05-01 12:00:02", "2024-05-01 12:00:01", None,
+        ]),
+    })
+
+
+def test_results_stay_in_line_order(tmp_path):
+    path = str(tmp_path / "r.parquet")
+    meta = write_results(_frame(), path)
+
+    assert pq.read_table(path)["LineId"].to_pylist() == list(range(6))
+    assert meta["time_start"] == pd.Timestamp("2024-05-01 12:00:00")
+    assert meta["time_end"] == pd.Timestamp("2024-05-01 12:00:02")
+
+
+def test_time_window_orders_by_time_then_line(tmp_path):
+    path = str(tmp_path / "r.parquet")
+    write_results(_frame(), path)
+
+    assert time_window(path)["LineId"].tolist() == [2, 4, 0, 3, 1, 5]
+    assert time_window(path, start="2024-05-01 12:00:01")["LineId"].tolist() == [4, 0, 3]
+
+    top = time_window(path, columns=["Content"], limit=2)
+    assert top.columns.tolist() == ["Content"]
+    assert top["Content"].tolist() == ["line 2", "line 4"]
+
+
+def test_time_arg_converts_offsets_to_utc():
+    from App import _time_arg, app
+
+    with app.test_request_context("/?start=2024-05-01T14:00:00%2B02:00&end=2024-05-01T12:00:00"):
+        assert _time_arg("start") == pd.Timestamp("2024-05-01 12:00:00")
+        assert _time_arg("end") == pd.Timestamp("2024-05-01 12:00:00")
+        assert _time_arg("missing") is None
@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import QUANTILE_BINS, SUMMARY_COLUMNS, SummaryBuilder, summarize
+
+
+def _results(n=20_000, templates=40, seed=0):
+    rng = np.random.default_rng(seed)
+    event_ids = rng.zipf(1.5, n) % templates
+    scores = rng.beta(0.5, 4, n).astype(np.float32)
+    return pd.DataFrame({
+        "LineId": np.arange(n),
+        "Content": [f"line {i} of template {e}" for i, e in enumerate(event_ids)],
+        "EventId": event_ids,
+        "EventTemplate": [f"line <*> of template {e}" for e in event_ids],
+        "anomaly_score": scores,
+        "pred_label": (scores >= 0.5).astype(int),
+    })
+
+
+def _windows(df, sizes=(1, 999, 5000, 7, 14_000)):
+    start = 0
+    for size in sizes:
+        yield df.iloc[start:start + size]
+        start += size
+
+
+def _assert_same(built, expected):
+    for key in ("rows", "distinct_templates", "anomalies", "anomaly_rate", "threshold"):
+        assert built[key] == expected[key], key
+
+    by_id = {t["event_id"]: t for t in expected["templates"]}
+    assert {t["event_id"] for t in built["templates"]} == set(by_id)
+    for item in built["templates"]:
+        reference = by_id[item["event_id"]]
+        assert (item["template"], item["count"], item["anomalies"]) == \
+            (reference["template"], reference["count"], reference["anomalies"])
+        assert item["mean_score"] == pytest.approx(reference["mean_score"], abs=1e-4)
+
+    scores, reference = built["scores"], expected["scores"]
+    assert scores["histogram"] == reference["histogram"]
+    assert scores["mean"] == pytest.approx(reference["mean"], abs=1e-4)
+    assert scores["max"] == pytest.approx(reference["max"], abs=1e-4)
+    for q, value in reference["quantiles"].items():
+        assert scores["quantiles"][q] == pytest.approx(value, abs=1 / QUANTILE_BINS + 1e-4), q
+
+    assert [line["line_id"] for line in built["top_anomalies"]] == \
+        [line["line_id"] for line in expected["top_anomalies"]]
+
+
+def test_windowed_summary_matches_summarize():
+    df = _results()
+    builder = SummaryBuilder()
+    for window in _windows(df):
+        builder.add(window)
+
+    _assert_same(builder.result(threshold=0.5), summarize(df, threshold=0.5))
+
+
+def test_summary_state_round_trip_matches_summarize():
+    df = _results()
+    head, tail = df.iloc[:12_345], df.iloc[12_345:]
+
+    builder = SummaryBuilder()
+    builder.add(head)
+    resumed = SummaryBuilder.from_state(json.loads(json.dumps(builder.state())))
+    resumed.add(tail)
+
+    _assert_same(resumed.result(threshold=0.5), summarize(df, threshold=0.5))
+
+
+def test_summary_columns_only_keep_the_top_lines():
+    df = _results()
+    builder = SummaryBuilder()
+    builder.add(df.iloc[:10_000])
+    top = builder.state()["top"]
+
+    builder.add(df.iloc[10_000:][SUMMARY_COLUMNS])
+    assert builder.result()["top_anomalies"] == top
+    assert builder.result()["rows"] == len(df)
@@ -1,14 +1,13 @@
-import os
-import time
-import pandas as pd
-from flask import Blueprint, request, render_template, redirect, url_for, session, Response
+from flask import Blueprint, request, render_template, redirect, url_for, session, jsonify
 from sqlmodel import Session, select
-from models import Upload, engine
-from datetime import datetime
+from models import Upload, engine, list_uploads, remove_upload
+from storage import write
+from downloads import raw_response, result_response
+from streams import is_live
+from masking_profiles import DEFAULT_PROFILE, PROFILES
 
-# Parser + Deep Learning Model
-from Log_parser import parse_uploaded_file
-from dl_model import run_dl_on_parsed   # 🔥 renamed from ml_model → dl_model
+# Parsing + DL run in the background worker pool (see jobs.py)
+from jobs import APPEND_EXTS, spool_upload, enqueue_upload, enqueue_append, get_job, pending_jobs, delete_job
 
 
 upload_bp = Blueprint("upload", __name__)
@@ -16,7 +15,7 @@ upload_bp = Blueprint("upload", __name__)
 
 
 # ============================================================
-#                 UPLOAD + PARSE + DL + SAVE
+#                 UPLOAD → BACKGROUND JOB
 # ============================================================
 @upload_bp.route('/upload', methods=['GET', 'POST'])
 def upload_file():
@@ -26,12 +25,6 @@ def upload_file():
 
     if request.method == 'POST':
 
-        print("\n==============================")
-        print("📥 Starting Upload Process...")
-        print("==============================")
-
-        total_start = time.time()
-
         file = request.files.get('logfile')
         if not file:
             return "Please upload a file."
@@ -42,114 +35,77 @@ def upload_file():
         if ext not in {"csv", "json", "log", "txt"}:
             return "Only CSV, JSON, LOG, or TXT files are allowed."
 
-        # -----------------------------------------------------------
-        # Step 1 — Read File
-        # -----------------------------------------------------------
-        step1 = time.time()
-        print(f"📄 Reading uploaded file: {filename}")
-
-        content = file.read().decode('utf-8')
-
-        print(f"✔ Step 1 Done in {time.time() - step1:.3f} seconds")
-
-
-        # -----------------------------------------------------------
-        # Step 2 — Handle .log / .txt (Convert to CSV/JSON)
-        # -----------------------------------------------------------
-        if ext in {"log", "txt"}:
-            step2 = time.time()
-            print("📝 Detected .log/.txt file → Converting to DataFrame")
-
-            lines = content.splitlines()
-            temp_df = pd.DataFrame({"message": lines})
-
-            os.makedirs("uploads_raw", exist_ok=True)
-
-            temp_df.to_csv(f"uploads_raw/{filename}.csv", index=False)
-            temp_df.to_json(f"uploads_raw/{filename}.json", orient="records")
-
-            print("✔ Converted to CSV + JSON format")
-            print(f"✔ Step 2 Done in {time.time() - step2:.3f} seconds")
+        # Spool to disk + queue; parsing / DL / saving happen in the worker pool
+        spool_path = spool_upload(file, ext)
+        job = enqueue_upload(session["user_id"], filename, ext, spool_path, request.form.get("masking_profile"))
 
-            # Treat as CSV for parser
-            content = temp_df.to_csv(index=False)
-            ext = "csv"
+        print(f"📥 Queued job {job.id} for {filename}")
 
+        return redirect(url_for('upload.my_uploads'))
 
 
-        # -----------------------------------------------------------
-        # Step 3 — Parse with Drain3
-        # -----------------------------------------------------------
-        step3 = time.time()
-        print("🔍 Parsing (Drain3)...")
-
-        structured_df = parse_uploaded_file(content, ext)
-
-        print("✔ Parsing Completed")
-        print(f"✔ Step 3 Done in {time.time() - step3:.3f} seconds")
-
-
+    # GET → Upload Page
+    return render_template("upload.html", profiles=list(PROFILES), default_profile=DEFAULT_PROFILE)
 
-        # -----------------------------------------------------------
-        # Step 4 — Deep Learning Model Prediction
-        # -----------------------------------------------------------
-        step4 = time.time()
-        print("🤖 Running Deep Learning Model...")
 
-        
 
-        print("✔ DL Inference Completed")
-        print(f"✔ Step 4 Done in {time.time() - step4:.3f} seconds")
 
+# ============================================================
+#                 APPEND TO AN EXISTING UPLOAD
+# ============================================================
+@upload_bp.route('/uploads/<int:upload_id>/append', methods=['POST'])
+def append_upload(upload_id):
 
+    if 'user_id' not in session:
+        return redirect(url_for('auth.signin'))
 
-        # -----------------------------------------------------------
-        # Step 5 — Save “Result Log” to Power BI Output
-        # -----------------------------------------------------------
-        step5 = time.time()
-        print("📊 Exporting Result Log for Power BI")
+    file = request.files.get('logfile')
+    if not file:
+        return "Please upload a file."
 
-        os.makedirs("powerbi_output", exist_ok=True)
-        structured_df.to_csv("powerbi_output/result_log.csv", index=False)
+    ext = file.filename.rsplit('.', 1)[-1].lower()
+    if ext not in APPEND_EXTS:
+        return "Only LOG or TXT files can be appended."
+    if is_live(upload_id):
+        return "This upload is a live stream; send lines to its stream instead."
 
-        print("✔ Result Log Saved (result_log.csv)")
-        print(f"✔ Step 5 Done in {time.time() - step5:.3f} seconds")
+    # The grown log (or just its new lines); only new bytes are processed
+    spool_path = spool_upload(file, ext)
+    job = enqueue_append(session["user_id"], upload_id, file.filename, ext, spool_path)
+    if not job:
+        return "Upload not found, or an append to it is still processing."
 
+    print(f"📥 Queued append job {job.id} for upload {upload_id}")
 
+    return redirect(url_for('upload.my_uploads'))
 
-        # -----------------------------------------------------------
-        # Step 6 — Save to Database
-        # -----------------------------------------------------------
-        step6 = time.time()
-        print("💾 Saving Upload & Result Log to DB")
 
-        upload = Upload(
-            user_id=session["user_id"],
-            filename=filename,
-            raw_log=content,
-            filesize=len(content.encode("utf-8")),
-            uploaded_at=datetime.utcnow()
-        )
 
-        upload.set_structured(structured_df)
 
-        with Session(engine) as db:
-            db.add(upload)
-            db.commit()
+# ============================================================
+#                   JOB STATUS (polled by My Uploads)
+# ============================================================
+@upload_bp.route('/jobs/<int:job_id>/status')
+def job_status(job_id):
 
-        print("✔ Step 6 Done in {:.3f} seconds".format(time.time() - step6))
+    if 'user_id' not in session:
+        return jsonify({"error": "not signed in"}), 401
 
+    job = get_job(job_id, session["user_id"])
+    if not job:
+        return jsonify({"error": "job not found"}), 404
 
+    return jsonify(job.to_status())
 
-        print("=======================================")
-        print("🎉 TOTAL TIME:", round(time.time() - total_start, 3), "seconds")
-        print("=======================================\n")
 
-        return redirect(url_for('upload.my_uploads'))
+@upload_bp.route('/jobs/<int:job_id>/delete')
+def job_delete(job_id):
 
+    if 'user_id' not in session:
+        return redirect(url_for('auth.signin'))
 
-    # GET → Upload Page
-    return render_template("upload.html")
+    delete_job(job_id, session["user_id"])
+    return redirect(url_for("upload.my_uploads"))
 
 
 
@@ -164,12 +120,16 @@ def my_uploads():
     if 'user_id' not in session:
         return redirect(url_for('auth.signin'))
 
+    cursor = request.args.get("cursor")
     with Session(engine) as db:
-        uploads = db.exec(
-            select(Upload).where(Upload.user_id == session["user_id"])
-        ).all()
+        uploads, next_cursor = list_uploads(db, session["user_id"], cursor)
 
-    return render_template("myuploads.html", uploads=uploads)
+    jobs = pending_jobs(session["user_id"])
+
+    return render_template(
+        "myuploads.html",
+        uploads=uploads, jobs=jobs, cursor=cursor, next_cursor=next_cursor
+    )
 
 
 
@@ -192,11 +152,8 @@ def download_raw(log_id):
     if not log:
         return "File not found."
 
-    return Response(
-        log.raw_log,
-        mimetype="text/plain",
-        headers={"Content-Disposition": f"attachment;filename={log.filename}"}
-    )
+    # Streamed from the blob store (gzip / Range / 304 aware)
+    return raw_response(log)
 
 
 
@@ -216,17 +173,11 @@ def download_result(log_id):
             .where(Upload.id == log_id, Upload.user_id == session["user_id"])
         ).first()
 
-    if not log or not log.structured_log:
+    if not log or not log.has_results:
         return "Result log not found."
 
-    df = log.get_structured()
-    csv_content = df.to_csv(index=False)
-
-    return Response(
-        csv_content,
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment;filename=result_{log.filename}.csv"}
-    )
+    # Streamed CSV; ?columns=a,b and ?label=1 narrow it down
+    return result_response(log, f"result_{log.filename}.csv")
 
 
 
@@ -240,15 +191,7 @@ def delete_upload(log_id):
     if 'user_id' not in session:
         return redirect(url_for('auth.signin'))
 
-    with Session(engine) as db:
-        log = db.exec(
-            select(Upload)
-            .where(Upload.id == log_id, Upload.user_id == session["user_id"])
-        ).first()
-
-        if log:
-            db.delete(log)
-            db.commit()
+    write(remove_upload, log_id, session["user_id"])
 
     return redirect(url_for("upload.my_uploads"))
 